@@ -32,12 +32,14 @@ __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
 #   - ranges -  web['foo'][:23]?
 #   - define and use URI object
 
-from ..message import Request, Response
-from .. import status
+from ...message import Request, Response
+from ... import status
+from ...feature.base import Pipeline
+from .httplib import Httplib
 
 class ClientAdapter:
     def __init__(self):
-        self.pipeline = [HttplibNetworkAccess(self), ]
+        self.pipeline = Pipeline([Httplib(self), ])
 
     def _dereference(self, request):
         """
@@ -45,8 +47,8 @@ class ClientAdapter:
         Response instance.
         """
         response = status.Status()
-        for stage in self.pipeline:
-            stage.send_request(request, response)
-        for stage in self.pipeline[::-1]:    ### use reversed in 2.4
-            stage.receive_response(request, response)
+        for hook in self.pipeline.send_request:
+            hook(request, response)
+        for hook in self.pipeline.receive_response:
+            hook(request, response)
         return response
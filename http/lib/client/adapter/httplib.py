@@ -2,6 +2,8 @@
 http.client.adapter.httplib - 
 """
 
+from __future__ import absolute_import
+
 __license__ = """
 Copyright (c) 2004-2006 Mark Nottingham <mnot@pobox.com>
 
@@ -25,11 +27,17 @@ SOFTWARE.
 """
 
 __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+__version__ = "0.8"
 
 from httplib import HTTP
 from urlparse import urlparse
-from ..feature.base import PipelineComponent
-from .. import status
+from ...feature.base import PipelineComponent
+from ... import status, transfer
+
+class _HTTP11(HTTP):
+    """httplib's HTTP, sending HTTP/1.1 requests so that responses can be chunked."""
+    _http_vsn = 11
+    _http_vsn_str = 'HTTP/1.1'
 
 class Httplib(PipelineComponent):
     """Client-side component for getting representations off the network, the traditional way."""
@@ -38,7 +46,7 @@ class Httplib(PipelineComponent):
         self.user_agent = getattr(self.client, "UserAgent", "Python http (%s)" % __version__)
     
     def send_request(self, request, response):
-        h = HTTP(urlparse(request.uri)[1])  #TODO: split out port, userinfo
+        h = _HTTP11(urlparse(request.uri)[1])  #TODO: split out port, userinfo
         h.putrequest(request.method, request.uri)
         for field_name, field_value in request.representation.headers.items():
             if field_name == "Content-Length": continue
@@ -46,6 +54,8 @@ class Httplib(PipelineComponent):
         if request.representation.has_body:
             h.putheader('Content-Length', str(len(request.representation.body))) #FIXME: hmm. accesses body. options?
         h.putheader('User-Agent', self.user_agent) # FIXME: use header dict, don't override
+        h.putheader('TE', 'trailers')
+        h.putheader('Connection', 'TE, close')
         h.endheaders()
         if request.representation.has_body:
             h.send(request.representation.body) #FIXME: use iterator?
@@ -55,8 +65,11 @@ class Httplib(PipelineComponent):
             response.__class__ = response_type
         response.status_code = status_code
         response.status_phrase = status_phrase
-        response.representation.headers.parseMessage(headers)  #FIXME: split entity and message hdrs
-        response.representation._body_iter = h.getfile() #FIXME: iterator, shouldn't have to do this _ ...
+        response.headers.parseString("".join(headers.headers))  #FIXME: split entity and message hdrs
+        body = h.getfile()
+        if transfer.is_chunked(response):
+            body = transfer.dechunk(body, response.trailers)
+        response.body_iter = body
         if not isinstance(response, status.Successful):
             raise response
 
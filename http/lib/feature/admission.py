@@ -0,0 +1,172 @@
+"""
+http.feature.admission - admission control and load shedding.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import time, math, threading
+from .base import PipelineComponent
+from ..header.fields import RetryAfterHeader
+from ..lru import LRUCache
+from .. import status
+
+class AdmissionControl(PipelineComponent):
+    """
+    Refuses requests with ServiceUnavailable, before they're routed,
+    when the server is overloaded:
+
+      - when max_concurrent requests are already being handled;
+      - when the client (request.client) has used up its token bucket,
+        which holds up to burst tokens and is refilled at rate tokens
+        per second;
+      - when the request has waited too long to be dispatched (since
+        request.ready, so that uploading the body isn't counted, or
+        else request.received), CoDel-style: normally, requests that
+        have waited longer than interval are shed, but once the
+        shortest wait in an interval has exceeded target, the queue is
+        standing and requests that have waited longer than target are
+        shed.
+
+    Each limit is off if its parameter is None. Only raw request
+    values are looked at, and refusals are built from pre-serialized
+    headers, with Retry-After computed from the limit that was hit.
+    Decisions are counted in metrics.
+
+    Add it to the server adapter's pipeline (after a response cache,
+    so that cache hits are still served).
+
+    @ivar metrics: counts of 'admitted' requests and those shed by
+      'concurrency', 'rate' and 'delay'
+    @type metrics: dict
+    @ivar in_flight: requests being handled
+    @type in_flight: int
+    @ivar buckets: client -> [tokens, last refill time]
+    @type buckets: L{LRUCache}
+    """
+    def __init__(self, context, max_concurrent=None, rate=None, burst=None,
+      target=None, interval=0.1, retry_after=1, max_clients=10000):
+        PipelineComponent.__init__(self, context)
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst or rate
+        self.target = target
+        self.interval = interval
+        self.retry_after = retry_after
+        self.buckets = LRUCache(max_clients)
+        self.in_flight = 0
+        self.metrics = {'admitted': 0, 'concurrency': 0, 'rate': 0, 'delay': 0}
+        self._lock = threading.Lock()
+        self._interval_end = 0
+        self._min_delay = None
+        self._standing = False
+        self._refusals = {}
+
+    def receive_request(self, request, response):
+        now = time.time()
+        self._lock.acquire()
+        try:
+            reason, retry_after = self.admit(request, now)
+            if reason is None:
+                self.in_flight += 1
+                request.admitted = True
+                self.metrics['admitted'] += 1
+                return
+            self.metrics[reason] += 1
+        finally:
+            self._lock.release()
+        raise self.refusal(retry_after).exception
+
+    def finish_request(self, request, response):
+        if getattr(request, 'admitted', False):
+            request.admitted = False
+            self._lock.acquire()
+            try:
+                self.in_flight -= 1
+            finally:
+                self._lock.release()
+
+    def admit(self, request, now):
+        """
+        Return (None, None) if request is admitted, otherwise (reason,
+        Retry-After seconds). Called with the lock held.
+        """
+        ready = request.ready or request.received
+        if self.target is not None and ready is not None:
+            delay = now - ready
+            if self.shed(delay, now):
+                return 'delay', max(self.retry_after, int(math.ceil(self._min_delay)))
+        if self.max_concurrent is not None and \
+          self.in_flight >= self.max_concurrent:
+            return 'concurrency', self.retry_after
+        if self.rate is not None and request.client is not None:
+            bucket = self.buckets.get(request.client)
+            if bucket is None:
+                bucket = [self.burst, now]
+                self.buckets.set(request.client, bucket)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return 'rate', int(math.ceil((1 - bucket[0]) / self.rate))
+            bucket[0] -= 1
+        return None, None
+
+    def shed(self, delay, now):
+        """
+        Whether a request that has waited delay seconds should be shed.
+        """
+        if now >= self._interval_end:
+            self._standing = self._min_delay is not None and \
+              self._min_delay > self.target
+            self._interval_end = now + self.interval
+            self._min_delay = delay
+        elif delay < self._min_delay:
+            self._min_delay = delay
+        if self._standing:
+            return delay > self.target
+        return delay > self.interval
+
+    def refusal(self, retry_after):
+        """Return a ServiceUnavailable response with Retry-After."""
+        headers = self._refusals.get(retry_after)
+        if headers is None:
+            headers = self._refusals[retry_after] = {
+              'Retry-After': RetryAfterHeader._asString(retry_after),
+              'Content-Length': '0',
+              'Cache-Control': 'no-store',
+            }
+        response = status.ServiceUnavailable()
+        response.headers.data.update(headers)
+        return response
+
+    def stats(self):
+        """Return a copy of the metrics, with in_flight."""
+        self._lock.acquire()
+        try:
+            stats = self.metrics.copy()
+            stats['in_flight'] = self.in_flight
+            return stats
+        finally:
+            self._lock.release()
@@ -27,13 +27,25 @@ SOFTWARE.
 __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
 
 class PipelineComponent:
-    """Abstract class for pipeline components."""
+    """
+    Abstract class for pipeline components.
+    
+    Hooks may be generator functions, or return a Future; server 
+    adapters run them as coroutines (see server.coroutine).
+    """
     def __init__(self, context):
         """Components can be instantiated with a context."""
         self.context = context
     def send_request(self, request, response):
         """Called when a request is being sent."""
         pass
+    def check_request(self, request):
+        """
+        Called before a request's body is read (e.g., when it has 
+        Expect: 100-continue); raise a StatusException to refuse it.
+        Shouldn't be a coroutine.
+        """
+        pass
     def receive_request(self, request, response):
         """Called when a request is received."""
         pass
@@ -43,7 +55,112 @@ class PipelineComponent:
     def receive_response(self, request, response):
         """Called when a response is received."""
         pass
+    def finish_request(self, request, response):
+        """
+        Called by server adapters once the response to a request is
+        chosen, whether or not the other hooks were; only on the 
+        adapter's pipeline. Shouldn't be a coroutine.
+        """
+        pass
+
+
+HOOKS = ['send_request', 'check_request', 'receive_request', 'send_response', 
+  'receive_response', 'finish_request']
+REVERSED_HOOKS = ['send_response', 'receive_response', 'finish_request']
+
+class Pipeline:
+    """
+    A sequence of pipeline components, compiled into a list of bound 
+    methods per hook that only includes the components that override
+    it. Each list is in the order its hooks are to be called;
+    send_response, receive_response and finish_request run last 
+    component first. Hooks that no component overrides share one 
+    empty list; don't change the lists.
+    
+    Which components override which hooks is worked out once per 
+    sequence of component classes, so that building a Pipeline (e.g.,
+    for each Resource instance) only binds the hooks that are used.
+    
+    The mutating methods recompile; if components is changed directly,
+    call compile().
+    
+    @ivar components: the pipeline components, in order
+    @type components: list
+    """
+    send_request = check_request = receive_request = send_response = \
+      receive_response = finish_request = []
+    
+    def __init__(self, components=None):
+        self.components = components = list(components or [])
+        classes = tuple([component.__class__ for component in components])
+        layout = _layout_cache.get(classes)
+        if layout is None:
+            layout = _layout(classes)
+        bound = self.__dict__
+        for hook, indexes in layout:
+            bound[hook] = [getattr(components[i], hook) for i in indexes]
+        
+    def compile(self):
+        """Rebuild the per-hook lists from self.components."""
+        for hook in HOOKS:
+            self.__dict__.pop(hook, None)
+        Pipeline.__init__(self, self.components)
+    
+    def append(self, component):
+        self.components.append(component)
+        self.compile()
+        
+    def insert(self, index, component):
+        self.components.insert(index, component)
+        self.compile()
         
+    def remove(self, component):
+        self.components.remove(component)
+        self.compile()
+        
+    def __iter__(self):
+        return iter(self.components)
+        
+    def __len__(self):
+        return len(self.components)
+
+
+_layout_cache = {}
+def _layout(classes):
+    """
+    Return (hook, component indexes in calling order) pairs for the
+    hooks that a sequence of component classes override, and cache
+    them.
+    """
+    indexes = {}
+    for i in range(len(classes)):
+        for hook in _overridden_hooks(classes[i]):
+            indexes.setdefault(hook, []).append(i)
+    for hook in REVERSED_HOOKS:
+        if indexes.has_key(hook):
+            indexes[hook].reverse()
+    layout = _layout_cache[classes] = [(hook, indexes[hook]) 
+      for hook in HOOKS if indexes.has_key(hook)]
+    return layout
+
+_hook_cache = {}
+def _overridden_hooks(cls):
+    """Return the hooks that cls implements itself."""
+    try:
+        return _hook_cache[cls]
+    except KeyError:
+        pass
+    hooks = []
+    for hook in HOOKS:
+        method = getattr(cls, hook, None)
+        if method is None:
+            continue
+        base_method = getattr(PipelineComponent, hook)
+        if getattr(method, 'im_func', method) is not base_method.im_func:
+            hooks.append(hook)
+    _hook_cache[cls] = hooks
+    return hooks
+
         
 ## TODO: intermediary hop vs. end
 ## TODO: allow trapping of errors?
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+http.feature.cache - an in-process shared response cache.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import time
+from .base import PipelineComponent
+from .conditional import match_etag, SAFE_METHODS
+from .etag import vary_key
+from ..lru import LRUCache
+from .. import status
+
+CACHEABLE_STATUS = [200, 203, 300, 301, 410]
+
+class CachedResponse:
+    """
+    A stored response.
+
+    @ivar status: the response's class
+    @ivar headers: the response's raw header values
+    @type headers: dict
+    @ivar body: the response body
+    @type body: string
+    @ivar trailers: the response's raw trailer values
+    @type trailers: dict
+    @ivar stored: when the response was stored
+    @type stored: float
+    @ivar initial_age: the response's age when stored, in seconds
+    @type initial_age: float
+    @ivar lifetime: the response's freshness lifetime, in seconds
+    @type lifetime: float
+    """
+    def __init__(self, status, headers, body, trailers, lifetime, 
+      initial_age, now):
+        self.status = status
+        self.headers = headers
+        self.trailers = trailers
+        self.body = body
+        self.lifetime = lifetime
+        self.initial_age = initial_age
+        self.stored = now
+
+    def age(self, now):
+        """The response's current age, in seconds (RFC 2616 13.2.3)."""
+        return self.initial_age + now - self.stored
+
+    def size(self):
+        return len(self.body) + sum([len(k) + len(v) for k, v in self.headers.items()])
+
+    def response(self, now):
+        """Return a new Response from this one, with Age set."""
+        response = self.status()
+        response.headers.data.update(self.headers)
+        response.trailers.data.update(self.trailers)
+        response.headers['Age'] = int(self.age(now))
+        response.body = self.body
+        return response
+
+
+class ResponseCache(PipelineComponent):
+    """
+    Stores complete responses to GET requests in memory, and answers
+    later GET and HEAD requests for the same URI (and the same values
+    of the request headers named by Vary) from them, before their
+    Resource is dereferenced, while they're fresh.
+
+    Only responses with an explicit freshness lifetime (s-maxage,
+    max-age or Expires) are stored, and not those marked no-store,
+    no-cache or private, those with Set-Cookie, or those to requests
+    with Authorization. Stored responses are never served stale;
+    requests with no-cache, or a max-age or min-fresh that a stored
+    response doesn't satisfy, are passed on (and their responses
+    stored). A successful unsafe request to a URI forgets its
+    responses. Hits get Age, and If-None-Match is answered from the
+    stored ETag.
+
+    Resources can declare their own policy with the cache_control
+    class attribute (see L{CachePolicy}).
+
+    Add it first in the server adapter's pipeline, so that it stores
+    responses after every other component has seen them. To share
+    entries between requests whose varied headers are formatted 
+    differently, pass a L{feature.vary.VaryKeys} as vary_keys.
+
+    @ivar responses: (URI, Vary key) -> L{CachedResponse}
+    @type responses: L{LRUCache}
+    @ivar varies: URI -> the Vary field-names of its stored responses
+    @type varies: L{LRUCache}
+    @ivar vary_keys: computes Vary keys, if given
+    @type vary_keys: L{feature.vary.VaryKeys}
+    @ivar max_entry_size: responses with longer bodies aren't stored
+    @type max_entry_size: int
+    @ivar hits: requests answered from the cache
+    @type hits: int
+    @ivar misses: GET and HEAD requests passed on
+    @type misses: int
+    """
+    def __init__(self, context, max_items=10000, max_size=64 * 1024 * 1024,
+      max_entry_size=1024 * 1024, vary_keys=None):
+        PipelineComponent.__init__(self, context)
+        self.vary_keys = vary_keys
+        self.responses = LRUCache(max_items, max_size=max_size)
+        self.varies = LRUCache(max_items)
+        self.max_entry_size = max_entry_size
+        self.hits = self.misses = 0
+
+    def receive_request(self, request, response):
+        if request.method not in SAFE_METHODS or \
+          request.headers.has_key('Authorization'):
+            return
+        now = time.time()
+        cached = self.lookup(request, now)
+        if cached is None:
+            self.misses += 1
+            return
+        self.hits += 1
+        if cached.headers.has_key('ETag') and \
+          request.headers.has_key('If-None-Match'):
+            not_modified = status.NotModified()
+            for field_name in ['ETag', 'Cache-Control', 'Expires', 'Vary']:
+                if cached.headers.has_key(field_name):
+                    not_modified.headers.data[field_name] = cached.headers[field_name]
+            if match_etag(request.headers['If-None-Match'], 
+              not_modified.headers['ETag'], False):
+                not_modified.headers['Age'] = int(cached.age(now))
+                raise not_modified.exception
+        raise cached.response(now).exception
+
+    def lookup(self, request, now):
+        """
+        Return the fresh CachedResponse for request that it will accept,
+        or None.
+        """
+        directives = request.headers.get('Cache-Control', {})
+        if directives.has_key('no-cache') or \
+          request.headers.get('Pragma', {}).has_key('no-cache'):
+            return None
+        fields = self.varies.get(request.uri)
+        if fields is None:
+            return None
+        cached = self.responses.get((request.uri, self.vary_key(request, fields)))
+        if cached is None:
+            return None
+        age = cached.age(now)
+        if age >= cached.lifetime:
+            return None
+        max_age = _seconds(directives, 'max-age')
+        if max_age is not None and age > max_age:
+            return None
+        min_fresh = _seconds(directives, 'min-fresh')
+        if min_fresh is not None and cached.lifetime - age < min_fresh:
+            return None
+        return cached
+
+    def send_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            if isinstance(response, status.Successful):
+                self.varies.pop(request.uri)
+            return
+        if request.method != 'GET' or response.status_code not in CACHEABLE_STATUS or \
+          request.headers.has_key('Authorization') or \
+          request.headers.get('Cache-Control', {}).has_key('no-store'):
+            return
+        headers = response.headers
+        directives = headers.get('Cache-Control', {})
+        for directive in ['no-store', 'no-cache', 'private']:
+            if directives.has_key(directive):
+                return
+        fields = tuple(headers.get('Vary', []))
+        if '*' in fields or headers.has_key('Set-Cookie'):
+            return
+        now = time.time()
+        lifetime = self.lifetime(headers, directives, now)
+        if lifetime is None or lifetime <= 0:
+            return
+        date = headers.get('Date') or now
+        initial_age = max(0, now - date, headers.get('Age') or 0)
+        length = response.body_length
+        if length is not None:
+            if length > self.max_entry_size:
+                return
+            if response.body_file is not None:
+                body = response.body_file.read()
+                response.body_file.close()
+                response.body = body
+            self.store(request, fields, CachedResponse(response.__class__,
+              headers.data.copy(), response.body or "", 
+              response.trailers.data.copy(), lifetime, initial_age, now))
+        else:
+            response.body_iter = self._keep(request, response, fields,
+              headers.data.copy(), lifetime, initial_age, response.body_iter)
+
+    def lifetime(self, headers, directives, now):
+        """
+        A response's freshness lifetime in seconds, from s-maxage,
+        max-age or Expires (RFC 2616 13.2.4), or None.
+        """
+        for directive in ['s-maxage', 'max-age']:
+            seconds = _seconds(directives, directive)
+            if seconds is not None:
+                return seconds
+        if headers.has_key('Expires'):
+            expires = headers['Expires']
+            if expires is None:
+                return 0
+            return expires - (headers.get('Date') or now)
+        return None
+
+    def vary_key(self, request, fields):
+        """The Vary key of request, for responses varying on fields."""
+        if self.vary_keys is not None:
+            return self.vary_keys.key(request, fields)
+        return vary_key(request, fields)
+
+    def store(self, request, fields, cached):
+        self.varies.set(request.uri, fields)
+        self.responses.set((request.uri, self.vary_key(request, fields)),
+          cached, size=cached.size())
+
+    def clear(self):
+        self.responses.clear()
+        self.varies.clear()
+
+    def _keep(self, request, response, fields, headers, lifetime, 
+      initial_age, body_iter):
+        pieces, size = [], 0
+        for data in body_iter:
+            if pieces is not None:
+                size += len(data)
+                if size > self.max_entry_size:
+                    pieces = None
+                else:
+                    pieces.append(data)
+            yield data
+        if pieces is not None:
+            self.store(request, fields, CachedResponse(response.__class__,
+              headers, "".join(pieces), response.trailers.data.copy(), 
+              lifetime, initial_age, time.time()))
+
+
+class CachePolicy(PipelineComponent):
+    """
+    Sets Cache-Control on a Resource's (the context's) successful
+    responses to GET and HEAD from its cache_control class attribute
+    (e.g., {'max-age': '60'}), unless the method set it.
+    """
+    def send_response(self, request, response):
+        if request.method in SAFE_METHODS and \
+          isinstance(response, status.Successful) and \
+          not response.headers.has_key('Cache-Control'):
+            response.headers['Cache-Control'] = self.context.cache_control
+
+
+def _seconds(directives, name):
+    try:
+        return int(directives[name])
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,191 @@
+"""
+http.feature.coalesce - coalescing identical in-flight requests.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import threading
+from .base import PipelineComponent
+from .conditional import SAFE_METHODS
+from .etag import vary_key
+from ..header.registry import get_field_name
+from ..lru import LRUCache
+from ..server import coroutine
+from .. import status
+
+# request headers that select a different response without Vary
+SELECTING = ('Range', 'If-Range', 'If-Match', 'If-None-Match',
+  'If-Modified-Since', 'If-Unmodified-Since')
+
+# negotiated by feature.conneg and feature.content_code
+NEGOTIATED = ('Accept', 'Accept-Charset', 'Accept-Encoding', 'Accept-Language')
+
+class Coalescing(PipelineComponent):
+    """
+    Runs GET and HEAD requests that arrive while an identical one is
+    in flight only once: later requests wait for the first one's
+    response, and each gets a copy of it (with its own headers),
+    before their Resource is dereferenced.
+
+    Requests are identical when their method and URI, and the values
+    of the request headers that can select a different response
+    (those named by Vary, and conditional and Range headers), are the
+    same. Until a response to a URI has been seen, the headers
+    negotiated by feature.conneg and feature.content_code stand in for
+    its Vary; responses that vary on anything else aren't shared. To
+    bucket the varied headers, pass a L{feature.vary.VaryKeys} as
+    vary_keys.
+
+    Requests with Authorization or Cookie aren't coalesced. Server
+    errors, responses that are private (with Set-Cookie or Cache-Control:
+    private), streamed responses (of unknown length) and responses
+    longer than max_size aren't shared; waiting requests are then
+    handled themselves.
+
+    Add it to the server adapter's pipeline (after a response cache,
+    so that hits don't wait).
+
+    @ivar flights: request key -> L{coroutine.Future} for the shared
+      response
+    @type flights: dict
+    @ivar varies: URI -> the Vary field-names of its last response
+    @type varies: L{LRUCache}
+    @ivar metrics: counts of 'led' requests, 'shared' responses, and
+      waiting requests that were 'handled' themselves
+    @type metrics: dict
+    """
+    def __init__(self, context, vary_keys=None, max_size=1024 * 1024,
+      max_items=10000):
+        PipelineComponent.__init__(self, context)
+        self.vary_keys = vary_keys
+        self.max_size = max_size
+        self.flights = {}
+        self.varies = LRUCache(max_items)
+        self.metrics = {'led': 0, 'shared': 0, 'handled': 0}
+        self._lock = threading.Lock()
+
+    def receive_request(self, request, response):
+        if request.method not in SAFE_METHODS or \
+          request.headers.has_key('Authorization') or \
+          request.headers.has_key('Cookie'):
+            return
+        fields = self.varies.get(request.uri, NEGOTIATED)
+        if fields is None:
+            return
+        key = self.key(request, fields)
+        self._lock.acquire()
+        try:
+            flight = self.flights.get(key)
+            if flight is None:
+                self.flights[key] = coroutine.Future()
+                request.flight = (key, fields)
+                self.metrics['led'] += 1
+                return
+        finally:
+            self._lock.release()
+        return self._wait(flight)
+
+    def _wait(self, flight):
+        shared = yield flight
+        self._count(shared is None and 'handled' or 'shared')
+        if shared is None:
+            return
+        cls, headers, body, trailers = shared
+        response = cls()
+        response.headers.data.update(headers)
+        response.trailers.data.update(trailers)
+        response.body = body
+        raise response.exception
+
+    def finish_request(self, request, response):
+        flight = getattr(request, 'flight', None)
+        if flight is None:
+            return
+        request.flight = None
+        key, fields = flight
+        self._lock.acquire()
+        try:
+            future = self.flights.pop(key)
+        finally:
+            self._lock.release()
+        future.set_result(self.share(request, response, fields))
+
+    def share(self, request, response, fields):
+        """
+        Return (status class, raw headers, body, raw trailers) for the
+        waiting requests, or None if response can't be shared.
+        Remembers its Vary.
+        """
+        vary = tuple([get_field_name(field) 
+          for field in response.headers.get('Vary', [])])
+        if '*' in vary:
+            self.varies.set(request.uri, None)
+            return None
+        self.varies.set(request.uri, vary)
+        for field in vary:
+            if field not in fields:
+                return None
+        if isinstance(response, status.ServerError):
+            return None
+        if response.headers.has_key('Set-Cookie') or \
+          response.headers.get('Cache-Control', {}).has_key('private'):
+            return None
+        length = response.body_length
+        if length is None or length > self.max_size:
+            return None
+        if response.body_file is not None:
+            body = response.body_file.read()
+            response.body_file.close()
+            response.body = body
+        else:
+            body = response.body
+        return (response.__class__, response.headers.data.copy(), body,
+          response.trailers.data.copy())
+
+    def key(self, request, fields):
+        """The key of identical requests, for responses varying on fields."""
+        if self.vary_keys is not None:
+            varied = self.vary_keys.key(request, fields)
+        else:
+            varied = vary_key(request, fields)
+        return (request.method, request.uri, varied,
+          vary_key(request, SELECTING))
+
+    def _count(self, name):
+        self._lock.acquire()
+        try:
+            self.metrics[name] += 1
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """Return a copy of the metrics, with requests in flight."""
+        self._lock.acquire()
+        try:
+            stats = self.metrics.copy()
+            stats['in_flight'] = len(self.flights)
+            return stats
+        finally:
+            self._lock.release()
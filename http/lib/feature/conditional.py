@@ -0,0 +1,131 @@
+"""
+http.feature.conditional - conditional requests (If-Match, If-None-Match,
+If-Modified-Since and If-Unmodified-Since).
+"""
+
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+from .base import PipelineComponent
+from .. import status
+
+SAFE_METHODS = ['GET', 'HEAD']
+
+class ConditionalRequests(PipelineComponent):
+    """
+    Evaluates a request's preconditions against its Resource's (the 
+    context's) validators before the method is called, answering 
+    NotModified or PreconditionFailed directly.
+    
+    The Resource provides validators with the optional methods etag(), 
+    returning an entity tag as (opaque-tag, weak), and last_modified(),
+    returning seconds since the epoch; either may return None. They're 
+    called once per request, so should be cheap. Validators are also 
+    set on successful responses that don't already have them.
+    
+    NotModified responses carry the Vary, Cache-Control and Expires
+    already set on the response (RFC 7232 4.1), and the Resource's 
+    cache_control if it has no Cache-Control yet (see 
+    feature.cache.CachePolicy, which only sees successful responses).
+    
+    If-Range is left to range processing.
+    """
+    def receive_request(self, request, response):
+        headers = request.headers
+        resource = self.context
+        etag = last_modified = None
+        if resource.etag is not None:
+            etag = resource.etag()
+        if resource.last_modified is not None:
+            last_modified = resource.last_modified()
+        request.validators = etag, last_modified
+        if headers.has_key('If-Match'):
+            if not match_etag(headers['If-Match'], etag, strong=True):
+                raise self.failed(request)
+        elif headers.has_key('If-Unmodified-Since'):
+            date = headers['If-Unmodified-Since']
+            if date is not None and last_modified is not None and \
+              last_modified > date:
+                raise self.failed(request)
+        safe = request.method in SAFE_METHODS
+        if headers.has_key('If-None-Match'):
+            if match_etag(headers['If-None-Match'], etag, strong=False):
+                if safe:
+                    raise self.not_modified(request, response)
+                raise self.failed(request)
+        elif safe and headers.has_key('If-Modified-Since'):
+            date = headers['If-Modified-Since']
+            if date is not None and last_modified is not None and \
+              last_modified <= date:
+                raise self.not_modified(request, response)
+            
+    def send_response(self, request, response):
+        if not isinstance(response, status.Successful):
+            return
+        if request.method in SAFE_METHODS:
+            etag, last_modified = request.validators
+        else:
+            etag, last_modified = None, None
+            if self.context.etag is not None:
+                etag = self.context.etag()
+            if self.context.last_modified is not None:
+                last_modified = self.context.last_modified()
+        _set_validators(response, etag, last_modified)
+            
+    def not_modified(self, request, response):
+        not_modified = status.NotModified()
+        for field in ['Vary', 'Cache-Control', 'Expires']:
+            if response.headers.has_key(field):
+                not_modified.headers.data[field] = response.headers.data[field]
+        cache_control = getattr(self.context, 'cache_control', None)
+        if cache_control is not None and \
+          not not_modified.headers.has_key('Cache-Control'):
+            not_modified.headers['Cache-Control'] = cache_control
+        _set_validators(not_modified, *request.validators)
+        return not_modified.exception
+        
+    def failed(self, request):
+        return status.PreconditionFailed().exception
+
+
+def match_etag(tags, etag, strong):
+    """
+    Whether etag is in tags (an If-Match or If-None-Match value), using
+    the strong or weak comparison function.
+    """
+    if tags.has_key('*'):
+        return True
+    if etag is None:
+        return False
+    tag, weak = etag
+    if not tags.has_key(tag):
+        return False
+    return not strong or not (weak or tags[tag])
+
+def _set_validators(response, etag, last_modified):
+    if etag is not None and not response.headers.has_key('ETag'):
+        response.headers['ETag'] = etag
+    if last_modified is not None and not response.headers.has_key('Last-Modified'):
+        response.headers['Last-Modified'] = last_modified
@@ -1,4 +1,230 @@
-#!/usr/bin/env python
+"""
+http.feature.conneg - server-driven content negotiation.
+"""
 
-from common import PipelineComponent
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
 
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import string
+from .base import PipelineComponent
+from ..header.registry import field_map, get_field_name
+from ..lru import LRUCache
+from .. import status
+
+_none = object()
+
+class Dimension:
+    """
+    Negotiation on one Accept-* request header.
+
+    A variant's quality is the q-value of the most specific range in
+    the header that matches it (RFC 2616 14.1-14.4); the best variant
+    with a quality above zero is chosen, with ties going to the one
+    listed first. Decisions are remembered per header value and tuple
+    of variants, since the same few header values are seen over and
+    over.
+
+    @ivar field_name: the request header negotiated on
+    @ivar decisions: (header value, variants) -> chosen variant
+    @type decisions: L{LRUCache}
+    @ivar implicit: a value acceptable at q=1 unless the header
+      mentions it (or "*")
+    """
+    def __init__(self, field_name, normalize=string.lower, implicit=None,
+      max_items=1000):
+        self.field_name = get_field_name(field_name)
+        self.normalize = normalize
+        self.implicit = implicit
+        self.decisions = LRUCache(max_items)
+
+    def choose(self, accept, variants):
+        """
+        Return the best of variants (a tuple of normalized values) for
+        accept, a raw header value, or None if none are acceptable. If
+        accept is empty, every variant is acceptable.
+        """
+        if not accept:
+            return variants and variants[0] or None
+        key = (accept, variants)
+        choice = self.decisions.get(key, _none)
+        if choice is _none:
+            choice = self.decide(self.preferences(accept), variants)
+            self.decisions.set(key, choice)
+        return choice
+
+    def preferences(self, accept):
+        """
+        Parse a header value into (range, q-value) pairs, most specific
+        range first.
+        """
+        try:
+            parsed = field_map[self.field_name]._parse(accept)
+        except Exception:
+            return []
+        prefs = []
+        for value, params in parsed.items():
+            try:
+                q = float(params.get('q', None) or 1)
+            except ValueError:
+                q = 0.0
+            prefs.append((self.normalize(value), q))
+        if self.implicit is not None:
+            ranges = [value for value, q in prefs]
+            if self.implicit not in ranges and '*' not in ranges:
+                prefs.append((self.implicit, 1.0))
+        prefs.sort(key=lambda pref: self.specificity(pref[0]), reverse=True)
+        return prefs
+
+    def decide(self, prefs, variants):
+        best, best_q = None, 0.0
+        for variant in variants:
+            for value, q in prefs:
+                if self.match(value, variant):
+                    if q > best_q:
+                        best, best_q = variant, q
+                    break
+        return best
+
+    def specificity(self, value):
+        return value != '*'
+
+    def match(self, value, variant):
+        return value == '*' or value == variant
+
+
+class MediaTypes(Dimension):
+    """
+    Negotiation on Accept. Media types and ranges are normalized by
+    normalize (e.g., "text/html" to "text_html"); "*/*" as a variant
+    stands for an unspecified type, and matches only "*/*".
+    """
+    def __init__(self, normalize, max_items=1000):
+        Dimension.__init__(self, 'Accept', normalize, max_items=max_items)
+        self.any = normalize("*/*")
+        self.wild = normalize("x/*")[1:]
+
+    def specificity(self, value):
+        if value == self.any:
+            return 0
+        if value.endswith(self.wild):
+            return 1
+        return 2
+
+    def match(self, value, variant):
+        if value == self.any or value == variant:
+            return True
+        return value.endswith(self.wild) and variant.startswith(value[:-1])
+
+
+class Languages(Dimension):
+    """
+    Negotiation on Accept-Language; a range matches a tag equal to it,
+    or starting with it followed by "-" (e.g., "en" matches "en-gb").
+    """
+    def __init__(self, max_items=1000):
+        Dimension.__init__(self, 'Accept-Language', max_items=max_items)
+
+    def specificity(self, value):
+        if value == '*':
+            return 0
+        return len(value)
+
+    def match(self, value, variant):
+        return value == '*' or value == variant or \
+          variant[:len(value) + 1] == value + '-'
+
+
+languages = Languages()
+charsets = Dimension('Accept-Charset', implicit='iso-8859-1')
+encodings = Dimension('Accept-Encoding', implicit='identity')
+
+
+class ContentNegotiation(PipelineComponent):
+    """
+    Chooses the language and charset of a Resource's (the context's)
+    response, from its languages and charsets class attributes (tuples,
+    in order of preference) and the request's Accept-Language and
+    Accept-Charset. The choices are set as request.language and
+    request.charset for methods to use, and as Content-Language and
+    the Content-Type charset of successful responses (unless they're
+    already set). If nothing is acceptable, the response is
+    NotAcceptable.
+
+    Media types are negotiated by the Resource's method dispatcher (see
+    server.api.Resource.MethodDispatcher) with the same engine.
+    """
+    def __init__(self, context):
+        PipelineComponent.__init__(self, context)
+        self.languages, self.charsets = available(context.__class__)
+
+    def receive_request(self, request, response):
+        request.language = request.charset = None
+        vary = []
+        if self.languages:
+            request.language = self.negotiate(languages, request,
+              self.languages, vary)
+        if self.charsets:
+            request.charset = self.negotiate(charsets, request,
+              self.charsets, vary)
+        if vary:
+            response.headers['Vary'] = response.headers.get('Vary', []) + vary
+
+    def negotiate(self, dimension, request, variants, vary):
+        if len(variants) > 1:
+            vary.append(dimension.field_name)
+        choice = dimension.choose(request.headers.data.get(dimension.field_name),
+          variants)
+        if choice is None:
+            not_acceptable = status.NotAcceptable()
+            if vary:
+                not_acceptable.headers['Vary'] = vary
+            raise not_acceptable.exception
+        return choice
+
+    def send_response(self, request, response):
+        if not isinstance(response, status.Successful):
+            return
+        if request.language is not None and \
+          not response.headers.has_key('Content-Language'):
+            response.headers['Content-Language'] = [request.language]
+        content_type = response.headers.get('Content-Type')
+        if request.charset is not None and content_type is not None and \
+          not content_type[1].has_key('charset'):
+            content_type[1]['charset'] = request.charset
+            response.headers['Content-Type'] = content_type
+
+
+_available = {}
+def available(cls):
+    """
+    Return a Resource class's (languages, charsets), normalized; 
+    computed once per class.
+    """
+    try:
+        return _available[cls]
+    except KeyError:
+        variants = _available[cls] = (
+          tuple([language.lower() for language in cls.languages or ()]),
+          tuple([charset.lower() for charset in cls.charsets or ()]))
+        return variants
@@ -1,13 +1,195 @@
+"""
+http.feature.content_code - compressing response bodies with content-codings.
+"""
 
-from common import PipelineComponent
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import zlib
+from .base import PipelineComponent
+from .conneg import encodings
+from .etag import vary_key
+from ..lru import LRUCache
+
+# wbits for each coding; "deflate" is the zlib format (RFC 2616 3.5)
+CODINGS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
 
 class ContentCode(PipelineComponent):
-    def send_request(self, request, response):
-        request.headers['Accept-Encoding']
-    def receive_request(self, request, response):
-        if request.headers['Accept-Encoding']
+    """
+    Compresses the bodies of successful GET (and HEAD) responses with
+    gzip or deflate, according to the request's Accept-Encoding.
+    Streamed bodies are compressed as they're sent, a piece at a time.
+
+    Bodies shorter than min_size, and media types starting with one of
+    skip_types (which are usually compressed already), aren't coded.
+    Compressible responses get Vary: Accept-Encoding, whether or not
+    this request's was coded. A strong ETag on a coded response is
+    made weak, so that it still validates the identity response's tag
+    with If-None-Match. Requests with a Range header aren't coded, so
+    that ranges of the identity body can be served.
+
+    Coded bodies of responses with an ETag are kept per URI, ETag,
+    coding and the request's values of the other headers the response
+    varies on (bucketed by vary_keys, a L{feature.vary.VaryKeys}, if
+    given), so that a representation is only compressed once while
+    its ETag is unchanged. Bodies no longer than max_variant_size are
+    compressed at once; longer ones (which are usually files) are
+    compressed as they're sent, and kept if the result is small 
+    enough. HEAD responses use a kept body if there is one, but
+    nothing is compressed for them.
+
+    Add it to the server adapter's pipeline before AutoETag (like
+    RangeRequests); send_response hooks run last component first, so
+    it then sees responses once AutoETag has tagged them.
+
+    @ivar variants: (URI, opaque-tag, coding, Vary key) -> coded body
+    @type variants: L{LRUCache}
+    @ivar level: zlib compression level
+    @type level: int
+    @ivar min_size: bodies (of known length) shorter than this aren't coded
+    @type min_size: int
+    @ivar max_variant_size: coded bodies longer than this aren't kept
+    @type max_variant_size: int
+    @cvar codings: the codings to negotiate, in order of preference
+    @type codings: tuple
+    @cvar skip_types: media type prefixes that aren't coded
+    @type skip_types: list
+    """
+    codings = ('gzip', 'deflate', 'x-gzip', 'identity')
+    skip_types = ['image/', 'audio/', 'video/', 'application/zip',
+      'application/gzip', 'application/x-gzip', 'application/x-bzip2',
+      'application/x-compress', 'application/octet-stream']
+
+    def __init__(self, context, level=6, min_size=256, max_items=1000,
+      max_size=32 * 1024 * 1024, max_variant_size=1024 * 1024,
+      vary_keys=None):
+        PipelineComponent.__init__(self, context)
+        self.vary_keys = vary_keys
+        self.level = level
+        self.min_size = min_size
+        self.max_variant_size = max_variant_size
+        self.variants = LRUCache(max_items, max_size=max_size)
+
     def send_response(self, request, response):
-        response.headers['Content-Encoding']
-    def receive_response(self, request, response):
-        if response.headers['Content-Encoding']
-        
\ No newline at end of file
+        if request.method not in ['GET', 'HEAD'] or \
+          response.status_code != 200 or \
+          response.headers.has_key('Content-Encoding') or \
+          not response.has_content:
+            return
+        length = response.body_length
+        if length is not None and length < self.min_size:
+            return
+        content_type = response.headers.get('Content-Type', [None, {}])[0]
+        if content_type is None or self.skip(content_type.lower()):
+            return
+        vary = response.headers.get('Vary', [])
+        if '*' in vary:
+            return
+        if 'accept-encoding' not in [field.lower() for field in vary]:
+            response.headers['Vary'] = vary + ['Accept-Encoding']
+        coding = self.choose(request.headers.data.get('Accept-Encoding'))
+        if coding is None or request.headers.has_key('Range'):
+            return
+        response.headers['Content-Encoding'] = [coding]
+        if response.headers.has_key('Content-Length'):
+            del response.headers['Content-Length']
+        etag = response.headers.get('ETag')
+        if etag is None:
+            response.body_iter = compress(response.body_iter, coding, self.level)
+            return
+        if not etag[1]:
+            response.headers['ETag'] = (etag[0], True)
+        fields = tuple([field for field in vary
+          if field.lower() != 'accept-encoding'])
+        if self.vary_keys is not None:
+            varied = self.vary_keys.key(request, fields)
+        else:
+            varied = vary_key(request, fields)
+        key = (request.uri, etag[0], coding, varied)
+        body = self.variants.get(key)
+        if body is not None:
+            response.body = body
+        elif request.method == 'HEAD':
+            # the body isn't sent, so the generator isn't started
+            response.body_iter = compress(response.body_iter, coding, self.level)
+        elif length is not None and length <= self.max_variant_size:
+            body = "".join(compress([response.body], coding, self.level))
+            self.store(key, body)
+            response.body = body
+        else:
+            response.body_iter = self._keep(key,
+              compress(response.body_iter, coding, self.level))
+
+    def skip(self, content_type):
+        """Whether content_type (lowercase) shouldn't be coded."""
+        for prefix in self.skip_types:
+            if content_type[:len(prefix)] == prefix:
+                return True
+        return False
+
+    def choose(self, accept):
+        """
+        Return the coding to use for an Accept-Encoding value, or None
+        for identity.
+        """
+        if not accept:
+            return None
+        coding = encodings.choose(accept, self.codings)
+        if coding == 'identity':
+            return None
+        return coding
+
+    def store(self, key, body):
+        if len(body) <= self.max_variant_size:
+            self.variants.set(key, body, size=len(body))
+
+    def _keep(self, key, body_iter):
+        pieces, size = [], 0
+        for data in body_iter:
+            if pieces is not None:
+                size += len(data)
+                if size > self.max_variant_size:
+                    pieces = None
+                else:
+                    pieces.append(data)
+            yield data
+        if pieces is not None:
+            self.store(key, "".join(pieces))
+
+
+def compress(body_iter, coding, level=6):
+    """
+    Compress the strings from body_iter with a content-coding, yielding
+    the coded data as it becomes available.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, CODINGS[coding])
+    for data in body_iter:
+        data = compressor.compress(data)
+        if data:
+            yield data
+    yield compressor.flush()
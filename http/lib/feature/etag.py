@@ -0,0 +1,139 @@
+"""
+http.feature.etag - strong entity tags generated by hashing response
+bodies.
+"""
+
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+from hashlib import md5
+from .base import PipelineComponent
+from .conditional import match_etag, SAFE_METHODS
+from ..header.registry import get_field_name
+from ..lru import LRUCache
+from .. import status
+
+class AutoETag(PipelineComponent):
+    """
+    Gives successful GET responses without an ETag a strong one, by 
+    hashing the body as it's sent. The ETag of a string body, or of a
+    body_file that can be sliced (see server.spool.FileBody), which is
+    read in blocks from a slice, is set as a header; a streamed body's
+    is sent as a trailer (when the response is chunked).
+    
+    Tags are remembered per URI and Vary key, so that later requests 
+    with a matching If-None-Match are answered with NotModified before
+    the Resource's method is called. An unsafe request to a URI forgets
+    its tags; other changes to Resources are only noticed once a tag 
+    expires (after max_age seconds) or is replaced, so set max_age 
+    accordingly.
+    
+    Usually added to the server adapter's pipeline.
+    
+    @ivar tags: URI -> (Vary field-names, {Vary key: entity tag})
+    @type tags: L{LRUCache}
+    @ivar vary_keys: computes Vary keys, if given (see feature.vary)
+    @type vary_keys: L{feature.vary.VaryKeys}
+    """
+    def __init__(self, context, max_items=10000, max_age=60, vary_keys=None):
+        PipelineComponent.__init__(self, context)
+        self.tags = LRUCache(max_items, max_age)
+        self.vary_keys = vary_keys
+        
+    def receive_request(self, request, response):
+        if request.method not in SAFE_METHODS or \
+          not request.headers.has_key('If-None-Match'):
+            return
+        entry = self.tags.get(request.uri)
+        if entry is None:
+            return
+        fields, etags = entry
+        etag = etags.get(self.vary_key(request, fields))
+        if etag is not None and match_etag(request.headers['If-None-Match'], etag, False):
+            not_modified = status.NotModified()
+            not_modified.headers['ETag'] = etag
+            if fields:
+                not_modified.headers['Vary'] = list(fields)
+            raise not_modified.exception
+            
+    def send_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            self.tags.pop(request.uri)
+            return
+        if request.method != 'GET' or response.status_code != 200 or \
+          response.headers.has_key('ETag'):
+            return
+        fields = tuple(response.headers.get('Vary', []))
+        if '*' in fields:
+            return
+        body_file = response.body_file
+        if body_file is not None and hasattr(body_file, 'slice'):
+            digest = md5()
+            for data in body_file.slice(0, body_file.length - 1):
+                digest.update(data)
+            etag = (digest.hexdigest(), False)
+            response.headers['ETag'] = etag
+            self.store(request, fields, etag)
+        elif body_file is None and response.body_length is not None:
+            etag = (md5(response.body or "").hexdigest(), False)
+            response.headers['ETag'] = etag
+            self.store(request, fields, etag)
+        else:
+            trailer = response.headers.get('Trailer', [])
+            if 'ETag' not in trailer:
+                response.headers['Trailer'] = trailer + ['ETag']
+            response.body_iter = self._hash(request, response, fields, 
+              response.body_iter)
+            
+    def store(self, request, fields, etag):
+        """Remember etag for request's URI and Vary key."""
+        entry = self.tags.get(request.uri)
+        if entry is None or entry[0] != fields:
+            entry = (fields, {})
+            self.tags.set(request.uri, entry)
+        entry[1][self.vary_key(request, fields)] = etag
+
+    def vary_key(self, request, fields):
+        if self.vary_keys is not None:
+            return self.vary_keys.key(request, fields)
+        return vary_key(request, fields)
+        
+    def _hash(self, request, response, fields, body_iter):
+        digest = md5()
+        for data in body_iter:
+            digest.update(data)
+            yield data
+        etag = (digest.hexdigest(), False)
+        response.trailers['ETag'] = etag
+        self.store(request, fields, etag)
+
+
+def vary_key(request, fields):
+    """
+    The values of the request headers named by fields (e.g., from the
+    response's Vary header), as a hashable key.
+    """
+    values = request.headers.data
+    return tuple([values.get(get_field_name(field)) for field in fields])
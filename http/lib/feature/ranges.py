@@ -0,0 +1,198 @@
+"""
+http.feature.ranges - byte range requests.
+"""
+
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import random, re
+from .base import PipelineComponent
+from .. import status
+
+linesep = "\r\n"
+
+# a byte-range-spec or suffix-byte-range-spec
+BYTE_RANGE_SPEC = re.compile(r"^[ \t]*(?:\d+-\d*|-\d+)[ \t]*$")
+
+class RangeRequests(PipelineComponent):
+    """
+    Serves Range requests from successful GET responses whose body can
+    be sliced without reading the rest of it: string bodies, and 
+    body_files with a slice() method (see server.spool.FileBody).
+    
+    Overlapping and adjacent ranges are coalesced; one range gives a 
+    single-part PartialContent response, several give a streamed 
+    multipart/byteranges one. If-Range is checked against the 
+    response's ETag (strongly) or Last-Modified.
+    
+    Usually added to the server adapter's pipeline; if AutoETag is 
+    used, add this before it, so that the ETag is of the whole body.
+    
+    @ivar max_ranges: requests for more ranges (after coalescing) than
+      this get the whole body
+    @type max_ranges: int
+    """
+    def __init__(self, context, max_ranges=20):
+        PipelineComponent.__init__(self, context)
+        self.max_ranges = max_ranges
+        
+    def send_response(self, request, response):
+        if request.method != 'GET' or response.status_code != 200:
+            return
+        length = response.body_length
+        if not length or (response.body_file is not None and \
+          not hasattr(response.body_file, 'slice')):
+            return
+        response.headers['Accept-Ranges'] = ['bytes']
+        if not request.headers.has_key('Range') or \
+          not valid(request.headers.data['Range']):
+            return
+        if request.headers.has_key('If-Range') and \
+          not self.if_range(request.headers['If-Range'], response):
+            return
+        ranges = coalesce(request.headers['Range'], length)
+        if ranges is None or len(ranges) > self.max_ranges:
+            return
+        if not ranges:
+            unsatisfiable = status.RequestedRangeNotSatisfiable()
+            unsatisfiable.headers['Content-Range'] = (None, None, length)
+            raise unsatisfiable.exception
+        if len(ranges) == 1:
+            first, last = ranges[0]
+            self.partial(response, _slice(response, first, last), last - first + 1)
+            response.headers['Content-Range'] = (first, last, length)
+        else:
+            self.multipart(response, ranges, length)
+            
+    def if_range(self, validator, response):
+        """Whether validator (an If-Range value) matches the response."""
+        if validator['type'] == 'etag':
+            etag = response.headers.get('ETag')
+            return etag is not None and not etag[1] and \
+              not validator['weak'] and validator['value'] == etag[0]
+        last_modified = response.headers.get('Last-Modified')
+        return last_modified is not None and validator['value'] == last_modified
+        
+    def partial(self, response, body, length):
+        response.__class__ = status.PartialContent
+        if isinstance(body, str):
+            response.body = body
+        elif hasattr(body, 'read'):
+            response.body_file = body
+        else:
+            response.body_iter = body
+        response.headers['Content-Length'] = length
+            
+    def multipart(self, response, ranges, length):
+        boundary = "%032x" % random.getrandbits(128)
+        content_type = response.headers.data.get('Content-Type')
+        heads = []
+        size = 0
+        for first, last in ranges:
+            head = [linesep + "--" + boundary]
+            if content_type:
+                head.append("Content-Type: " + content_type)
+            head.append("Content-Range: bytes %s-%s/%s" % (first, last, length))
+            head = linesep.join(head) + linesep * 2
+            heads.append(head)
+            size += len(head) + last - first + 1
+        tail = linesep + "--" + boundary + "--" + linesep
+        parts = [(head, _slice(response, first, last)) 
+          for head, (first, last) in zip(heads, ranges)]
+        self.partial(response, _multipart(parts, tail), size + len(tail))
+        response.headers['Content-Type'] = ['multipart/byteranges', 
+          {'boundary': boundary}]
+
+
+def valid(value):
+    """
+    Whether a raw Range header value is a syntactically valid list of 
+    byte ranges; if it isn't, the whole header is ignored.
+    """
+    value = value.strip()
+    if value[:6].lower() != 'bytes=':
+        return False
+    specs = [spec for spec in value[6:].split(",") if spec.strip()]
+    if not specs:
+        return False
+    for spec in specs:
+        if BYTE_RANGE_SPEC.match(spec) is None:
+            return False
+    return True
+
+def coalesce(ranges, length):
+    """
+    Resolve Range header values against a body of length bytes. Returns
+    a sorted list of (first, last) byte positions, with overlapping and 
+    adjacent ranges merged; an empty list if none are satisfiable; or 
+    None if the ranges are invalid (and so should be ignored).
+    """
+    if not ranges:
+        return None
+    resolved = []
+    for first, last in ranges:
+        if first is None:
+            if last is None:
+                return None
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            first, last = max(0, length - suffix), length - 1
+        else:
+            first = int(first)
+            if last is None:
+                last = length - 1
+            else:
+                last = int(last)
+                if last < first:
+                    return None
+                last = min(last, length - 1)
+            if first >= length:
+                continue
+        resolved.append((first, last))
+    resolved.sort()
+    coalesced = []
+    for first, last in resolved:
+        if coalesced and first <= coalesced[-1][1] + 1:
+            if last > coalesced[-1][1]:
+                coalesced[-1] = (coalesced[-1][0], last)
+        else:
+            coalesced.append((first, last))
+    return coalesced
+
+def _slice(response, first, last):
+    if response.body_file is not None:
+        return response.body_file.slice(first, last)
+    return response.body[first:last + 1]
+
+def _multipart(parts, tail):
+    for head, body in parts:
+        yield head
+        if isinstance(body, str):
+            yield body
+        else:
+            for data in body:
+                yield data
+    yield tail
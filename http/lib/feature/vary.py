@@ -0,0 +1,170 @@
+"""
+http.feature.vary - normalizing request headers named by Vary.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import threading
+from .conneg import encodings
+from .content_code import ContentCode
+from ..header.registry import field_map, get_field_name
+from ..lru import LRUCache
+
+_none = object()
+
+class VaryKeys:
+    """
+    Computes Vary keys (see feature.etag.vary_key()) from buckets
+    rather than raw header values, so that requests whose headers are
+    formatted differently but would get the same response share cache
+    entries.
+
+    A bucket function takes a raw header value (or None, if the header
+    is absent) and returns a hashable bucket; requests in the same
+    bucket must get the same response. Headers without one are used
+    as they are. Buckets are remembered per raw value, and the number
+    of distinct raw values seen for each bucket is counted (while they
+    are remembered; values evicted and seen again are counted again).
+
+    @ivar buckets: field-name -> bucket function
+    @type buckets: dict
+    @ivar seen: (field-name, raw value) -> bucket
+    @type seen: L{LRUCache}
+    @ivar collapsed: (field-name, bucket) -> number of raw values
+    @type collapsed: dict
+    """
+    def __init__(self, buckets=None, max_items=10000):
+        if buckets is None:
+            buckets = default_buckets()
+        self.buckets = {}
+        for field_name, bucket in buckets.items():
+            self.register(field_name, bucket)
+        self.seen = LRUCache(max_items)
+        self.collapsed = {}
+        self._lock = threading.Lock()
+
+    def register(self, field_name, bucket):
+        """Use bucket (a function, or None for raw values) for field_name."""
+        field_name = get_field_name(field_name)
+        if bucket is None:
+            self.buckets.pop(field_name, None)
+        else:
+            self.buckets[field_name] = bucket
+
+    def key(self, request, fields):
+        """The Vary key of request for fields (a tuple of field-names)."""
+        values = request.headers.data
+        key = []
+        for field in fields:
+            field_name = get_field_name(field)
+            value = values.get(field_name)
+            if self.buckets.has_key(field_name):
+                value = self.bucket(field_name, value)
+            key.append(value)
+        return tuple(key)
+
+    def bucket(self, field_name, value):
+        """Return the bucket of a raw value of field_name."""
+        bucket = self.seen.get((field_name, value), _none)
+        if bucket is _none:
+            bucket = self.buckets[field_name](value)
+            self.seen.set((field_name, value), bucket)
+            self._lock.acquire()
+            try:
+                self.collapsed[(field_name, bucket)] = \
+                  self.collapsed.get((field_name, bucket), 0) + 1
+            finally:
+                self._lock.release()
+        return bucket
+
+    def stats(self):
+        """
+        Return {field-name: {bucket: number of raw values}} for the
+        values seen so far.
+        """
+        out = {}
+        self._lock.acquire()
+        try:
+            for (field_name, bucket), count in self.collapsed.items():
+                out.setdefault(field_name, {})[bucket] = count
+        finally:
+            self._lock.release()
+        return out
+
+
+def canonical(field_name):
+    """
+    Return a bucket function for a header of (token, parameters) pairs,
+    such as Accept-*, that ignores case, order, whitespace and default
+    q-values.
+    """
+    parse = field_map[get_field_name(field_name)]._parse
+    def bucket(value):
+        if not value:
+            return None
+        try:
+            parsed = parse(value)
+        except Exception:
+            return value
+        items = []
+        for token, params in parsed.items():
+            params = params.copy()
+            try:
+                q = float(params.pop('q', None) or 1)
+            except ValueError:
+                q = 0.0
+            params = params.items()
+            params.sort()
+            items.append((token.lower(), q, tuple(params)))
+        items.sort()
+        return tuple(items)
+    return bucket
+
+def negotiated(dimension, variants):
+    """
+    Return a bucket function giving the variant that dimension (see
+    feature.conneg) would choose for a header value, e.g. the language
+    a Resource would respond in. Absent and empty values are in their
+    own bucket, None.
+    """
+    variants = tuple(variants)
+    def bucket(value):
+        if not value:
+            return None
+        return dimension.choose(value, variants)
+    return bucket
+
+def default_buckets():
+    """
+    Accept-Encoding is bucketed by the coding feature.content_code
+    would choose; Accept, Accept-Charset and Accept-Language by their
+    canonical form.
+    """
+    return {
+        'Accept-Encoding': negotiated(encodings, ContentCode.codings),
+        'Accept': canonical('Accept'),
+        'Accept-Charset': canonical('Accept-Charset'),
+        'Accept-Language': canonical('Accept-Language'),
+    }
@@ -61,6 +61,26 @@ class Headers(UserDict):
             else:
                 self.data[f_name] = f_value.strip()
 
+    def parseCGI(self, env=None):
+        """
+        Parse request headers from the environment (or other 
+        similarly structured dictionary), as per the CGI specification.
+        
+        @param env: environment variables (defaults to current environment)
+        @type env: dict
+        """
+        if env is None:
+            env = os.environ
+        for f_name, f_value in env.items():
+            if f_name in ['CONTENT_TYPE', 'CONTENT_LENGTH']:
+                pass
+            elif f_name[:5] == 'HTTP_':
+                f_name = f_name[5:]
+            else:
+                continue
+            if f_value:
+                self.data[get_field_name(f_name.replace('_', '-'))] = f_value
+
     def __str__(self):
         o = []
         for f in self.data.items():
@@ -68,7 +88,7 @@ class Headers(UserDict):
                 o.append("%s: %s" % f)
             except:
                 self.error_handler.handle_error(self)
-            o.append("")
+        o.append("")
         return linesep.join(o)
 
     def __getitem__(self, key):
@@ -88,8 +108,16 @@ class Headers(UserDict):
 
 
 class HeaderValues(Headers):
+    """
+    Headers whose values are parsed when they're read.
+
+    @ivar parses: the number of values parsed
+    @type parses: int
+    """
+    parses = 0
     def __getitem__(self, key):
         key = get_field_name(key)
+        self.parses += 1
         return field_map.get(key, UnknownHeader)._parse(self.data[key])
 
     def __setitem__(self, key, value):        
@@ -97,8 +125,12 @@ class HeaderValues(Headers):
         self.data[key] = field_map.get(key, UnknownHeader)._asString(value)
 
     def get(self, key, failobj=None):
-        pass
-    
+        key = get_field_name(key)
+        if not self.data.has_key(key):
+            return failobj
+        self.parses += 1
+        return field_map.get(key, UnknownHeader)._parse(self.data[key])
+
 
 #####################################################################
     
@@ -219,7 +251,7 @@ class HeaderDict(UserDict):
                     o.append("%s: %s" % (f_name, f_value.string))
             except:
                 self.error_handler.handle_error(self)
-            o.append("")
+        o.append("")
         return linesep.join(o)
             
     def __getitem__(self, key):
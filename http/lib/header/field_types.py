@@ -38,7 +38,7 @@ from . import registry, error
 TOKEN = r'(?:[^\(\)<>@,;:\\"/\[\]\?={} \t]+?)'
 QUOTED_STRING = r'(?:"(?:\\"|[^"])*")'
 PARAMETER = r'(?:%(TOKEN)s(?:=(?:%(TOKEN)s|%(QUOTED_STRING)s))?)' % locals()
-STRPARAM = r'(?:\S+(?:\s*;\s*%(PARAMETER)s)*)' % locals()
+STRPARAM = r'(?:[^\s,;]+(?:\s*;\s*%(PARAMETER)s)*)' % locals()
 PRODUCT = r'(?:%(TOKEN)s(?:/%(TOKEN)s)?)' % locals()
 COMMENT = r'(?:\((?:[^\(\)]|\\\(|\\\))*\))' # does not handle nesting
 HTTP_DATE = r'(?:\w{3}, \d{2} \w{3} \d{4} \d{2}:\d{2}:\d{2} GMT|\w{6,9}, \d{2}\-\w{3}\-\d{2} \d{2}:\d{2}:\d{2} GMT|\w{3} \w{3} [\d ]\d \d{2}:\d{2}:\d{2} \d{4})'
@@ -620,6 +620,8 @@ class ContentRange(FieldValue):
             first_byte_pos, last_byte_pos = [int(i) for i in byte_range_resp.split('-')]
         if instance_length == '*':
             instance_length = None
+        else:
+            instance_length = int(instance_length)
         return (first_byte_pos, last_byte_pos, instance_length)
 
     def _asString(cls, data):
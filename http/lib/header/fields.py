@@ -450,7 +450,7 @@ class IfUnmodifiedSinceHeader(ft.HttpDate):
 
     If-Unmodified-Since = "If-Unmodified-Since" ":" HTTP-date
     """
-    field_name = "If-Unmodifed-Since"
+    field_name = "If-Unmodified-Since"
 
 class IMHeader(ft.HttpTokenList):
     """
@@ -0,0 +1,176 @@
+"""
+http.lru - bounded least-recently-used caches.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import time, threading
+
+_PREV, _NEXT, _KEY, _VALUE, _EXPIRES, _SIZE = range(6)
+
+class LRUCache:
+    """
+    A dictionary-like cache that evicts the least recently used entries
+    when it holds more than max_items entries (or, if max_size is set,
+    more than max_size in total entry size), and entries older than
+    max_age seconds. Safe to share between threads.
+
+    @ivar max_items: maximum number of entries
+    @type max_items: int
+    @ivar max_size: maximum total size of entries, or None
+    @type max_size: int
+    @ivar max_age: default entry lifetime in seconds, or None for no limit
+    @type max_age: number
+    @ivar on_evict: called with (key, value) when an entry is evicted or
+      expires (not when it is replaced or popped)
+    @ivar hits: number of successful lookups
+    @ivar misses: number of failed lookups
+    @ivar size: current total size of entries
+    """
+    def __init__(self, max_items=1000, max_age=None, max_size=None, on_evict=None):
+        self.max_items = max_items
+        self.max_age = max_age
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self.hits = self.misses = 0
+        self.size = 0
+        self._lock = threading.RLock()
+        self._map = {}
+        self._root = root = [None, None, None, None, None, 0]
+        root[_PREV] = root[_NEXT] = root
+
+    def get(self, key, failobj=None):
+        """Return the value for key and mark it as recently used."""
+        self._lock.acquire()
+        try:
+            node = self._map.get(key, None)
+            if node is None:
+                self.misses += 1
+                return failobj
+            if node[_EXPIRES] is None or node[_EXPIRES] > time.time():
+                self._unlink(node)
+                self._link(node)
+                self.hits += 1
+                return node[_VALUE]
+            self._unlink(node)
+            self.misses += 1
+        finally:
+            self._lock.release()
+        self._evicted(node)
+        return failobj
+
+    def set(self, key, value, size=1, max_age=None):
+        """
+        Store value under key, evicting other entries as necessary.
+
+        @param size: the entry's size, counted against max_size
+        @param max_age: entry lifetime in seconds; defaults to self.max_age
+        """
+        if max_age is None:
+            max_age = self.max_age
+        if max_age is None:
+            expires = None
+        else:
+            expires = time.time() + max_age
+        evicted = []
+        self._lock.acquire()
+        try:
+            old = self._map.get(key, None)
+            if old is not None:
+                self._unlink(old)
+            node = [None, None, key, value, expires, size]
+            self._link(node)
+            root = self._root
+            while len(self._map) > self.max_items or \
+              (self.max_size is not None and self.size > self.max_size \
+              and root[_PREV] is not node):
+                lru = root[_PREV]
+                self._unlink(lru)
+                evicted.append(lru)
+        finally:
+            self._lock.release()
+        for node in evicted:
+            self._evicted(node)
+
+    def pop(self, key, failobj=None):
+        """Remove key and return its value."""
+        self._lock.acquire()
+        try:
+            node = self._map.get(key, None)
+            if node is None:
+                return failobj
+            self._unlink(node)
+            return node[_VALUE]
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Evict every entry."""
+        self._lock.acquire()
+        try:
+            nodes = self._map.values()
+            for node in nodes:
+                self._unlink(node)
+        finally:
+            self._lock.release()
+        for node in nodes:
+            self._evicted(node)
+
+    def items(self):
+        """Return (key, value) pairs, most recently used first."""
+        self._lock.acquire()
+        try:
+            out = []
+            node = self._root[_NEXT]
+            while node is not self._root:
+                out.append((node[_KEY], node[_VALUE]))
+                node = node[_NEXT]
+            return out
+        finally:
+            self._lock.release()
+
+    def has_key(self, key):
+        return self._map.has_key(key)
+
+    def __len__(self):
+        return len(self._map)
+
+    def _link(self, node):
+        root = self._root
+        node[_PREV], node[_NEXT] = root, root[_NEXT]
+        root[_NEXT][_PREV] = node
+        root[_NEXT] = node
+        self._map[node[_KEY]] = node
+        self.size += node[_SIZE]
+
+    def _unlink(self, node):
+        node[_PREV][_NEXT] = node[_NEXT]
+        node[_NEXT][_PREV] = node[_PREV]
+        del self._map[node[_KEY]]
+        self.size -= node[_SIZE]
+
+    def _evicted(self, node):
+        if self.on_evict is not None:
+            self.on_evict(node[_KEY], node[_VALUE])
@@ -26,6 +26,7 @@ SOFTWARE.
 
 __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
 
+import time
 from .header import collection
 
 linesep = "\r\n" #TODO: out to a utility lib
@@ -38,6 +39,10 @@ class _BodyString(object):
                 return None
             else:
                 obj._body = ''.join(obj._body_iter)
+                obj._body_iter = None   # used up; iterate over _body
+                if obj._body_file is not None:
+                    obj._body_file.close()  # e.g., release a Spool's memory
+                    obj._body_file = None
         return obj._body
     def __set__(self, obj, value):
         del obj.body_iter
@@ -57,10 +62,22 @@ class _BodyIterator(object):
     def __set__(self, obj, value):
         del obj.body
         obj._body_iter = value
+        obj._body_file = None
     def __delete__(self, obj):
         obj._body_iter = None
+        obj._body_file = None
     def _stringGenerator(self, value):
         yield value
+
+class _BodyFile(object):
+    "An Entity Body, as a file-like object (also used as body_iter)"
+    def __get__(self, obj, objtype):
+        return obj._body_file
+    def __set__(self, obj, value):
+        obj.body_iter = value
+        obj._body_file = value
+    def __delete__(self, obj):
+        del obj.body_iter
         
 class _HasContentFlag(object):
     "Indicates whether the object has any body content presently."
@@ -70,6 +87,17 @@ class _HasContentFlag(object):
         else:
             return True
 
+class _BodyLength(object):
+    "The length of the body, if known without consuming body_iter."
+    def __get__(self, obj, objtype):
+        if obj._body is not None:
+            return len(obj._body)
+        if obj._body_file is not None:
+            return getattr(obj._body_file, 'length', None)
+        if obj._body_iter is None:
+            return 0
+        return None
+
 class Representation(object):
     """
     The abstract representation corresponding to an HTTP message.
@@ -99,22 +127,33 @@ class Message(object):
     @type proto_version: string
     @ivar headers: HTTP headers
     @type headers: headers.collection.HeaderDict
+    @ivar trailers: HTTP headers sent after a chunked body; may be 
+      filled in while body_iter is read
+    @type trailers: headers.collection.HeaderDict
     @ivar body: HTTP entity body
     @type body: string
     @ivar body_iter: HTTP entity body
     @type body_iter: iterator
+    @ivar body_file: HTTP entity body, as a file-like object with a 
+      length attribute if it's known; setting it sets body_iter too
+    @type body_file: L{server.spool.BodyFile}
     @ivar has_content: whether the body actually contains anything (read-only)
     @type has_content: Boolean
+    @ivar body_length: length of the body, or None if it's an iterator (read-only)
+    @type body_length: int
     @ivar representation: the representation conveyed by the message
     @type representation: Representation
     """
     proto_version = None
     has_content = _HasContentFlag()
+    body_length = _BodyLength()
     body, _body = _BodyString(), None
     body_iter, _body_iter = _BodyIterator(), None    
+    body_file, _body_file = _BodyFile(), None
 #    representation = RepresentationType()  ## does this modify in place (headers)?
     def __init__(self):
         self.headers = collection.HeaderValues()
+        self.trailers = collection.HeaderValues()
 
 class RequestLine(object):
     def __get__(self, obj, objtype=None):
@@ -133,10 +172,39 @@ class Request(Message):
     @type method: string
     @cvar uri: request-URI
     @type uri: string
+    @cvar client: the client's address (host), if known
+    @type client: string
+    @cvar received: when the request was received (seconds since the
+      epoch), if known
+    @type received: float
+    @cvar ready: when the request was complete (its body read) and 
+      ready to be dispatched, if known
+    @type ready: float
+    @cvar deadline: when the request has to be answered by (seconds 
+      since the epoch), if ever; set by the server adapter
+    @type deadline: float
+    @cvar timings: (stage, seconds) pairs for the request, if they're 
+      being recorded (see server.metrics)
+    @type timings: list
     """
     method = None
     uri = None
+    client = None
+    received = None
+    ready = None
+    deadline = None
+    timings = None
     request_line = RequestLine()
+
+    def remaining(self):
+        """
+        Return the seconds left until the deadline (never less than 
+        0), or None if there isn't one.
+        """
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time.time())
+
     def __str__(self):
         o = [self.request_line, str(self.headers), '']
         if self.body != None:  ###TODO: switch to iterator, hascontent
@@ -26,30 +26,42 @@ SOFTWARE.
 
 __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
 
-from .base import ServerAdapter
+import sys, os, time
+from .base import ServerAdapter, METHODS_WITH_BODIES
+from ...message import Request
+from ... import status
+from ..spool import BodyReader
 
 class CGI(ServerAdapter):
     """CGI-based HTTP Server Adapter"""
+    chunked = False # the web server delimits the response
+    
     def __init__(self, baseResourceClass, baseURI='',):
         ServerAdapter.__init__(self, baseResourceClass, baseURI)
-        self.offset = len(urlparse.urlsplit(baseURI)[2].split('/')) - 1
-    
-    def dispatch(self, request):
-        request.uri_path = request.uri[self.offset:]
-        return ServerAdapter.dispatch(self, request)
 
     def serve(self):
-        import os
         linesep = "\r\n"
         request = Request()
+        request.received = time.time()
+        request.client = os.environ.get('REMOTE_ADDR')
         request.headers.parseCGI()
         request.method = os.environ['REQUEST_METHOD']
         request.uri = os.environ['REQUEST_URI']
-        if request.method in METHODS_WITH_BODIES:
-            request.body = sys.stdin.read()
-        response = self.dispatch(request)
+        try:
+            if request.method in METHODS_WITH_BODIES:
+                length = request.headers.get('Content-Length')
+                if length is None:
+                    raise status.LengthRequired().exception
+                self.check_length(request)
+                if length:
+                    request.body_file = BodyReader(sys.stdin, length)
+            response = self.dispatch(request)
+        except status.StatusException, why:
+            response = why.message
         sys.stdout.write("Status: %s %s%s" % (response.status_code, response.status_phrase, linesep) )
         sys.stdout.write(str(response.headers))
         sys.stdout.write(linesep)
         if response.has_body and response.has_content:
-            sys.stdout.write(response.body)
\ No newline at end of file
+            for data in response.body_iter:
+                sys.stdout.write(data)
+                sys.stdout.flush()
\ No newline at end of file
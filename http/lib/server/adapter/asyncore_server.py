@@ -0,0 +1,531 @@
+"""
+http.server.adapter.asyncore_server - asyncore-based HTTP Server Adapter
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+# TODO:
+#   - idle connection timeouts
+
+import asyncore, asynchat, socket, heapq, time, traceback, re
+from collections import deque
+from itertools import count
+from .base import ServerAdapter
+from ... import status, transfer
+from ...message import Request
+from ...header.field_types import TOKEN
+
+linesep = "\r\n"
+METHOD = re.compile(r"^%s$" % TOKEN)
+VERSION = re.compile(r"^HTTP/\d+\.\d+$")
+
+
+class Timer:
+    """A callback scheduled by EventLoop.call_later()."""
+    def __init__(self, when, func, args):
+        self.when = when
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EventLoop:
+    """
+    An asyncore event loop that also runs callbacks and timers.
+    Coroutines are resumed on it with call_soon_threadsafe().
+
+    Uses asyncore's global socket map, so there should only be one
+    running loop per process.
+    """
+    def __init__(self):
+        self.socket_map = asyncore.socket_map
+        self.running = False
+        self._ready = deque()
+        self._timers = []
+        self._sequence = count()
+        if hasattr(socket, 'socketpair'):
+            self._waker = _Waker()
+        else:
+            self._waker = None
+
+    def call_soon(self, func, *args):
+        """Call func(*args) on the next iteration. Loop thread only."""
+        self._ready.append((func, args))
+
+    def call_soon_threadsafe(self, func, *args):
+        """Call func(*args) on the next iteration, from any thread."""
+        self._ready.append((func, args))
+        waker = self._waker      # the loop may close it meanwhile
+        if waker is not None:
+            waker.wake()
+
+    def call_later(self, delay, func, *args):
+        """Call func(*args) after delay seconds; returns a Timer."""
+        timer = Timer(time.time() + delay, func, args)
+        heapq.heappush(self._timers, (timer.when, self._sequence.next(), timer))
+        return timer
+
+    def run_once(self, timeout=30.0):
+        """Wait for I/O (up to timeout), then run due callbacks."""
+        if self._ready:
+            timeout = 0
+        elif self._timers:
+            timeout = max(0, min(timeout, self._timers[0][0] - time.time()))
+        if self._waker is None:
+            timeout = min(timeout, 0.05)
+        if self.socket_map:
+            asyncore.loop(timeout, False, self.socket_map, 1)
+        else:
+            time.sleep(timeout)
+        now = time.time()
+        while self._timers and self._timers[0][0] <= now:
+            timer = heapq.heappop(self._timers)[2]
+            if not timer.cancelled:
+                self._ready.append((timer.func, timer.args))
+        for i in xrange(len(self._ready)):
+            func, args = self._ready.popleft()
+            try:
+                func(*args)
+            except:
+                traceback.print_exc()
+
+    def run(self):
+        """Run until stop() is called."""
+        self.running = True
+        while self.running:
+            self.run_once()
+
+    def stop(self):
+        """Stop run(); may be called from any thread."""
+        self.running = False
+        waker = self._waker
+        if waker is not None:
+            waker.wake()
+
+    def close(self):
+        """Release the loop's own resources. Loop thread only."""
+        if self._waker is not None:
+            self._waker.writer.close()
+            self._waker.close()
+            self._waker = None
+
+
+class _Waker(asyncore.dispatcher):
+    """Interrupts the loop's select() from other threads."""
+    def __init__(self):
+        reader, self.writer = socket.socketpair()
+        asyncore.dispatcher.__init__(self, reader)
+
+    def wake(self):
+        try:
+            self.writer.send("x")
+        except socket.error:
+            pass
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            self.recv(512)
+        except socket.error:
+            pass
+
+
+class HTTPChannel(asynchat.async_chat):
+    """
+    A client connection. Requests on it are dispatched one at a time,
+    and their responses written in order.
+    """
+    def __init__(self, adapter, sock):
+        asynchat.async_chat.__init__(self, sock)
+        self.adapter = adapter
+        adapter.channels[id(self)] = self
+        self.set_terminator(linesep * 2)
+        self._buffer = []
+        self._request = None
+        self._spool = None
+        self._decoder = None
+        self._queue = deque()
+        self._bodies = {}
+        self._busy = False
+        self._reading = True
+        if adapter.metrics is not None:
+            adapter.metrics.count('connections')
+
+    def recv(self, buffer_size):
+        data = asynchat.async_chat.recv(self, buffer_size)
+        if self.adapter.metrics is not None:
+            self.adapter.metrics.count('bytes_in', len(data))
+        return data
+
+    def send(self, data):
+        sent = asynchat.async_chat.send(self, data)
+        if sent and self.adapter.metrics is not None:
+            self.adapter.metrics.count('bytes_out', sent)
+        return sent
+
+    def collect_incoming_data(self, data):
+        if not self._reading:
+            return
+        if self._spool is not None and \
+          (self._decoder is None or self._decoder.wanted):
+            self.body_received(data)
+        else:
+            self._buffer.append(data)
+
+    def found_terminator(self):
+        if not self._reading:
+            return
+        data = "".join(self._buffer)
+        self._buffer = []
+        if self._request is None:
+            self.head_received(data)
+        elif self._decoder is None:
+            self.body_done()
+        else:
+            if self.get_terminator() != 0:  # a chunk-size, CRLF or trailer line
+                self.body_received(data)
+            if not self._reading:
+                return
+            if self._decoder.done:
+                self.body_done()
+            else:
+                self.set_terminator(self._decoder.wanted or linesep)
+
+    def head_received(self, data):
+        """Parse a request's line and headers."""
+        request = Request()
+        request.received = time.time()
+        if self.addr:
+            request.client = self.addr[0]
+        try:
+            request_line, header_block = (data.lstrip(linesep).split("\n", 1) + [""])[:2]
+            request.request_line = request_line
+            request.headers.parseString(header_block)
+        except Exception:
+            self.error(status.BadRequest())
+            return
+        if METHOD.match(request.method) is None or not request.uri or \
+          VERSION.match(request.proto_version) is None:
+            self.error(status.BadRequest())
+            return
+        codings = [c.lower() for c in request.headers.get('Transfer-Encoding', [])]
+        try:
+            length = request.headers.get('Content-Length')
+        except ValueError:
+            self.error(status.BadRequest())
+            return
+        try:
+            if (codings or length) and request.headers.has_key('Expect'):
+                if not self.expect(request):
+                    return
+            else:
+                self.adapter.check_length(request)
+        except status.StatusException, why:
+            self.error(why.message)
+            return
+        if codings:
+            if codings != ['chunked']:
+                self.error(status.NotImplemented())
+                return
+            self._decoder = transfer.ChunkedDecoder(request.trailers)
+            self.set_terminator(linesep)
+        elif length:
+            self.set_terminator(length)
+        else:
+            self.request_received(request)
+            return
+        self._request = request
+        self._spool = self.adapter.body_spool()
+
+    def expect(self, request):
+        """
+        Handle a request's expectation before reading its body. With 
+        100-continue, the request is checked and 100 Continue sent if 
+        it would be accepted; if it wouldn't, a StatusException is 
+        raised, so that the body isn't read. Returns whether to read 
+        the body.
+        """
+        if request.proto_version != "HTTP/1.1":
+            self.adapter.check_length(request)
+            return True
+        if request.headers.get('Expect', '').lower() != '100-continue':
+            self.error(status.ExpectationFailed())
+            return False
+        if self._busy or self._queue:
+            # an earlier response is still to be written; the client 
+            # will send the body after a timeout, and it's checked then
+            self.adapter.check_length(request)
+            return True
+        self.adapter.check_request(request)
+        self.push(_head(status.Continue()))
+        return True
+
+    def body_received(self, data):
+        """Spool part of a request body, decoding it if it's chunked."""
+        try:
+            if self._decoder is not None:
+                data = self._decoder.feed(data)
+            self._spool.write(data)
+        except transfer.ChunkError:
+            self.error(status.BadRequest())
+        except status.StatusException, why:
+            self.error(why.message)
+
+    def body_done(self):
+        request, self._request = self._request, None
+        body, self._spool = self._spool, None
+        self._decoder = None
+        body.seal()
+        request.body_file = body
+        self.set_terminator(linesep * 2)
+        self.request_received(request)
+
+    def request_received(self, request):
+        request.ready = time.time()
+        self._queue.append(request)
+        self._next()
+
+    def _next(self):
+        if self._busy or not self._queue:
+            return
+        self._busy = True
+        self.adapter.schedule(request=self._queue.popleft(), channel=self)
+
+    def respond(self, request, future):
+        """Write the response to request."""
+        try:
+            response = future.result()
+        except Exception:
+            response = status.InternalServerError()
+            response.headers['Content-Length'] = 0
+        keep_alive = request.proto_version == "HTTP/1.1" and \
+          'close' not in [t.lower() for t in request.headers.get('Connection', [])] and \
+          'close' not in [t.lower() for t in response.headers.get('Connection', [])]
+        if not keep_alive:
+            response.headers['Connection'] = ['close']
+        metrics = self.adapter.metrics
+        if metrics is not None:
+            start = time.time()
+        self.push(_head(response))
+        if metrics is not None:
+            metrics.stage_time(request, 'serialize', time.time() - start)
+        body_file = request.body_file
+        if response.has_body and response.has_content:
+            if body_file is None:
+                done = None
+            else:
+                # the response may be generated from the request body
+                self._bodies[id(body_file)] = body_file
+                done = lambda: self._close_body(body_file)
+            self.push_with_producer(_IterProducer(transfer.encode(response), done))
+        elif body_file is not None:
+            body_file.close()
+        self._busy = False
+        if keep_alive:
+            self._next()
+        else:
+            self._discard_queue()
+            self.close_when_done()
+
+    def error(self, response):
+        """Respond with an error status and close the connection."""
+        response.headers['Content-Length'] = 0
+        response.headers['Connection'] = ['close']
+        self.push(_head(response))
+        self.close_when_done()
+        self._discard_queue()
+        self._reading = False
+        self.set_terminator(None)
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    def _discard_queue(self):
+        """Drop the requests waiting to be dispatched."""
+        while self._queue:
+            request = self._queue.popleft()
+            if request.body_file is not None:
+                request.body_file.close()
+
+    def _close_body(self, body_file):
+        self._bodies.pop(id(body_file), None)
+        body_file.close()
+
+    def handle_error(self):
+        traceback.print_exc()
+        self.close()
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        for body_file in self._bodies.values():
+            body_file.close()
+        self._bodies.clear()
+        self._discard_queue()
+        self.adapter.channels.pop(id(self), None)
+        asynchat.async_chat.close(self)
+
+
+class _IterProducer:
+    """
+    An asynchat producer for an iterator of strings, so that a body is
+    only read as fast as it can be written. done is called, if given,
+    once the iterator is exhausted or fails.
+    """
+    def __init__(self, iterable, done=None):
+        self.iterator = iter(iterable)
+        self.done = done
+
+    def more(self):
+        finished = True
+        try:
+            for data in self.iterator:
+                if data:
+                    finished = False
+                    return data
+        finally:
+            if finished and self.done is not None:
+                done, self.done = self.done, None
+                done()
+        return ""
+
+
+class _Listener(asyncore.dispatcher):
+    def __init__(self, adapter, address):
+        asyncore.dispatcher.__init__(self)
+        self.adapter = adapter
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(address)
+        self.listen(128)
+
+    def handle_accept(self):
+        try:
+            conn, addr = self.accept()
+        except (TypeError, socket.error):
+            return
+        HTTPChannel(self.adapter, conn)
+
+
+class AsyncoreServer(ServerAdapter):
+    """
+    asyncore-based HTTP Server Adapter. Requests are dispatched with
+    dispatch_async() on self.loop, so coroutine Resource methods and
+    pipeline hooks don't block other connections.
+    
+    If scheduler is set, at most scheduler.max_active requests are 
+    dispatched at once; the rest wait in it, in priority order.
+    
+    @ivar scheduler: where requests wait to be dispatched, if anywhere
+    @type scheduler: L{server.scheduler.Scheduler}
+    """
+    scheduler = None
+    
+    def __init__(self, baseResourceClass, baseURI='/', address=('', 8000)):
+        ServerAdapter.__init__(self, baseResourceClass, baseURI)
+        self.address = address
+        self.loop = EventLoop()
+        self.listener = None
+        self.channels = {}
+        self.active = 0
+
+    def listen(self):
+        """Start listening; return the bound (host, port)."""
+        if self.listener is None:
+            self.listener = _Listener(self, self.address)
+        return self.listener.socket.getsockname()
+
+    def serve(self):
+        self.listen()
+        self.loop.run()
+
+    def schedule(self, request, channel):
+        """
+        Dispatch a request from channel, now or (if there's a 
+        scheduler) once it's the request's turn; channel.respond() is 
+        called with the result. Loop thread only.
+        """
+        if self.scheduler is None:
+            self._start(request, channel)
+            return
+        name = self.scheduler.classifier.classify(self, request)
+        self.scheduler.put(name, (request, channel))
+        self._run_queue()
+
+    def _run_queue(self):
+        scheduler = self.scheduler
+        while self.active < scheduler.max_active:
+            entry = scheduler.get()
+            if entry is None:
+                return
+            name, (request, channel) = entry
+            if not self.channels.has_key(id(channel)):
+                scheduler.drop(name)   # the client has gone away
+                if request.body_file is not None:
+                    request.body_file.close()
+                continue
+            self._start(request, channel)
+
+    def _start(self, request, channel):
+        self.active += 1
+        future = self.dispatch_async(request)
+        future.add_done_callback(lambda future: self._finished(request, channel, future))
+
+    def _finished(self, request, channel, future):
+        self.active -= 1
+        channel.respond(request, future)
+        if self.scheduler is not None:
+            self._run_queue()
+
+    def close(self):
+        """
+        Stop listening, close connections and stop the loop, storing
+        the state of any cached Resources; may be called from any 
+        thread.
+        """
+        self.loop.call_soon_threadsafe(self._shutdown)
+
+    def _shutdown(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        for channel in self.channels.values():
+            channel.close()
+        if self.instance_cache is not None:
+            self.instance_cache.close()
+        self.loop.stop()
+        self.loop.close()
+
+
+def _head(response):
+    """Serialise a response's status line and headers."""
+    return "HTTP/1.1 %s %s%s%s%s" % (response.status_code,
+      response.status_phrase, linesep, str(response.headers), linesep)
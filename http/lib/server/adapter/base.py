@@ -26,11 +26,13 @@ SOFTWARE.
 
 __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
 
-import sys, urlparse
+import sys, urlparse, urllib, time, threading
 from ... import status
+from ...header.registry import get_field_name
 from ...message import Request, Response 
-from ...feature.common import PipelineComponent
-from ...feature.resource_dispatch import MethodDispatcher
+from ..api.routing import Router
+from ...feature.base import Pipeline
+from .. import coroutine, spool
 
 METHODS_WITH_BODIES = ['PUT', 'POST']
 
@@ -40,11 +42,57 @@ class ServerAdapter:
     Base class for Server Adapters.
     
     Subclasses should override the serve() method.
+    
+    @ivar instance_cache: if set, Resource instances are kept between
+      requests
+    @type instance_cache: L{InstanceCache}
+    @ivar loop: the event loop used by dispatch_async(), if any
+    @ivar pool: where blocking Resource methods are run, if anywhere
+    @type pool: L{ThreadPool}
+    @cvar chunked: whether the adapter can send chunked responses
+    @type chunked: Boolean
+    @cvar max_body_size: largest request body accepted, in bytes
+    @type max_body_size: int
+    @cvar spool_threshold: request bodies larger than this are spooled
+      to disk
+    @type spool_threshold: int
+    @cvar body_budget: memory shared by request bodies (process-wide by 
+      default)
+    @type body_budget: L{spool.MemoryBudget}
+    @cvar timeout: seconds a request may take, from when it was 
+      received, unless its Resource class sets timeout (see deadline())
+    @type timeout: float
+    @cvar timeout_header: a request header giving a shorter timeout 
+      (e.g., set by a trusted front-end proxy), if any
+    @type timeout_header: string
+    @cvar metrics: where timings are recorded, if anywhere
+    @type metrics: L{server.metrics.Metrics}
+    @cvar profiler: samples the stacks of slow requests, if set
+    @type profiler: L{server.profiler.Profiler}
+    @ivar slow: Resource class name -> {'expired': requests refused 
+      because their deadline passed before dispatch, 'timed_out': 
+      requests whose handling was cut short}
+    @type slow: dict
     """
+    instance_cache = None
+    loop = None
+    pool = None
+    chunked = True
+    max_body_size = None
+    spool_threshold = 64 * 1024
+    body_budget = spool.budget
+    timeout = None
+    timeout_header = None
+    metrics = None
+    profiler = None
     
     def __init__(self, baseResourceClass, baseURI='/'):
-        self.baseResource = baseResourceClass(baseURI, None)
+        self.router = Router(baseResourceClass)
         self.baseURI = baseURI
+        self.basePath = _split_path(urlparse.urlsplit(baseURI)[2])
+        self.pipeline = Pipeline()
+        self.slow = {}
+        self._lock = threading.Lock()
         
     def serve(self):
         """
@@ -58,29 +106,244 @@ class ServerAdapter:
         
     def dispatch(self, request):
         """
-        Given a Request instance, _dereference the resource
-        and hand off to its _handle_request, returning a
-        Response instance.
-        """        
+        Given a Request instance, dereference the resource and run
+        the pipeline, returning a Response instance. Coroutine
+        handlers and hooks are run to completion in this thread.
+        
+        The adapter's receive_request hooks run before the resource is
+        dereferenced, so that they can answer requests (e.g., from a
+        cache) without it.
+        
+        If the request has a deadline, waiting for a coroutine or 
+        blocking handler stops when it passes, and the response is 
+        GatewayTimeout; if it has already passed, ServiceUnavailable.
+        Handlers that don't yield can't be interrupted, but can check
+        request.remaining().
+        """
+        request.deadline = self.deadline(request)
+        return coroutine.run(self._dispatch(request), request.deadline)
+
+    def dispatch_async(self, request):
+        """
+        Like dispatch(), but return a Future for the Response; coroutine
+        handlers and hooks are resumed on self.loop, and cancelled there 
+        at the request's deadline. Loop thread only.
+        """
+        request.deadline = self.deadline(request)
+        task = coroutine.Task(self._dispatch(request), 
+          self.loop.call_soon_threadsafe)
+        if request.deadline is not None and not task.done():
+            timer = self.loop.call_later(request.deadline - time.time(), 
+              task.cancel)
+            task.add_done_callback(lambda task: timer.cancel())
+        return task
+
+    def deadline(self, request):
+        """
+        Return when request has to be answered by (seconds since the 
+        epoch), or None if there's no limit: its Resource class's 
+        timeout (or else the adapter's) after it was received, or 
+        sooner if timeout_header asks for less. The request is only
+        routed here if some Resource class sets timeout.
+        """
+        timeout = self.timeout
+        if self.router.timeouts:
+            try:
+                cls = self.router.resolve(self.path_segments(request)).cls
+            except status.StatusException:
+                cls = None
+            if cls is not None and cls.timeout is not None:
+                timeout = cls.timeout
+        if self.timeout_header is not None:
+            value = request.headers.data.get(get_field_name(self.timeout_header))
+            try:
+                asked = float(value)
+            except (TypeError, ValueError):
+                asked = None
+            if asked is not None and asked >= 0 and \
+              (timeout is None or asked < timeout):
+                timeout = asked
+        if timeout is None:
+            return None
+        return (request.received or time.time()) + timeout
+
+    def _dispatch(self, request):
+        request.pool = self.pool
         method = request.method
-        if method == "HEAD":
-            request.method == "GET"
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.time()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start(request)
+        resource_name = None
         try:
-            resource = self.baseResource.dereference(request.uri)
             response = status.OK()
-            for stage in resource.pipeline:
-                stage.receive_request(request, response)
-            for i in xrange(len(self.pipeline), 0, -1):
-                self.pipeline[i-1].send_response(request, response)
-        except status.Status, response:
-            pass
+            if request.deadline is not None and time.time() >= request.deadline:
+                self.count_slow(request, 'expired')
+                raise status.ServiceUnavailable().exception
+            for hook in self.pipeline.receive_request:
+                if metrics is not None:
+                    yield metrics.timed(hook, request, response)
+                    continue
+                result = hook(request, response)
+                if result is not None:
+                    yield result
+            if metrics is not None:
+                routed = time.time()
+            resource = self.dereference(self.path_segments(request))
+            if metrics is not None:
+                metrics.stage_time(request, 'route', time.time() - routed)
+                resource_name = resource.__class__.__name__
+            try:
+                for hook in resource.pipeline.receive_request:
+                    if metrics is not None:
+                        yield metrics.timed(hook, request, response)
+                        continue
+                    result = hook(request, response)
+                    if result is not None:
+                        yield result
+                for hook in resource.pipeline.send_response + \
+                  self.pipeline.send_response:
+                    if metrics is not None:
+                        yield metrics.timed(hook, request, response)
+                        continue
+                    result = hook(request, response)
+                    if result is not None:
+                        yield result
+            finally:
+                self.release(resource)
+        except status.StatusException, why:
+            response = why.message
+        except coroutine.Timeout:
+            self.count_slow(request, 'timed_out')
+            response = status.GatewayTimeout()
         except Exception, why:
             import traceback
             response = status.InternalServerError()
             response.body = "".join(traceback.format_tb(sys.exc_traceback, 5)) + "\n" + str(why)
-        if response.has_content:
-            response.headers['Content-Length'] = len(str(response.body)) # TODO: this buffers - allow control
+        for hook in self.pipeline.finish_request:
+            if metrics is not None:
+                finishing = time.time()
+                hook(request, response)
+                metrics.stage_time(request, metrics.stage(hook), 
+                  time.time() - finishing)
+                continue
+            hook(request, response)
+        self.delimit(request, response)
         if method == 'HEAD':
-            response.body = ""
-        return response
+            response.body = None
+        if metrics is not None:
+            metrics.finished(resource_name, response.status_code, 
+              time.time() - start)
+        if profiler is not None:
+            profiler.finish(request, response)
+        raise coroutine.Return(response)
+
+    def count_slow(self, request, kind):
+        """
+        Count a request that ran out of time in slow, by the name of 
+        the Resource class it's routed to.
+        """
+        try:
+            name = self.router.resolve(self.path_segments(request)).cls.__name__
+        except status.StatusException:
+            name = None
+        self._lock.acquire()
+        try:
+            counts = self.slow.get(name)
+            if counts is None:
+                counts = self.slow[name] = {'expired': 0, 'timed_out': 0}
+            counts[kind] += 1
+        finally:
+            self._lock.release()
+
+    def delimit(self, request, response):
+        """
+        Decide how the response body is delimited, without reading it.
+        A Content-Length set by the handler is kept, and the body 
+        streamed as-is; otherwise, a string body's length is used. 
+        Bodies of unknown length (i.e., body_iter), and responses that
+        announce trailers with the Trailer header, get the chunked 
+        transfer-coding if the client and adapter support it; otherwise
+        they're delimited by closing the connection, and trailers are
+        dropped.
+        """
+        if not response.has_body or response.headers.has_key('Content-Length'):
+            return
+        chunked = self.chunked and request.proto_version == "HTTP/1.1"
+        length = response.body_length
+        if chunked and response.headers.has_key('Trailer'):
+            response.headers['Transfer-Encoding'] = ['chunked']
+        elif length is not None:
+            response.headers['Content-Length'] = length
+        elif chunked:
+            response.headers['Transfer-Encoding'] = ['chunked']
+        else:
+            response.headers['Connection'] = ['close']
+
+    def check_length(self, request):
+        """
+        Raise RequestEntityTooLarge if request declares a body larger 
+        than max_body_size.
+        """
+        length = request.headers.get('Content-Length')
+        if self.max_body_size is not None and length is not None and \
+          length > self.max_body_size:
+            raise status.RequestEntityTooLarge().exception
+
+    def check_request(self, request):
+        """
+        Decide whether request would be accepted before its body is 
+        read: check its length, route it, and run the pipelines' 
+        check_request hooks (method lookup, authentication, etc.). 
+        Raises a StatusException if it wouldn't be.
+        """
+        self.check_length(request)
+        resource = self.dereference(self.path_segments(request))
+        try:
+            for hook in self.pipeline.check_request + \
+              resource.pipeline.check_request:
+                hook(request)
+        finally:
+            self.release(resource)
+
+    def body_spool(self):
+        """Return a Spool for an incoming request body."""
+        return spool.Spool(self.spool_threshold, self.max_body_size, 
+          self.body_budget)
+
+    def dereference(self, segments):
+        """
+        Return the Resource instance for a sequence of path segments.
+        """
+        if self.instance_cache is None:
+            return self.router.dereference(segments)
+        return self.instance_cache.dereference(self.router, segments)
+
+    def release(self, resource):
+        """
+        Called when dispatch() is done with resource. Without an
+        instance cache, its state is always stored, as the instance is
+        discarded; with one, only if it's dirty.
+        """
+        if self.instance_cache is not None:
+            self.instance_cache.release(resource)
+        else:
+            resource.dirty = False
+            resource.storeState()
+
+    def path_segments(self, request):
+        """
+        Return the request-URI's path segments below baseURI.
+        """
+        segments = _split_path(urlparse.urlsplit(request.uri)[2])
+        base_length = len(self.basePath)
+        if segments[:base_length] != self.basePath:
+            raise status.NotFound().exception
+        return segments[base_length:]
+
 
+def _split_path(path):
+    """Split a URI path into unquoted, non-empty segments."""
+    return [urllib.unquote(s) for s in path.split('/') if s]
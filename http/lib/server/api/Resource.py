@@ -26,56 +26,109 @@ SOFTWARE.
 
 __revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
 
-from .base import PipelineComponent
+from ...feature.base import PipelineComponent, Pipeline
+from ...feature.conditional import ConditionalRequests
+from ...feature.conneg import ContentNegotiation, MediaTypes
+from ...feature.cache import CachePolicy
 from ... import status
-from ...headers.registry import newField
 import string
 
 class Resource:
-    """Base class for Resources."""
+    """
+    Base class for Resources.
+    
+    The server adapter calls storeState() after each request. If it
+    keeps instances between requests (see server.api.instances), it
+    only does so when dirty is set, so set dirty when the Resource's
+    state changes.
+    
+    Set blocking to run all of the class's methods on the server 
+    adapter's thread pool (see server.threadpool.blocking() to mark 
+    individual methods).
+    
+    Define etag() and/or last_modified() to have conditional requests
+    answered before methods are called (see feature.conditional).
+    
+    Set languages and/or charsets to the ones the Resource's methods 
+    can produce, in order of preference, to have them negotiated (see
+    feature.conneg); methods find the choices in request.language and
+    request.charset.
+    
+    Set cache_control to the Cache-Control directives for successful 
+    GET and HEAD responses (e.g., {'max-age': '60'}) to have them 
+    stored by shared caches, such as feature.cache.ResponseCache.
+    
+    Set timeout to limit how long requests to the Resource may take; 
+    methods find the deadline in request.deadline (see 
+    request.remaining()).
+    
+    HEAD requests are handled by GET methods unless HEAD methods are 
+    defined; a GET method can also check request.method and skip 
+    generating the body. The body isn't read, so a body_iter generator
+    isn't started.
+    """
     children = {}                # child Resource classes
-    def __init__(self, name=None, parent=None):
+    dirty = False                # whether state needs to be stored
+    blocking = False             # whether methods block (e.g., on I/O)
+    etag = None                  # method returning my (opaque-tag, weak)
+    last_modified = None         # method returning my modification time
+    languages = None             # languages my methods can produce
+    charsets = None              # charsets my methods can produce
+    cache_control = None         # Cache-Control directives for my responses
+    priority = None              # my requests' scheduling class (see server.scheduler)
+    timeout = None               # seconds my requests may take (see server.adapter.base)
+    def __init__(self, name=None, parent=None, path=None, args=None):
         self.name = name         # my path segment name
         self.parent = parent     # my parent's instance
-        self.pipeline = [
-            MethodDispatcher(self), 
-        ]
+        if path is None:
+            path = parent and parent.path + [name] or []
+        self.path = path         # my path segments, from the root
+        self.path_args = args or {}  # parameterised segments captured by the router
+        self.pipeline = Pipeline(self.pipelineComponents())
         self.restoreState()
 
+    def pipelineComponents(self):
+        """
+        Return the components of my pipeline, in order. Subclasses 
+        that add components should extend this (rather than changing
+        self.pipeline afterwards), so that it's only compiled once.
+        """
+        components = [MethodDispatcher(self)]
+        if self.etag is not None or self.last_modified is not None:
+            components.insert(0, ConditionalRequests(self))
+        if self.languages or self.charsets:
+            components.insert(0, ContentNegotiation(self))
+        if self.cache_control is not None:
+            components.insert(0, CachePolicy(self))
+        return components
+
 
     def dereference(self, path):  # TODO: better name?
         """
         Given a sequence of path segments, return the appropriate Resource,
         instantiating if need be. Alternatively, raise a Status exception.
-        Called by Server.
+        Called by Router for segments below a dynamic getChild().
         """
         if not len(path):  # FIXME: empty path - foo vs. foo/
             return self
-        elif path[0] in self.children.keys():
-            return self.children[path[0]](name=path[0], parent=self)._dereference(path[1:])
+        child = self.children.get(path[0], None)
+        if child is not None:
+            return child(name=path[0], parent=self).dereference(path[1:])
         else:
-            return self.getChild(path[0])._dereference(path[1:])
+            return self.getChild(path[0]).dereference(path[1:])
                 
     def reference(self):
         """
-        Return a URI for this resource.
-        """
-        segments = [self.name]
-        parent = None # FIXME: figure out parent for reference
-        while 1:
-            segments.insert(0, parent.name)
-            if isinstance(parent, Resource):
-                parent = parent.parent
-            else:
-                break
-        return "/".join(segments)    # FIXME: foo vs. foo/
+        Return a URI path for this resource.
+        """
+        return "/" + "/".join(self.path)    # FIXME: foo vs. foo/
                
     def getChild(self, name):
         """
         Given a child name, return an instantiated Resource.
         May be overridden.
         """
-        raise status.NotFound()
+        raise status.NotFound().exception
         
     def storeState(self):
         pass
@@ -83,75 +136,177 @@ class Resource:
     def restoreState(self):
         pass
 
-    def __del__(self):
-        self.storeState()
+    def storeBatch(cls, resources):
+        """
+        Store the state of several instances of this class at once.
+        Called by the write-behind scheduler; may be overridden to batch 
+        writes to the backing store.
+        """
+        for resource in resources:
+            resource.storeState()
+    storeBatch = classmethod(storeBatch)
         
         
-class RequestDispatcher(PipelineComponent):
-    def __init__(self, context):
-        PipelineComponent.__init__(self, context)
-        self.methods = filter(lambda a:a[0]!='_' and \
-          callable(getattr(resource, a)), dir(context))
-            
-    def __call__(self, request, response):
-        method_name = request.method
-        if request.body is None:
-            presented_type = None
-        else:
+class DispatchTable:
+    """
+    The handler methods of a Resource class, computed once per class
+    (see dispatch_table()).
+
+    Handlers are named METHOD, or METHOD_type (e.g., PUT_application_xml)
+    for a request body of that media type; either may have _TO_type
+    appended (e.g., GET_TO_text_html) for a response of that media type.
+    If a handler has a content_type attribute, it is used as the
+    response's default Content-Type. HEAD uses the GET handlers, unless
+    there are HEAD handlers.
+
+    @ivar entries: (method, normalized request type) -> list of
+      (normalized response type, handler name, content_type, blocking)
+      tuples, with the untyped response (None) first
+    @type entries: dict
+    @ivar variants: (method, normalized request type) -> tuple of the
+      entries' response types, for negotiation ("*_*" if untyped)
+    @type variants: dict
+    @ivar methods: the HTTP methods the class implements
+    @type methods: dict
+    @ivar allow: precomputed Allow header value for MethodNotAllowed
+    @type allow: list
+    """
+    def __init__(self, cls):
+        self.entries = {}
+        self.methods = {}
+        for attr in dir(cls):
+            handler = getattr(cls, attr)
+            if attr[0] == '_' or not callable(handler):
+                continue
             try:
-                presented_type = request.headers['content-type'].value
-            except KeyError:
-                raise status.BadRequest()
-        try:
-            preferred_types = request.headers['accept'].value
-        except:
-            preferred_types = newField('accept', string="*/*")
-        for preferred_type in preferred_types:
+                head, response_type = attr.split('_TO_', 1)
+                response_type = response_type.lower()
+            except ValueError:
+                head, response_type = attr, None
             try:
-                method = self.methods[(method_name, presented_type, preferred_type)]
-            except:
-                continue            
-        apply(method, (request, response))
-         ### set content-type
-        if hasattr(response.headers, 'Vary'):
-            response.headers['Vary'].value.append('Accept')
-        else:
-            response.headers['Vary'].value = ['Accept']
-        if response.headers['Content-Type'].has_key('q'):
-            del response.headers['Content-Type'].params['q']
-         
+                method, request_type = head.split('_', 1)
+                request_type = request_type.lower()
+            except ValueError:
+                method, request_type = head, None
+            if not method.isupper():
+                continue
+            self.methods[method] = True
+            self.entries.setdefault((method, request_type), []).append(
+              (response_type, attr, getattr(handler, 'content_type', None),
+              cls.blocking or getattr(handler, 'blocking', False)))
+        for entry_list in self.entries.values():
+            entry_list.sort(lambda a, b: cmp(a[0] is not None, b[0] is not None) \
+              or cmp(a[0], b[0]))
+        if self.methods.has_key('GET') and not self.methods.has_key('HEAD'):
+            self.methods['HEAD'] = True
+            for (method, request_type), entry_list in self.entries.items():
+                if method == 'GET':
+                    self.entries[('HEAD', request_type)] = entry_list
+        self.variants = {}
+        for key, entry_list in self.entries.items():
+            self.variants[key] = tuple([entry[0] or _any_type for entry in entry_list])
+        self.allow = self.methods.keys()
+        self.allow.sort()
+
+    def lookup(self, method, request_type):
+        """
+        Return the entries for method and request_type, falling back to
+        the untyped handler. Raises MethodNotAllowed or
+        UnsupportedMediaType.
+        """
+        return self.entries[self.key(method, request_type)]
+
+    def key(self, method, request_type):
+        """
+        Return the entries' key for method and request_type (see 
+        lookup()).
+        """
+        if self.entries.has_key((method, request_type)):
+            return (method, request_type)
+        if not self.methods.has_key(method):
+            mna = status.MethodNotAllowed()
+            mna.headers['Allow'] = self.allow
+            raise mna.exception
+        if self.entries.has_key((method, None)):
+            return (method, None)
+        raise status.UnsupportedMediaType().exception
+
+_dispatch_tables = {}
+def dispatch_table(cls):
+    """Return the (cached) DispatchTable for a Resource class."""
+    try:
+        return _dispatch_tables[cls]
+    except KeyError:
+        table = _dispatch_tables[cls] = DispatchTable(cls)
+        return table
+
 
 class MethodDispatcher(PipelineComponent):
     """
     Pipeline component to call the appropriate Resource method, based on
-    HTTP method (and perhaps request media type).
+    HTTP method, request media type and (when the Resource has more
+    than one) the negotiated response media type. Blocking methods are
+    submitted to request.pool, if there is one.
+    
+    If request.response_type is already set (normalized), it is used
+    instead of negotiating on Accept.
     """
     def __init__(self, context):
         PipelineComponent.__init__(self, context)
-        methods = filter(lambda a: a[0]!='_' and \
-          callable(getattr(context, a)), dir(context))
-        self.http_methods = filter(lambda a: a.isupper(), \
-          filter(lambda a: "_" not in a, methods))
+        self.table = dispatch_table(context.__class__)
+
+    def check_request(self, request):
+        content_type = request.headers.get('Content-Type')
+        if content_type is None:
+            request_type = None
+        else:
+            request_type = _norm_type(content_type[0])
+        self.table.lookup(request.method, request_type)
 
     def send_response(self, request, response):
-        method_name = request.method
-        if request.body != None:
-            try:
-                presented_type = request.headers['content-type'].value
-            except KeyError:
-                raise status.BadRequest()
-            typed_method = "%s_%s" % (request.method, _norm_type(presented_type))
-            if hasattr(self.context, typed_method):
-                method_name = typed_method
-            elif not hasattr(self.context, request.method):
-                raise status.UnsupportedMediaType()  
-        try:
-            method = getattr(self.context, method_name)
-        except AttributeError:
-            mna = status.MethodNotAllowed()
-            mna.headers['Allow'] = self.http_methods
-            raise mna
-        apply(method, (request, response))
+        if not request.has_content:
+            request_type = None
+        else:
+            content_type = request.headers.get('Content-Type')
+            if content_type is None:
+                raise status.BadRequest().exception
+            request_type = _norm_type(content_type[0])
+        key = self.table.key(request.method, request_type)
+        entries = self.table.entries[key]
+        if len(entries) == 1:
+            response_type, method_name, content_type, blocking = entries[0]
+        else:
+            response_type, method_name, content_type, blocking = \
+              self.negotiate(request, entries, self.table.variants[key])
+            vary = response.headers.get('Vary', [])
+            if 'Accept' not in vary:
+                response.headers['Vary'] = vary + ['Accept']
+        if content_type is not None and \
+          not response.headers.has_key('Content-Type'):
+            response.headers['Content-Type'] = [content_type, {}]
+        method = getattr(self.context, method_name)
+        if blocking and request.pool is not None:
+            return request.pool.submit(method, request, response)
+        return apply(method, (request, response))
+
+    def negotiate(self, request, entries, variants):
+        """
+        Choose one of entries (whose response types are variants) for 
+        the request's Accept header. The untyped entry, if there is one,
+        is used when nothing else is acceptable; otherwise, raises
+        NotAcceptable.
+        """
+        response_type = getattr(request, 'response_type', None)
+        if response_type is not None:
+            for entry in entries:
+                if entry[0] == response_type:
+                    return entry
+        choice = media_types.choose(request.headers.data.get('Accept'), variants)
+        if choice is not None:
+            return entries[list(variants).index(choice)]
+        if entries[0][0] is None:
+            return entries[0]
+        raise status.NotAcceptable().exception
 
 
 class MethodHack(PipelineComponent):
@@ -165,74 +320,10 @@ class MethodHack(PipelineComponent):
             request.method = request.uri_query['http_method'][0]
 
 
-# class ContentNegotiator(PipelineComponent):
-#     """
-#     Pipeline component to effect content negotiation of media type.
-#     """
-#     TO = re.compile("_TO_")
-#     def __init__(self, resource):
-#         self.resource = resource
-#         self.tr_methods = filter(lambda a, r=resource: self.TO.search(a) and \
-#           callable(getattr(r, a)), dir(resource))
-# 
-#     def __call__(self, request, response):
-#         if request.uri_query.has_key('type'):   # type hack
-#             acceptable_types = [{'VALUE': request.uri_query['type'][0]}]
-#         else:
-#             if not request.headers.has_key('Accept'):
-#                 acceptable_types = [{'VALUE': '*/*'}]
-#             else:
-#                 acceptable_types = request.headers['Accept']
-#                 acceptable_types.sort(sortByQValue)
-#         acceptable_types.append(None)
-#         in_arg = _norm_type(response.headers['Content-Type']['VALUE'])
-#         available_tr = filter(
-#           lambda a, i=in_arg: a[:len(i)]==i, self.tr_methods)
-#         available_types = map(
-#           lambda a, s=self: getattr(s.resource, a).content_type, available_tr)
-#         available_types = map(lambda a, {'VALUE': a[0], 'q': a[1]}, available_types)  ### ugly
-#         available_types.append(response.headers['Content-Type'])
-#         available_types.sort(sortByQValue)
-#         for acceptable_type in acceptable_types:
-#             if acceptable_type == None:
-#                 raise status.NotAcceptable()
-#             if float(acceptable_type.get('q', '1')) == 0:
-#                 continue
-#             if acceptable_type['VALUE'] == "*/*": 
-#                 out_type = available_types[0]
-#                 break
-#             elif acceptable_type['VALUE'][-2:] == "/*":
-#                 out_type = filter(
-#                   lambda a, 
-#                   c=acceptable_type['VALUE'][:acceptable_type['VALUE'].index('/')]: 
-#                 a['VALUE'][a['VALUE'].index('/')]==c, available_types)[0]
-#                 break
-#             elif _norm_type(acceptable_type['VALUE']) in \
-#               map(lambda a, n=_norm_type: n(a['VALUE']), available_types):
-#                 out_type = acceptable_type
-#                 break
-#             else:
-#                 continue
-#         if float(out_type.get('q', 1)) == 0:
-#             raise status.NotAcceptable()
-#         if out_type['VALUE'] == response.headers['Content-Type']['VALUE']:
-#             if response.headers['Content-Type'].has_key('q'):
-#                 del response.headers['Content-Type']['q']
-#         else:
-#             neg_method_name = "%s_TO_%s" % (in_arg, _norm_type(out_type['VALUE']))
-#             neg_method = getattr(self.resource, neg_method_name)
-#             response.body = apply(neg_method, (response.body))
-#             ### set content-type
-#             if hasattr(response.headers, 'Vary'):
-#                response.headers['Vary'].append('Accept')
-#             else:
-#                 response.headers['Vary'] = ['Accept']
-#             if response.headers['Content-Type'].has_key('q'):
-#                 del response.headers['Content-Type']['q']
-# 
-#     
-    
 # Support functions
 _type_normaliser = string.maketrans('+-/.','____')
 def _norm_type(in_type):
-    return in_type.translate(_type_normaliser).lower()
\ No newline at end of file
+    return in_type.translate(_type_normaliser).lower()
+
+_any_type = _norm_type("*/*")
+media_types = MediaTypes(_norm_type)
@@ -0,0 +1,194 @@
+"""
+http.server.api.files - serving static files
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import os, stat, time, mmap, mimetypes
+from .Resource import Resource
+from ..spool import FileBody
+from ...feature.ranges import RangeRequests
+from ...lru import LRUCache
+from ... import status
+
+class CachedFile:
+    """
+    A file's stat() result and, once it has been read, a read-only mmap
+    of it (which holds its own descriptor, so the file needn't be kept
+    open).
+
+    @ivar filename: the file's name
+    @ivar realpath: filename with symlinks resolved
+    @ivar stat: the file's stat() result
+    @ivar checked: when stat was last checked
+    @type checked: float
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.stat = os.stat(filename)
+        self.realpath = os.path.realpath(filename)
+        self.checked = time.time()
+        self._map = None
+
+    def isdir(self):
+        return stat.S_ISDIR(self.stat.st_mode)
+
+    def unchanged(self, other):
+        """Whether other (a stat() result) is of the same file contents."""
+        mine = self.stat
+        return mine.st_ino == other.st_ino and mine.st_dev == other.st_dev \
+          and mine.st_size == other.st_size and mine.st_mtime == other.st_mtime
+
+    def body(self):
+        """Return a FileBody of the file's contents."""
+        if self._map is None:
+            fp = open(self.filename, 'rb')
+            try:
+                self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                fp.close()
+        return FileBody(self._map, 0, self.stat.st_size)
+
+
+class FileCache:
+    """
+    Keeps the stat() results and mmaps of recently served files, so that
+    busy files aren't opened (or stat()ed) on every request. Entries are
+    re-checked with stat() once they're max_age seconds old, and kept if
+    the file hasn't changed.
+
+    An evicted file's mmap is closed once the responses still reading
+    it are done with it. Files should be replaced (e.g., by renaming a
+    new one over them) rather than rewritten in place, since truncating
+    a mapped file can crash the process reading it.
+
+    @ivar files: filename -> L{CachedFile}
+    @type files: L{LRUCache}
+    @ivar max_age: seconds between stat() calls for a file
+    @type max_age: float
+    """
+    def __init__(self, max_items=1000, max_age=1.0):
+        self.files = LRUCache(max_items)
+        self.max_age = max_age
+
+    def get(self, filename):
+        """
+        Return the CachedFile for filename. Raises OSError if it can't
+        be stat()ed.
+        """
+        entry = self.files.get(filename)
+        now = time.time()
+        if entry is not None and now - entry.checked < self.max_age:
+            return entry
+        try:
+            fresh = CachedFile(filename)
+        except OSError:
+            self.files.pop(filename)
+            raise
+        if entry is not None and entry.unchanged(fresh.stat):
+            entry.checked = now
+            entry.realpath = fresh.realpath
+            return entry
+        self.files.set(filename, fresh)
+        return fresh
+
+    def clear(self):
+        self.files.clear()
+
+
+class Files(Resource):
+    """
+    Serves the files under a directory (the root class attribute), with
+    the path segments below it naming a file. A directory is served by
+    its index file, if it has one.
+
+    ETag and Last-Modified are derived from the file's stat(), so
+    conditional requests are answered without reading it, and Range
+    requests are answered with slices of it. Bodies are mmaps of the
+    files, kept open by a shared FileCache.
+
+    Hidden files (whose names start with ".") aren't served, and
+    neither is anything outside root, including the targets of symlinks
+    that lead out of it.
+
+    @cvar root: the directory to serve
+    @cvar index: the name of directories' index files, or None
+    @cvar cache: the stat() and mmap cache
+    @type cache: L{FileCache}
+    """
+    root = None
+    index = "index.html"
+    cache = FileCache()
+    default_type = "application/octet-stream"
+
+    def __init__(self, name=None, parent=None, path=None, args=None):
+        Resource.__init__(self, name, parent, path, args)
+        if isinstance(parent, Files):
+            self.filename = os.path.join(parent.filename, name)
+        else:
+            self.filename = self.root
+
+    def pipelineComponents(self):
+        return [RangeRequests(self)] + Resource.pipelineComponents(self)
+
+    def getChild(self, name):
+        if not name or name[0] == "." or "/" in name or os.sep in name \
+          or "\0" in name:
+            raise status.NotFound().exception
+        return self.__class__(name, self)
+
+    def file(self):
+        """Return my CachedFile, or raise NotFound."""
+        try:
+            entry = self.cache.get(self.filename)
+            if entry.isdir():
+                if not self.index:
+                    raise status.NotFound().exception
+                entry = self.cache.get(os.path.join(self.filename, self.index))
+            root = os.path.join(self.cache.get(self.root).realpath, "")
+        except OSError:
+            raise status.NotFound().exception
+        if not stat.S_ISREG(entry.stat.st_mode) \
+          or not entry.realpath.startswith(root):
+            raise status.NotFound().exception
+        return entry
+
+    def etag(self):
+        st = self.file().stat
+        return "%x-%x-%x" % (st.st_ino, st.st_size, int(st.st_mtime * 1000)), False
+
+    def last_modified(self):
+        return int(self.file().stat.st_mtime)
+
+    def GET(self, request, response):
+        entry = self.file()
+        content_type, encoding = mimetypes.guess_type(entry.filename)
+        response.headers['Content-Type'] = [content_type or self.default_type, {}]
+        if encoding is not None:
+            response.headers['Content-Encoding'] = [encoding]
+        if entry.stat.st_size:
+            response.body_file = entry.body()
+        else:
+            response.body = ""
@@ -0,0 +1,191 @@
+"""
+http.server.api.instances - Resource instance caching and write-behind
+state persistence.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import sys, time, threading, traceback
+from ...lru import LRUCache
+
+class WriteBehindScheduler:
+    """
+    Collects dirty Resources and stores their state in batches, at most
+    every interval seconds or once max_batch are pending, instead of
+    once per request. Once started, a background thread also flushes
+    every interval seconds, so that state isn't left waiting for the
+    next request.
+
+    Each class's storeBatch() is called with its pending instances; a
+    Resource marked dirty several times between flushes is stored once.
+    If storeBatch() raises an exception, it's printed to stderr and the
+    batch is queued again.
+    """
+    def __init__(self, interval=1.0, max_batch=100):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._next_flush = time.time() + interval
+        self._thread = None
+        self._stop = None
+
+    def schedule(self, resource):
+        """Queue a dirty resource for storage; flush if due."""
+        self._lock.acquire()
+        try:
+            self._pending[id(resource)] = resource
+            due = len(self._pending) >= self.max_batch or \
+              time.time() >= self._next_flush
+        finally:
+            self._lock.release()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Store every pending resource now."""
+        self._lock.acquire()
+        try:
+            pending, self._pending = self._pending, {}
+            self._next_flush = time.time() + self.interval
+        finally:
+            self._lock.release()
+        self._store(pending.values())
+
+    def store(self, resource):
+        """Store resource now, rather than with the next batch."""
+        self._lock.acquire()
+        try:
+            self._pending.pop(id(resource), None)
+        finally:
+            self._lock.release()
+        self._store([resource])
+
+    def _store(self, resources):
+        batches = {}
+        for resource in resources:
+            resource.dirty = False
+            batches.setdefault(resource.__class__, []).append(resource)
+        for cls, resources in batches.items():
+            try:
+                cls.storeBatch(resources)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+                self._lock.acquire()
+                try:
+                    for resource in resources:
+                        resource.dirty = True
+                        self._pending.setdefault(id(resource), resource)
+                finally:
+                    self._lock.release()
+
+    def start(self):
+        """Flush from a background thread every interval seconds."""
+        self._lock.acquire()
+        try:
+            if self._thread is not None:
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, 
+              args=(self._stop,))
+            self._thread.setDaemon(True)
+            self._thread.start()
+        finally:
+            self._lock.release()
+
+    def stop(self):
+        """Stop the background thread, and store any pending state."""
+        self._lock.acquire()
+        try:
+            thread, self._thread = self._thread, None
+            if self._stop is not None:
+                self._stop.set()
+        finally:
+            self._lock.release()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _run(self, stop):
+        while 1:
+            stop.wait(self.interval)
+            if stop.isSet():
+                return
+            self.flush()
+
+
+class InstanceCache:
+    """
+    Keeps Resource instances between requests, keyed by path, so that
+    they aren't re-instantiated (and their state restored) on every hit.
+
+    Cached instances are shared by concurrent requests. Dirty instances
+    are handed to the scheduler when released, and stored at once when
+    evicted, so that the next instance for their path restores their
+    latest state. The scheduler is started; call close() when done.
+
+    @ivar instances: path -> Resource
+    @type instances: L{LRUCache}
+    @ivar scheduler: where dirty instances are sent
+    @type scheduler: L{WriteBehindScheduler}
+    """
+    def __init__(self, max_items=1000, max_age=None, scheduler=None):
+        self.scheduler = scheduler or WriteBehindScheduler()
+        self.scheduler.start()
+        self.instances = LRUCache(max_items, max_age, on_evict=self._evicted)
+
+    def dereference(self, router, segments):
+        """
+        Return the Resource instance for segments, from the cache if
+        possible.
+        """
+        key = tuple(segments)
+        resource = self.instances.get(key)
+        if resource is None:
+            resource = router.dereference(segments)
+            self.instances.set(key, resource)
+        return resource
+
+    def release(self, resource):
+        """Called when a request has finished with resource."""
+        if resource.dirty:
+            self.scheduler.schedule(resource)
+
+    def clear(self):
+        """Drop every instance and store any dirty state."""
+        for key, resource in self.instances.items():
+            self.instances.pop(key)
+            if resource.dirty:
+                self.scheduler.schedule(resource)
+        self.scheduler.flush()
+
+    def close(self):
+        """Drop every instance, store any dirty state and stop the scheduler."""
+        self.clear()
+        self.scheduler.stop()
+
+    def _evicted(self, key, resource):
+        if resource.dirty:
+            self.scheduler.store(resource)
@@ -0,0 +1,155 @@
+"""
+http.server.api.routing - compiled routing of paths to Resources.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+from ... import status
+from .Resource import Resource
+
+PARAM_MARK = ":"   # children = {':user_id': User} captures a segment
+
+
+class RouteNode:
+    """
+    A compiled Resource class. There is one node per class, shared by
+    every path that reaches it, so recursive children maps are fine.
+
+    @ivar cls: the Resource class
+    @ivar static: literal path segment -> RouteNode
+    @ivar param_name: name of the parameterised child segment, if any
+    @ivar param: RouteNode for the parameterised child segment, if any
+    @ivar dynamic: whether the class overrides getChild()
+    """
+    def __init__(self, cls):
+        self.cls = cls
+        self.static = {}
+        self.param_name = None
+        self.param = None
+        self.dynamic = _overrides(cls, Resource, 'getChild')
+
+
+class Route:
+    """
+    A path resolved to a Resource class, without instantiating anything.
+
+    @ivar cls: the target Resource class
+    @ivar segments: the path segments consumed by the trie
+    @ivar args: captured parameterised segments
+    @type args: dict
+    @ivar remaining: segments left over for a dynamic getChild()
+    """
+    def __init__(self, cls, segments, args, remaining):
+        self.cls = cls
+        self.segments = segments
+        self.args = args
+        self.remaining = remaining
+
+    def instantiate(self):
+        """
+        Build the target Resource instance (only the target; its
+        ancestors are not instantiated). Leftover segments are handed
+        to the target's dereference().
+        """
+        name = self.segments and self.segments[-1] or None
+        resource = self.cls(name, None, self.segments, self.args)
+        if self.remaining:
+            resource = resource.dereference(self.remaining)
+        return resource
+
+
+class Router:
+    """
+    Routes paths to Resources using a trie compiled from the
+    Resource.children class maps.
+
+    Compiled once; call compile() again if a children map changes.
+
+    @ivar timeouts: whether any routed class sets timeout
+    @type timeouts: Boolean
+    @ivar priorities: whether any routed class sets priority
+    @type priorities: Boolean
+    """
+    def __init__(self, root_class):
+        self.root_class = root_class
+        self.compile()
+
+    def compile(self):
+        """(Re)compile the trie from the root Resource class."""
+        self._nodes = {}
+        self.timeouts = self.priorities = False
+        self.root = self._compile(self.root_class)
+
+    def _compile(self, cls):
+        if self._nodes.has_key(cls):
+            return self._nodes[cls]
+        node = self._nodes[cls] = RouteNode(cls)
+        if cls.timeout is not None:
+            self.timeouts = True
+        if cls.priority is not None:
+            self.priorities = True
+        for segment, child in cls.children.items():
+            if segment[:1] == PARAM_MARK:
+                if node.param is not None:
+                    raise ValueError, "%s has more than one parameterised child" % cls.__name__
+                node.param_name = segment[1:]
+                node.param = self._compile(child)
+            else:
+                node.static[segment] = self._compile(child)
+        return node
+
+    def resolve(self, segments):
+        """
+        Given a sequence of path segments, return a Route. Literal
+        segments take precedence over parameterised ones, which take
+        precedence over getChild(). Raises NotFound.
+        """
+        node = self.root
+        args = {}
+        i = 0
+        for segment in segments:
+            child = node.static.get(segment, None)
+            if child is None:
+                if node.param is not None:
+                    args[node.param_name] = segment
+                    child = node.param
+                elif node.dynamic:
+                    break
+                else:
+                    raise status.NotFound().exception
+            node = child
+            i += 1
+        return Route(node.cls, segments[:i], args, segments[i:])
+
+    def dereference(self, segments):
+        """
+        Given a sequence of path segments, return the Resource instance.
+        """
+        return self.resolve(segments).instantiate()
+
+
+def _overrides(cls, base, attr):
+    """Whether cls has its own implementation of base's method attr."""
+    return getattr(cls, attr).im_func is not getattr(base, attr).im_func
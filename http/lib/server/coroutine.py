@@ -0,0 +1,218 @@
+"""
+http.server.coroutine - generator-based coroutines for Resource methods
+and pipeline hooks.
+
+A handler or hook that is a generator function is run as a coroutine.
+It can yield a L{Future} to wait for its result (or exception), or
+another generator to run it to completion first. A coroutine can end
+with "raise Return(value)" to give its caller a result.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import sys, threading, time
+from types import GeneratorType
+
+class Return(Exception):
+    """Raised by a coroutine to finish with a result."""
+    def __init__(self, value=None):
+        Exception.__init__(self, value)
+        self.value = value
+
+class Timeout(Exception):
+    """
+    Thrown into a coroutine, where it's waiting, when its Task's 
+    deadline has passed.
+    """
+    pass
+
+def iscoroutine(obj):
+    """Whether obj is a running coroutine (i.e., a generator)."""
+    return type(obj) is GeneratorType
+
+
+class Future:
+    """
+    The eventual result of an operation. May be completed from any
+    thread; callbacks run in the thread that completes it.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._value = None
+        self._exc_info = None
+
+    def set_result(self, value):
+        self._finish(value, None)
+
+    def set_exception(self, exc_info=None):
+        """Complete with an exception; defaults to the current one."""
+        self._finish(None, exc_info or sys.exc_info())
+
+    def done(self):
+        return self._event.isSet()
+
+    def wait(self, timeout=None):
+        """Block until done (or timeout); return done()."""
+        self._event.wait(timeout)
+        return self._event.isSet()
+
+    def result(self):
+        """Return the result, or raise the exception. Must be done()."""
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+    def add_done_callback(self, func):
+        """Call func(self) when done (immediately, if already done)."""
+        self._lock.acquire()
+        try:
+            if not self._event.isSet():
+                self._callbacks.append(func)
+                return
+        finally:
+            self._lock.release()
+        func(self)
+
+    def _finish(self, value, exc_info):
+        self._lock.acquire()
+        try:
+            if self._event.isSet():
+                return
+            self._value, self._exc_info = value, exc_info
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        finally:
+            self._lock.release()
+        for func in callbacks:
+            func(self)
+
+
+class Task(Future):
+    """
+    Runs a coroutine, and is completed with its result.
+
+    If schedule is given, the coroutine is resumed by calling
+    schedule(func) when a Future it's waiting on completes (e.g., an
+    event loop's call_soon_threadsafe); otherwise, the calling thread
+    blocks on the Future, until deadline (seconds since the epoch) if
+    there is one, and then Timeout is thrown into the coroutine. With
+    a schedule, call cancel() when the deadline passes instead.
+    """
+    def __init__(self, coroutine, schedule=None, deadline=None):
+        Future.__init__(self)
+        self._stack = [coroutine]
+        self._schedule = schedule
+        self._deadline = deadline
+        self._waiting = None
+        self._send = None
+        self._throw = None
+        self._step()
+
+    def cancel(self):
+        """
+        Stop waiting for the Future the coroutine is waiting on, and
+        throw Timeout into it instead, so that it can clean up (or 
+        carry on). The Future is abandoned; e.g., a call on a thread
+        pool runs to completion, but its result is ignored. Does nothing 
+        unless the Task is waiting. Call it where schedule runs 
+        functions (e.g., on the event loop).
+        """
+        if self._waiting is None:
+            return
+        self._waiting = None
+        self._throw = (Timeout, Timeout("deadline passed"), None)
+        self._step()
+
+    def _step(self):
+        stack = self._stack
+        while stack:
+            send, throw = self._send, self._throw
+            self._send = self._throw = None
+            try:
+                if throw is None:
+                    yielded = stack[-1].send(send)
+                else:
+                    yielded = stack[-1].throw(throw[0], throw[1], throw[2])
+            except StopIteration:
+                stack.pop()
+                continue
+            except Return, why:
+                stack.pop()
+                self._send = why.value
+                continue
+            except:
+                stack.pop()
+                self._throw = sys.exc_info()
+                continue
+            if type(yielded) is GeneratorType:
+                stack.append(yielded)
+            elif isinstance(yielded, Future):
+                if not yielded.done():
+                    if self._schedule is not None:
+                        self._waiting = yielded
+                        yielded.add_done_callback(self._wakeup)
+                        return
+                    if not yielded.wait(self._remaining()):
+                        self._throw = (Timeout, Timeout("deadline passed"), None)
+                        continue
+                self._resume(yielded)
+            else:
+                self._send = yielded
+        if self._throw is not None:
+            throw, self._throw = self._throw, None
+            self.set_exception(throw)
+        else:
+            self.set_result(self._send)
+
+    def _resume(self, future):
+        try:
+            self._send = future.result()
+        except:
+            self._throw = sys.exc_info()
+
+    def _remaining(self):
+        if self._deadline is None:
+            return None
+        return max(0, self._deadline - time.time())
+
+    def _wakeup(self, future):
+        self._schedule(lambda: self._continue(future))
+
+    def _continue(self, future):
+        if future is not self._waiting:
+            return          # cancelled
+        self._waiting = None
+        self._resume(future)
+        self._step()
+
+
+def run(coroutine, deadline=None):
+    """
+    Run a coroutine to completion in this thread, and return its result
+    (or raise its exception). See Task for deadline.
+    """
+    return Task(coroutine, deadline=deadline).result()
@@ -0,0 +1,230 @@
+"""
+http.server.metrics - request timing histograms and counters.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import time, threading
+from bisect import bisect_left
+from .api.Resource import Resource, MethodDispatcher
+
+# upper bounds of histogram buckets, in seconds
+BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+  0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Counts of observed values in fixed buckets, with their sum.
+
+    @ivar bounds: the buckets' upper bounds, ascending; a last bucket
+      holds the rest
+    @type bounds: tuple
+    @ivar counts: observations in each bucket (not cumulative)
+    @type counts: list
+    """
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Timing histograms and counters for a server adapter. Set it as
+    the adapter's metrics attribute to have dispatch() record:
+
+      - stage: the time taken by routing ('route'), each pipeline
+        hook (by component class and hook name, with the Resource
+        method as 'handler') and writing the response head
+        ('serialize');
+      - resource: the time taken by each request, by Resource class;
+      - status: the time taken by each request, by status code;
+
+    and the asyncore adapter to count 'connections', 'bytes_in' and
+    'bytes_out'. Times are wall-clock, so they include waiting (e.g.,
+    for a coroutine handler's I/O). When an adapter has no metrics,
+    recording costs an attribute check per stage.
+
+    Other components' statistics can be included with add_source().
+
+    @ivar histograms: name -> label -> L{Histogram}
+    @type histograms: dict
+    @ivar counters: name -> count
+    @type counters: dict
+    @ivar sources: name -> function returning a dict of numbers, or of
+      dicts of numbers (e.g., AdmissionControl.stats)
+    @type sources: dict
+    """
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.histograms = {}
+        self.counters = {}
+        self.sources = {}
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, label, seconds):
+        """Record seconds in histogram name, under label."""
+        self._lock.acquire()
+        try:
+            labels = self.histograms.get(name)
+            if labels is None:
+                labels = self.histograms[name] = {}
+            histogram = labels.get(label)
+            if histogram is None:
+                histogram = labels[label] = Histogram(self.bounds)
+            histogram.observe(seconds)
+        finally:
+            self._lock.release()
+
+    def count(self, name, amount=1):
+        """Add amount to counter name."""
+        self._lock.acquire()
+        try:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        finally:
+            self._lock.release()
+
+    def timed(self, hook, request, response):
+        """
+        A coroutine calling a pipeline hook, and waiting for its result
+        if it has one, recording the time taken as a stage.
+        """
+        start = time.time()
+        try:
+            result = hook(request, response)
+            if result is not None:
+                yield result
+        finally:
+            self.stage_time(request, self.stage(hook), time.time() - start)
+
+    def stage_time(self, request, name, seconds):
+        """
+        Record the seconds a stage of request took, in the stage
+        histogram and in request.timings if it's being recorded.
+        """
+        self.observe('stage', name, seconds)
+        if request.timings is not None:
+            request.timings.append((name, seconds))
+
+    def stage(self, hook):
+        """The stage name of a pipeline hook (a bound method)."""
+        key = (hook.im_class, hook.__name__)
+        name = self._stages.get(key)
+        if name is None:
+            if isinstance(hook.im_self, MethodDispatcher):
+                name = 'handler'
+            else:
+                name = "%s.%s" % (hook.im_class.__name__, hook.__name__)
+            self._stages[key] = name
+        return name
+
+    def finished(self, resource_name, status_code, seconds):
+        """
+        Record a request's time by Resource class name (None if it 
+        wasn't routed) and status code.
+        """
+        if resource_name is not None:
+            self.observe('resource', resource_name, seconds)
+        self.observe('status', str(status_code), seconds)
+
+    def add_source(self, name, stats):
+        """Include the dict returned by stats() under name."""
+        self.sources[name] = stats
+
+    def render(self):
+        """
+        Return the metrics in a plain text exposition format:
+        histograms as cumulative '_bucket' lines with '_sum' and
+        '_count', counters with '_total', and sources' values, one
+        per line.
+        """
+        self._lock.acquire()
+        try:
+            lines = []
+            names = self.histograms.keys()
+            names.sort()
+            for name in names:
+                lines.append("# TYPE http_%s_seconds histogram" % name)
+                labels = self.histograms[name].items()
+                labels.sort()
+                for label, histogram in labels:
+                    total = 0
+                    for bound, count in zip(histogram.bounds + ('+Inf',),
+                      histogram.counts):
+                        total += count
+                        lines.append('http_%s_seconds_bucket{%s="%s",le="%s"} %d' % (
+                          name, name, _escape(label), bound, total))
+                    lines.append('http_%s_seconds_sum{%s="%s"} %.6f' % (
+                      name, name, _escape(label), histogram.sum))
+                    lines.append('http_%s_seconds_count{%s="%s"} %d' % (
+                      name, name, _escape(label), histogram.count))
+            counters = self.counters.items()
+            counters.sort()
+            for name, value in counters:
+                lines.append("# TYPE http_%s_total counter" % name)
+                lines.append("http_%s_total %d" % (name, value))
+            sources = self.sources.items()
+        finally:
+            self._lock.release()
+        sources.sort()
+        for source, stats in sources:
+            items = stats().items()
+            items.sort()
+            for key, value in items:
+                if isinstance(value, dict):
+                    values = value.items()
+                    values.sort()
+                    for name, number in values:
+                        lines.append('%s_%s{key="%s"} %s' % (
+                          source, name, _escape(str(key)), number))
+                else:
+                    lines.append("%s_%s %s" % (source, key, value))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class MetricsResource(Resource):
+    """
+    Serves metrics.render() as text/plain. Mount a subclass with
+    metrics set to the adapter's Metrics in the Resource tree.
+    """
+    metrics = None
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {'charset': 'us-ascii'}]
+        response.headers['Cache-Control'] = {'no-store': None}
+        if self.metrics is None:
+            response.body = ""
+        else:
+            response.body = self.metrics.render()
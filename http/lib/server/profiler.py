@@ -0,0 +1,232 @@
+"""
+http.server.profiler - sampling the stacks of slow requests.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import sys, os, time, threading, thread
+from collections import deque
+from .api.Resource import Resource
+
+class Profile:
+    """
+    What was seen of a request while it was profiled.
+
+    @ivar reason: 'sampled' (one in every) or 'slow' (over threshold)
+    @type reason: string
+    @ivar stacks: collapsed stack ("file:function;..." from the
+      outermost frame) -> number of samples
+    @type stacks: dict
+    @ivar timings: (stage, seconds) pairs (see server.metrics)
+    @type timings: list
+    @ivar header_parses: header values parsed for the request and its
+      response
+    @type header_parses: int
+    """
+    def __init__(self, request, thread, started, reason):
+        self.request = request
+        self.method = request.method
+        self.uri = request.uri
+        self.thread = thread
+        self.started = started
+        self.reason = reason
+        self.stacks = {}
+        self.timings = request.timings
+        self.status_code = None
+        self.elapsed = None
+        self.header_parses = 0
+
+    def sample(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append("%s:%s" % (os.path.basename(code.co_filename), code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        stack = ";".join(stack)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+
+class Profiler:
+    """
+    Samples the stacks of requests that take longer than threshold
+    seconds (from then on), and of one in every requests (from the
+    start). Set it as a server adapter's profiler attribute.
+
+    A sampler thread, started with the first request and kept until
+    close(), looks at the stack of the thread dispatching each profiled
+    request every interval seconds (with the asyncore adapter, that's
+    the event loop, so samples include whatever else it's doing; a
+    blocking method shows as waiting for the thread pool, unless the
+    request is dispatched synchronously there). It waits without 
+    polling while no requests are in flight. The last size profiles are kept,
+    with the request's stage timings if the adapter has metrics, and
+    its header parse count.
+
+    @ivar profiles: recent L{Profile}s, oldest first
+    @type profiles: deque
+    """
+    def __init__(self, threshold=1.0, every=None, interval=0.005, size=100):
+        self.threshold = threshold
+        self.every = every
+        self.interval = interval
+        self.size = size
+        self.profiles = deque()
+        self._in_flight = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+        self._thread = None
+        self._stop = None
+
+    def start(self, request):
+        """Track request, being dispatched in the current thread."""
+        request.timings = []
+        self._lock.acquire()
+        try:
+            self._count += 1
+            if self.every and self._count % self.every == 0:
+                reason = 'sampled'
+            else:
+                reason = None
+            self._in_flight[id(request)] = Profile(request,
+              thread.get_ident(), time.time(), reason)
+            if not self._busy.isSet():
+                self._busy.set()
+            if self._thread is None:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._sample, 
+                  args=(self._stop,))
+                self._thread.setDaemon(True)
+                self._thread.start()
+        finally:
+            self._lock.release()
+
+    def finish(self, request, response):
+        """
+        Stop tracking request; keep its profile if it was sampled or
+        slow.
+        """
+        self._lock.acquire()
+        try:
+            profile = self._in_flight.pop(id(request), None)
+            if not self._in_flight:
+                self._busy.clear()
+            if profile is None:
+                return
+            profile.elapsed = time.time() - profile.started
+            if profile.reason is None and self.threshold is not None and \
+              profile.elapsed >= self.threshold:
+                profile.reason = 'slow'
+            if profile.reason is None:
+                return
+            profile.request = None
+            profile.status_code = response.status_code
+            profile.header_parses = request.headers.parses + \
+              response.headers.parses
+            self.profiles.append(profile)
+            while len(self.profiles) > self.size:
+                self.profiles.popleft()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Stop the sampler thread, and wait for it to finish."""
+        self._lock.acquire()
+        try:
+            thread, self._thread = self._thread, None
+            if self._stop is not None:
+                self._stop.set()
+                self._busy.set()    # wake the sampler if it's waiting
+        finally:
+            self._lock.release()
+        if thread is not None:
+            thread.join()
+
+    def _sample(self, stop):
+        while 1:
+            self._busy.wait()
+            stop.wait(self.interval)
+            if stop.isSet():
+                return
+            now = time.time()
+            self._lock.acquire()
+            try:
+                frames = None
+                for profile in self._in_flight.values():
+                    if profile.reason is None:
+                        if self.threshold is None or \
+                          now - profile.started < self.threshold:
+                            continue
+                        profile.reason = 'slow'
+                    if frames is None:
+                        frames = sys._current_frames()
+                    frame = frames.get(profile.thread)
+                    if frame is not None:
+                        profile.sample(frame)
+            finally:
+                self._lock.release()
+
+    def render(self):
+        """
+        Return the kept profiles as text, newest first: a summary line,
+        stage timings, and collapsed stacks with their sample counts
+        (as used by flame graph tools).
+        """
+        self._lock.acquire()
+        try:
+            profiles = list(self.profiles)
+        finally:
+            self._lock.release()
+        profiles.reverse()
+        lines = []
+        for profile in profiles:
+            lines.append("%s %s %s %.6fs %s header_parses=%d" % (
+              profile.method, profile.uri, profile.status_code,
+              profile.elapsed, profile.reason, profile.header_parses))
+            for name, seconds in profile.timings:
+                lines.append("  stage %s %.6f" % (name, seconds))
+            stacks = profile.stacks.items()
+            stacks.sort()
+            for stack, count in stacks:
+                lines.append("  %s %d" % (stack, count))
+            lines.append("")
+        return "\n".join(lines)
+
+
+class ProfileResource(Resource):
+    """
+    Serves profiler.render() as text/plain. Mount a subclass with
+    profiler set to the adapter's Profiler in the Resource tree (and
+    protect it; stacks show the server's internals).
+    """
+    profiler = None
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {'charset': 'us-ascii'}]
+        response.headers['Cache-Control'] = {'no-store': None}
+        if self.profiler is None:
+            response.body = ""
+        else:
+            response.body = self.profiler.render()
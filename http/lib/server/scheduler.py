@@ -0,0 +1,148 @@
+"""
+http.server.scheduler - priority scheduling of requests waiting to be
+dispatched.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import time, urlparse
+from collections import deque
+from .. import status
+
+class Classifier:
+    """
+    Assigns requests to scheduling classes: by the first rule whose
+    method and path prefix match, then by the priority attribute of
+    the Resource class the request is routed to (without instantiating
+    it), and otherwise to default.
+
+    @ivar rules: (class name, method, path prefix) tuples; None matches
+      any method or path
+    @type rules: list
+    """
+    def __init__(self, default='default'):
+        self.rules = []
+        self.default = default
+
+    def add(self, name, method=None, prefix=None):
+        """Assign requests with method and path prefix to class name."""
+        self.rules.append((name, method, prefix))
+
+    def classify(self, adapter, request):
+        path = urlparse.urlsplit(request.uri)[2]
+        for name, method, prefix in self.rules:
+            if (method is None or method == request.method) and \
+              (prefix is None or path.startswith(prefix)):
+                return name
+        if not adapter.router.priorities:
+            return self.default
+        try:
+            cls = adapter.router.resolve(adapter.path_segments(request)).cls
+        except status.StatusException:
+            return self.default
+        return cls.priority or self.default
+
+
+class Scheduler:
+    """
+    Requests waiting to be dispatched, queued per class and taken in
+    smooth weighted round-robin order: while they have waiting
+    requests, each class gets its weight's share of dispatches (the
+    default weight is 1), so low-priority classes are slowed rather
+    than starved. Within a class, requests are first-come-first-served.
+
+    At most max_active requests are dispatched at once by the adapter.
+
+    @ivar classifier: assigns requests to classes
+    @type classifier: L{Classifier}
+    @ivar weights: class name -> weight
+    @type weights: dict
+    @ivar queues: class name -> deque of (item, time queued)
+    @type queues: dict
+    @ivar metrics: class name -> {'dispatched', 'dropped', 'wait_total',
+      'wait_max'} (wait times in seconds)
+    @type metrics: dict
+    """
+    def __init__(self, max_active=10, weights=None, classifier=None):
+        self.max_active = max_active
+        self.weights = weights or {}
+        self.classifier = classifier or Classifier()
+        self.queues = {}
+        self.metrics = {}
+        self._current = {}
+
+    def put(self, name, item):
+        """Queue item (e.g., a request) in class name."""
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = deque()
+            self._current[name] = 0
+            self.metrics[name] = {'dispatched': 0, 'dropped': 0,
+              'wait_total': 0.0, 'wait_max': 0.0}
+        queue.append((item, time.time()))
+
+    def get(self):
+        """Return the next item, or None if nothing is waiting."""
+        best = None
+        total = 0
+        current = self._current
+        for name, queue in self.queues.items():
+            if not queue:
+                continue
+            weight = self.weights.get(name, 1)
+            total += weight
+            current[name] += weight
+            if best is None or current[name] > current[best]:
+                best = name
+        if best is None:
+            return None
+        current[best] -= total
+        item, queued = self.queues[best].popleft()
+        wait = time.time() - queued
+        metrics = self.metrics[best]
+        metrics['dispatched'] += 1
+        metrics['wait_total'] += wait
+        if wait > metrics['wait_max']:
+            metrics['wait_max'] = wait
+        return best, item
+
+    def drop(self, name):
+        """Count an item of class name that was taken but not dispatched."""
+        metrics = self.metrics[name]
+        metrics['dispatched'] -= 1
+        metrics['dropped'] += 1
+
+    def __len__(self):
+        return sum([len(queue) for queue in self.queues.values()])
+
+    def stats(self):
+        """
+        Return class name -> metrics, with the class's current 'depth'.
+        """
+        out = {}
+        for name, metrics in self.metrics.items():
+            out[name] = metrics.copy()
+            out[name]['depth'] = len(self.queues[name])
+        return out
@@ -0,0 +1,262 @@
+"""
+http.server.spool - message bodies that are read as a stream; request
+bodies are spooled to disk when large.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import os, threading, tempfile, mmap
+from cStringIO import StringIO
+from .. import status
+
+class MemoryBudget:
+    """
+    The number of bytes of request bodies that may be held in memory at
+    once, across requests; bodies that don't fit are spooled to disk.
+    
+    @ivar limit: bytes available
+    @ivar used: bytes currently held
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+        
+    def acquire(self, size):
+        """Reserve size bytes; return False if they aren't available."""
+        self._lock.acquire()
+        try:
+            if self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+        finally:
+            self._lock.release()
+            
+    def release(self, size):
+        self._lock.acquire()
+        try:
+            self.used -= size
+        finally:
+            self._lock.release()
+
+budget = MemoryBudget(32 * 1024 * 1024)
+
+
+class BodyFile:
+    """
+    Base class for body readers. Iterating gives the body in blocks of
+    block_size.
+    
+    @ivar length: the body's length, if known
+    @type length: int
+    """
+    block_size = 8192
+    length = None
+    
+    def read(self, size=-1):
+        raise NotImplementedError
+        
+    def readline(self, size=-1):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+        
+    def __iter__(self):
+        while 1:
+            data = self.read(self.block_size)
+            if not data:
+                return
+            yield data
+
+
+class BodyReader(BodyFile):
+    """
+    Reads a body of known length from a file (e.g., CGI's stdin) as the
+    handler asks for it, without buffering it.
+    
+    @ivar remaining: bytes not yet read
+    @type remaining: int
+    """
+    def __init__(self, fp, length):
+        self.fp = fp
+        self.length = self.remaining = length
+        
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        if not size:
+            return ""
+        return self._got(self.fp.read(size), size)
+        
+    def readline(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        if not size:
+            return ""
+        data = self.fp.readline(size)
+        if data.endswith("\n"):
+            self.remaining -= len(data)
+            return data
+        return self._got(data, size)
+        
+    def _got(self, data, size):
+        self.remaining -= len(data)
+        if len(data) < size:
+            self.remaining = 0
+            raise status.BadRequest().exception  # body shorter than Content-Length
+        return data
+
+
+class Spool(BodyFile):
+    """
+    A request body that's written by the adapter as it arrives, then
+    read by the handler. It's kept in memory up to threshold bytes, as 
+    long as the budget allows, and in a temporary file after that.
+    
+    write() raises RequestEntityTooLarge once more than max_size bytes 
+    have been written. Call seal() when the body is complete, and 
+    close() when it's no longer needed.
+    
+    @ivar size: bytes written
+    @type size: int
+    @ivar spooled: whether the body has been moved to disk
+    @type spooled: Boolean
+    """
+    def __init__(self, threshold=64 * 1024, max_size=None, budget=budget):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.budget = budget
+        self.size = 0
+        self.spooled = False
+        self._file = StringIO()
+        self._held = 0
+        
+    def write(self, data):
+        if not data:
+            return
+        if self.max_size is not None and self.size + len(data) > self.max_size:
+            raise status.RequestEntityTooLarge().exception
+        self.size += len(data)
+        if not self.spooled:
+            if self.size <= self.threshold and \
+              (self.budget is None or self.budget.acquire(len(data))):
+                self._held += len(data)
+            else:
+                self._spool()
+        self._file.write(data)
+        
+    def seal(self):
+        """Finish writing; reading starts at the beginning."""
+        self.length = self.size
+        self._file.seek(0)
+        
+    def read(self, size=-1):
+        return self._file.read(size)
+        
+    def readline(self, size=-1):
+        return self._file.readline(size)
+        
+    def close(self):
+        self._file.close()
+        self._release()
+        
+    def _spool(self):
+        memory, self._file = self._file, tempfile.TemporaryFile()
+        self._file.write(memory.getvalue())
+        memory.close()
+        self.spooled = True
+        self._release()
+        
+    def _release(self):
+        if self._held and self.budget is not None:
+            self.budget.release(self._held)
+        self._held = 0
+
+
+class FileBody(BodyFile):
+    """
+    A body read from part of a seekable file (or an mmap) only as it's
+    sent. slice() gives part of it without reading anything, e.g. for
+    Range requests. Slices share the file; an mmap is sliced, but a 
+    file is sought before each read, so it shouldn't be read from 
+    several threads at once. The file isn't closed by close().
+    
+    @ivar fp: the file
+    @ivar offset: where the body starts in fp
+    @type offset: int
+    """
+    def __init__(self, fp, offset=0, length=None):
+        if length is None:
+            length = _file_size(fp) - offset
+        self.fp = fp
+        self.offset = offset
+        self.length = length
+        self._pos = 0
+        
+    def read(self, size=-1):
+        remaining = self.length - self._pos
+        if size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return ""
+        start = self.offset + self._pos
+        if isinstance(self.fp, mmap.mmap):
+            data = self.fp[start:start + size]
+        else:
+            self.fp.seek(start)
+            data = self.fp.read(size)
+        self._pos += len(data)
+        return data
+        
+    def readline(self, size=-1):
+        remaining = self.length - self._pos
+        if size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return ""
+        start = self.offset + self._pos
+        if isinstance(self.fp, mmap.mmap):
+            end = self.fp.find("\n", start, start + size)
+            if end < 0:
+                end = start + size - 1
+            data = self.fp[start:end + 1]
+        else:
+            self.fp.seek(start)
+            data = self.fp.readline(size)
+        self._pos += len(data)
+        return data
+        
+    def slice(self, first, last):
+        """Return bytes first to last (inclusive) of the body."""
+        return FileBody(self.fp, self.offset + first, last - first + 1)
+
+
+def _file_size(fp):
+    try:
+        return len(fp)  # mmap
+    except TypeError:
+        return os.fstat(fp.fileno()).st_size
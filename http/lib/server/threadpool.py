@@ -0,0 +1,111 @@
+"""
+http.server.threadpool - run blocking Resource methods on a bounded
+pool of threads.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+import threading, Queue
+from .. import status
+from . import coroutine
+
+def blocking(method):
+    """
+    Mark a Resource method as blocking, so that it's run on the server
+    adapter's thread pool. To mark every method of a Resource class,
+    set its blocking attribute to True instead.
+    """
+    method.blocking = True
+    return method
+
+
+class ThreadPool:
+    """
+    A fixed number of worker threads taking calls from a bounded queue.
+
+    @ivar size: number of worker threads
+    @ivar max_queue: number of calls that can wait for a worker
+    @ivar retry_after: Retry-After (seconds) sent when the queue is full
+    """
+    def __init__(self, size=10, max_queue=100, retry_after=1):
+        self.size = size
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._queue = Queue.Queue(max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """
+        Call func(*args) on a worker thread and return a Future for
+        the result. If the result is a coroutine, the worker runs it to
+        completion. Raises ServiceUnavailable if the queue is full.
+        """
+        if len(self._threads) < self.size:
+            self._start()
+        future = coroutine.Future()
+        try:
+            self._queue.put_nowait((future, func, args))
+        except Queue.Full:
+            unavailable = status.ServiceUnavailable()
+            unavailable.headers['Retry-After'] = self.retry_after
+            raise unavailable.exception
+        return future
+
+    def close(self):
+        """Stop the workers once the queue is drained."""
+        self._lock.acquire()
+        try:
+            threads, self._threads = self._threads, []
+        finally:
+            self._lock.release()
+        for thread in threads:
+            self._queue.put(None)
+
+    def _start(self):
+        self._lock.acquire()
+        try:
+            while len(self._threads) < self.size:
+                thread = threading.Thread(target=self._work)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+        finally:
+            self._lock.release()
+
+    def _work(self):
+        while 1:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, func, args = item
+            try:
+                result = func(*args)
+                if coroutine.iscoroutine(result):
+                    result = coroutine.run(result)
+            except:
+                future.set_exception()
+            else:
+                future.set_result(result)
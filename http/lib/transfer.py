@@ -0,0 +1,151 @@
+"""
+http.transfer - transfer-codings for message bodies.
+"""
+
+__license__ = """
+Copyright (c) 2006 Mark Nottingham <mnot@pobox.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__revision__ = "$Id: filelist.py,v 1.15 2002/11/19 13:12:27 akuchling Exp $"
+
+from .header.collection import HeaderValues
+
+linesep = "\r\n"
+
+class ChunkError(ValueError):
+    """A chunked body couldn't be decoded."""
+    pass
+
+def is_chunked(message):
+    """Whether message's body is sent with the chunked transfer-coding."""
+    return 'chunked' in [coding.lower() for coding in 
+      message.headers.get('Transfer-Encoding', [])]
+
+def chunked(body_iter, trailers=None):
+    """
+    Encode the strings from body_iter with the chunked transfer-coding,
+    one chunk per string, without buffering. trailers is serialised 
+    after the last chunk, so it can be filled in while body_iter runs.
+    """
+    for data in body_iter:
+        if data:
+            yield "%x%s%s%s" % (len(data), linesep, data, linesep)
+    if trailers:
+        yield "0%s%s%s" % (linesep, str(trailers), linesep)
+    else:
+        yield "0%s%s" % (linesep, linesep)
+
+def encode(message):
+    """
+    Return an iterator over the strings to send for message's body,
+    applying its transfer-coding. Trailers are only sent when the body
+    is chunked.
+    """
+    if is_chunked(message):
+        return chunked(message.body_iter, message.trailers)
+    return message.body_iter
+
+
+class ChunkedDecoder:
+    """
+    Decodes a chunked body a piece at a time. The caller reads what 
+    wanted asks for -- a line if it's None, otherwise up to that many 
+    bytes -- and passes it to feed() until done is set; this suits both
+    blocking files and asynchat terminators.
+    
+    @ivar wanted: bytes of chunk data still to come, or None for a line
+    @type wanted: int
+    @ivar done: whether the last chunk and trailers have been read
+    @type done: Boolean
+    @ivar trailers: the trailer fields, once done
+    @type trailers: L{HeaderValues}
+    """
+    def __init__(self, trailers=None):
+        if trailers is None:
+            trailers = HeaderValues()
+        self.trailers = trailers
+        self.wanted = None
+        self.done = False
+        self._state = self._size
+        self._trailer_lines = []
+        
+    def feed(self, data):
+        """Consume a line or chunk of data; return any body data."""
+        if self.done:
+            raise ChunkError("data after the end of the body")
+        return self._state(data)
+        
+    def _size(self, line):
+        try:
+            size = int(line.split(";", 1)[0].strip(), 16)
+        except ValueError:
+            raise ChunkError("bad chunk size: %r" % line[:20])
+        if size < 0:
+            raise ChunkError("bad chunk size: %r" % line[:20])
+        if size == 0:
+            self._state = self._trailer
+        else:
+            self.wanted = size
+            self._state = self._data
+        return ""
+        
+    def _data(self, data):
+        if len(data) > self.wanted:
+            raise ChunkError("chunk is longer than its size")
+        self.wanted -= len(data)
+        if not self.wanted:
+            self.wanted = None
+            self._state = self._data_end
+        return data
+        
+    def _data_end(self, line):
+        if line.strip():
+            raise ChunkError("chunk is longer than its size")
+        self._state = self._size
+        return ""
+        
+    def _trailer(self, line):
+        line = line.rstrip(linesep)
+        if line:
+            self._trailer_lines.append(line)
+        else:
+            self.trailers.parseString(linesep.join(self._trailer_lines))
+            self.done = True
+        return ""
+
+
+def dechunk(fp, trailers=None):
+    """
+    Iterate over the body data of a chunked body read from the file-like
+    fp, leaving fp at the end of the message. Received trailer fields
+    are parsed into trailers.
+    """
+    decoder = ChunkedDecoder(trailers)
+    while not decoder.done:
+        if decoder.wanted is None:
+            data = fp.readline()
+        else:
+            data = fp.read(decoder.wanted)
+        if not data:
+            raise ChunkError("incomplete chunked body")
+        data = decoder.feed(data)
+        if data:
+            yield data
@@ -19,3 +19,19 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+
+from ..lib.message import Request
+
+def make_request(uri="/", method="GET", headers="", **attrs):
+    """
+    Return an HTTP/1.1 Request for uri, with headers (a string) parsed
+    and the given attributes (e.g., client) set.
+    """
+    request = Request()
+    request.method = method
+    request.uri = uri
+    request.proto_version = "HTTP/1.1"
+    request.headers.parseString(headers)
+    for name, value in attrs.items():
+        setattr(request, name, value)
+    return request
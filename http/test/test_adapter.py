@@ -0,0 +1,507 @@
+#!/usr/bin/env python2.5
+
+import unittest, threading, socket, httplib
+from ..lib import status, transfer
+from ..lib.message import Request
+from . import make_request
+from ..lib.server import coroutine
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server.adapter.asyncore_server import AsyncoreServer
+from ..lib.server.threadpool import ThreadPool, blocking
+from ..lib.server.scheduler import Scheduler
+from ..lib.server.metrics import Metrics
+from ..lib.server.spool import MemoryBudget
+from ..lib.feature.base import PipelineComponent, Pipeline
+
+
+class Gate:
+    """Futures for tests to complete from another thread."""
+    futures = []
+    def wait(cls):
+        future = coroutine.Future()
+        cls.futures.append(future)
+        return future
+    wait = classmethod(wait)
+
+class Sync(Resource):
+    def GET(self, request, response):
+        response.body = "sync"
+
+class Slow(Resource):
+    def GET(self, request, response):
+        value = yield Gate.wait()
+        response.body = "slow %s" % value
+
+class Nested(Resource):
+    def part(self, value):
+        yield None
+        raise coroutine.Return(value * 2)
+    def GET(self, request, response):
+        value = yield self.part(21)
+        response.body = str(value)
+
+class Broken(Resource):
+    def GET(self, request, response):
+        yield None
+        raise status.Forbidden().exception
+
+class Blocking(Resource):
+    release = threading.Event()
+    def GET(self, request, response):
+        self.release.wait(5)
+        response.body = threading.currentThread().getName()
+    GET = blocking(GET)
+    def PUT(self, request, response):
+        response.body = threading.currentThread().getName()
+
+class AllBlocking(Resource):
+    blocking = True
+    def GET(self, request, response):
+        yield None
+        response.body = threading.currentThread().getName()
+
+class Streamed(Resource):
+    def GET(self, request, response):
+        response.body_iter = ("%05i\n" % i for i in xrange(10000))
+
+class Sized(Resource):
+    def GET(self, request, response):
+        response.headers['Content-Length'] = 6
+        response.body_iter = iter(["abc", "def"])
+
+class Trailing(Resource):
+    def GET(self, request, response):
+        response.headers['Trailer'] = ['X-Count']
+        def body():
+            for i in range(3):
+                yield "abc"
+            response.trailers['X-Count'] = ["3"]
+        response.body_iter = body()
+    def PUT(self, request, response):
+        response.body = "%s %s" % (request.body, request.trailers['X-Sum'][0])
+
+class Upload(Resource):
+    def POST(self, request, response):
+        response.body = "%s %s %s" % (request.body_file.spooled, 
+          request.body_file.size, len(request.body_file.read()))
+
+class Echo(Resource):
+    def POST(self, request, response):
+        response.body = request.body
+    def PUT(self, request, response):
+        response.body_iter = iter(request.body_file)
+
+class Probed(Resource):
+    started = False
+    def GET(self, request, response):
+        def body():
+            Probed.started = True
+            yield "body"
+        response.body_iter = body()
+    def HEAD(self, request, response):
+        response.headers['Content-Length'] = 4
+
+class Root(Resource):
+    children = {'slow': Slow, 'nested': Nested, 'broken': Broken,
+      'blocking': Blocking, 'all_blocking': AllBlocking,
+      'streamed': Streamed, 'sized': Sized, 'trailing': Trailing,
+      'upload': Upload, 'probed': Probed, 'echo': Echo}
+    def GET(self, request, response):
+        response.body = "root"
+
+class AsyncStage(PipelineComponent):
+    def send_response(self, request, response):
+        yield None
+        response.headers['X-Stage'] = ["async"]
+
+
+class Recorder(PipelineComponent):
+    def __init__(self, context, calls):
+        PipelineComponent.__init__(self, context)
+        self.calls = calls
+    def receive_request(self, request, response):
+        self.calls.append(("receive_request", self.context))
+    def send_response(self, request, response):
+        self.calls.append(("send_response", self.context))
+
+class SendOnly(PipelineComponent):
+    def send_request(self, request, response):
+        pass
+
+
+
+class TestCoroutineDispatch(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        self.server.pipeline.append(AsyncStage(self.server))
+
+    def testSync(self):
+        response = self.server.dispatch(make_request("/"))
+        self.assertEqual(response.body, "root")
+        self.assertEqual(response.headers['X-Stage'], ["async"])
+
+    def testNested(self):
+        self.assertEqual(self.server.dispatch(make_request("/nested")).body, "42")
+
+    def testStatus(self):
+        self.assertEqual(self.server.dispatch(make_request("/broken")).status_code, 403)
+
+    def testBlocking(self):
+        future = coroutine.Future()
+        threading.Timer(0.01, future.set_result, ("done",)).start()
+        def wait():
+            value = yield future
+            raise coroutine.Return(value)
+        self.assertEqual(coroutine.run(wait()), "done")
+
+
+class TestDelimiting(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+
+    def testLength(self):
+        response = self.server.dispatch(make_request("/"))
+        self.assertEqual(response.headers['Content-Length'], 4)
+
+    def testChunked(self):
+        response = self.server.dispatch(make_request("/streamed"))
+        self.assertEqual(response.headers['Transfer-Encoding'], ['chunked'])
+        self.failIf(response.headers.has_key('Content-Length'))
+        self.assertEqual(response.body_iter.next(), "00000\n")
+
+    def testClose(self):
+        request = make_request("/streamed")
+        request.proto_version = "HTTP/1.0"
+        response = self.server.dispatch(request)
+        self.failIf(response.headers.has_key('Transfer-Encoding'))
+        self.assertEqual(response.headers['Connection'], ['close'])
+
+    def testKnownLength(self):
+        response = self.server.dispatch(make_request("/sized"))
+        self.assertEqual(response.headers['Content-Length'], 6)
+        self.failIf(response.headers.has_key('Transfer-Encoding'))
+        self.assertEqual(list(response.body_iter), ["abc", "def"])
+
+
+class TestHead(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        Probed.started = False
+
+    def testLength(self):
+        response = self.server.dispatch(make_request("/", "HEAD"))
+        self.assertEqual(response.headers['Content-Length'], 4)
+        self.failIf(response.has_content)
+
+    def testNotStarted(self):
+        response = self.server.dispatch(make_request("/streamed", "HEAD"))
+        self.failIf(response.has_content)
+        self.failIf(response.headers.has_key('Content-Length'))
+
+    def testHeadMethod(self):
+        response = self.server.dispatch(make_request("/probed", "HEAD"))
+        self.assertEqual(response.headers['Content-Length'], 4)
+        self.failIf(Probed.started)
+        self.assertEqual(self.server.dispatch(make_request("/probed")).body, "body")
+
+
+class ImmediateLoop:
+    def call_soon_threadsafe(self, func, *args):
+        func(*args)
+
+class TestPipeline(unittest.TestCase):
+    def testSkipsNoOps(self):
+        pipeline = Pipeline([SendOnly(None), PipelineComponent(None)])
+        self.assertEqual(len(pipeline), 2)
+        self.assertEqual(len(pipeline.send_request), 1)
+        self.assertEqual(pipeline.receive_request, [])
+        self.assertEqual(pipeline.send_response, [])
+        self.assertEqual(pipeline.receive_response, [])
+
+    def testOrder(self):
+        calls = []
+        pipeline = Pipeline([Recorder(1, calls), Recorder(2, calls)])
+        for hook in pipeline.receive_request + pipeline.send_response:
+            hook(None, None)
+        self.assertEqual(calls, [("receive_request", 1), ("receive_request", 2),
+          ("send_response", 2), ("send_response", 1)])
+
+    def testRecompile(self):
+        calls = []
+        pipeline = Pipeline()
+        first = Recorder(1, calls)
+        pipeline.append(first)
+        pipeline.insert(0, Recorder(0, calls))
+        self.assertEqual([h.im_self.context for h in pipeline.receive_request], [0, 1])
+        pipeline.remove(first)
+        self.assertEqual(len(pipeline.send_response), 1)
+        pipeline.components.append(SendOnly(None))
+        self.assertEqual(pipeline.send_request, [])
+        pipeline.compile()
+        self.assertEqual(len(pipeline.send_request), 1)
+
+    def testDispatch(self):
+        calls = []
+        server = ServerAdapter(Root)
+        server.pipeline.append(Recorder("server", calls))
+        server.dispatch(make_request("/"))
+        self.assertEqual(calls, [("receive_request", "server"),
+          ("send_response", "server")])
+
+
+class TestThreadPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        self.server.pool = ThreadPool(size=1, max_queue=1, retry_after=7)
+        self.server.loop = ImmediateLoop()
+        Blocking.release.clear()
+
+    def tearDown(self):
+        Blocking.release.set()
+        threads = self.server.pool._threads
+        self.server.pool.close()
+        for thread in threads:
+            thread.join(5)
+
+    def testOffload(self):
+        Blocking.release.set()
+        main = threading.currentThread().getName()
+        self.assertNotEqual(self.server.dispatch(make_request("/blocking")).body, main)
+        self.assertNotEqual(self.server.dispatch(make_request("/all_blocking")).body, main)
+        request = make_request("/blocking", "PUT")
+        request.headers['Content-Type'] = ["text/plain", {}]
+        request.body = ""
+        self.assertEqual(self.server.dispatch(request).body, main)
+
+    def testQueueFull(self):
+        running = self.server.dispatch_async(make_request("/blocking"))
+        for i in range(100):     # wait for the worker to take the first call
+            if self.server.pool._queue.qsize() == 0:
+                break
+            threading.Event().wait(0.01)
+        queued = self.server.dispatch_async(make_request("/blocking"))
+        rejected = self.server.dispatch_async(make_request("/blocking"))
+        self.assertEqual(rejected.result().status_code, 503)
+        self.assertEqual(rejected.result().headers['Retry-After'], 7)
+        Blocking.release.set()
+        for future in running, queued:
+            future.wait(5)
+            self.assertEqual(future.result().status_code, 200)
+
+
+class TestAsyncoreServer(unittest.TestCase):
+    def setUp(self):
+        Gate.futures = []
+        self.server = AsyncoreServer(Root, address=('127.0.0.1', 0))
+        self.host, self.port = self.server.listen()
+        self.thread = threading.Thread(target=self.server.loop.run)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.close()
+        self.thread.join(5)
+
+    def get(self, path):
+        conn = httplib.HTTPConnection(self.host, self.port)
+        conn.request("GET", path)
+        return conn
+
+    def testGet(self):
+        response = self.get("/").getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), "root")
+
+    def testNotBlocked(self):
+        slow = self.get("/slow")
+        response = self.get("/").getresponse()    # served while /slow waits
+        self.assertEqual(response.read(), "root")
+        Gate.futures[0].set_result("done")
+        self.assertEqual(slow.getresponse().read(), "slow done")
+
+    def testScheduled(self):
+        self.server.scheduler = Scheduler(max_active=1)
+        slow = self.get("/slow")
+        while not Gate.futures:
+            threading.Event().wait(0.01)
+        root = self.get("/")
+        while not len(self.server.scheduler):   # queued behind /slow
+            threading.Event().wait(0.01)
+        Gate.futures[0].set_result("done")
+        self.assertEqual(slow.getresponse().read(), "slow done")
+        self.assertEqual(root.getresponse().read(), "root")
+        self.assertEqual(self.server.scheduler.stats()['default']['dispatched'], 2)
+
+    def testDropped(self):
+        budget = self.server.body_budget = MemoryBudget(10000)
+        self.server.scheduler = Scheduler(max_active=1)
+        slow = self.get("/slow")
+        while not Gate.futures:
+            threading.Event().wait(0.01)
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall("POST /upload HTTP/1.1\r\nHost: x\r\n"
+          "Content-Type: text/plain\r\nContent-Length: 1000\r\n\r\n" + "x" * 1000)
+        while not len(self.server.scheduler):
+            threading.Event().wait(0.01)
+        sock.close()
+        while len(self.server.channels) > 1:     # until the server notices
+            threading.Event().wait(0.01)
+        Gate.futures[0].set_result("done")
+        self.assertEqual(slow.getresponse().read(), "slow done")
+        for i in range(500):                    # until it's dropped
+            if not budget.used:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(budget.used, 0)
+        self.assertEqual(self.server.scheduler.stats()['default']['dropped'], 1)
+
+    def testMetrics(self):
+        self.server.metrics = Metrics()
+        self.assertEqual(self.get("/").getresponse().read(), "root")
+        counters = self.server.metrics.counters
+        self.assertEqual(counters['connections'], 1)
+        self.assert_(counters['bytes_in'] > 0 and counters['bytes_out'] > 0)
+        self.assertEqual(self.server.metrics.histograms['stage']['serialize'].count, 1)
+
+    def testKeepAlive(self):
+        conn = self.get("/nested")
+        self.assertEqual(conn.getresponse().read(), "42")
+        conn.request("GET", "/")
+        self.assertEqual(conn.getresponse().read(), "root")
+
+    def testStreamed(self):
+        conn = self.get("/streamed")
+        response = conn.getresponse()
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        body = response.read()
+        self.assertEqual(len(body), 60000)
+        self.assert_(body.endswith("09999\n"))
+        conn.request("GET", "/sized")
+        self.assertEqual(conn.getresponse().read(), "abcdef")
+
+    def testTrailers(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall("GET /trailing HTTP/1.1\r\nHost: x\r\n\r\n")
+        fp = sock.makefile('rb')
+        head = []
+        while head[-1:] != ["\r\n"]:
+            head.append(fp.readline())
+        self.assert_("Transfer-Encoding: chunked\r\n" in head)
+        trailers = Request().trailers
+        self.assertEqual("".join(transfer.dechunk(fp, trailers)), "abcabcabc")
+        self.assertEqual(trailers['X-Count'], ["3"])
+        sock.close()
+
+    def testChunkedRequest(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall("PUT /trailing HTTP/1.1\r\nHost: x\r\nContent-Type: text/plain\r\n"
+          "Transfer-Encoding: chunked\r\n\r\n"
+          "4\r\nabcd\r\n2;x=y\r\nef\r\n0\r\nX-Sum: 6\r\n\r\n"
+          "GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+        response = httplib.HTTPResponse(sock)
+        response.begin()
+        self.assertEqual(response.read(), "abcdef 6")
+        response = httplib.HTTPResponse(sock)
+        response.begin()
+        self.assertEqual(response.read(), "root")
+        sock.close()
+
+    def testBadChunk(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall("PUT /trailing HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n")
+        self.assert_(sock.recv(1024).startswith("HTTP/1.1 400 "))
+        sock.close()
+
+    def post(self, body, headers, path="/upload"):
+        conn = httplib.HTTPConnection(self.host, self.port)
+        headers['Content-Type'] = "text/plain"
+        conn.request("POST", path, body, headers)
+        return conn.getresponse()
+
+    def testBodyReleased(self):
+        budget = self.server.body_budget = MemoryBudget(10000)
+        for i in range(3):
+            self.assertEqual(self.post("x" * 1000, {}, "/echo").read(), "x" * 1000)
+            self.assertEqual(budget.used, 0)
+
+    def testStreamedFromBody(self):
+        budget = self.server.body_budget = MemoryBudget(100000)
+        conn = httplib.HTTPConnection(self.host, self.port)
+        conn.request("PUT", "/echo", "x" * 20000, {'Content-Type': "text/plain"})
+        response = conn.getresponse()
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        self.assertEqual(response.read(), "x" * 20000)
+        conn.request("GET", "/")                # once the body is written
+        self.assertEqual(conn.getresponse().read(), "root")
+        self.assertEqual(budget.used, 0)
+
+    def testSpooled(self):
+        self.server.spool_threshold = 1000
+        self.assertEqual(self.post("x" * 100, {}).read(), "False 100 100")
+        self.assertEqual(self.post("x" * 5000, {}).read(), "True 5000 5000")
+
+    def testTooLarge(self):
+        self.server.max_body_size = 1000
+        self.assertEqual(self.post("x" * 1001, {}).status, 413)
+        response = self.post("1000\r\n%s\r\n1000\r\n" % ("x" * 4096), 
+          {'Transfer-Encoding': 'chunked'})
+        self.assertEqual(response.status, 413)
+
+    def expect(self, head):
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall(head + "Host: x\r\nContent-Type: text/plain\r\n"
+          "Content-Length: 5\r\nExpect: 100-continue\r\n\r\n")
+        return sock, sock.recv(1024)
+
+    def testContinue(self):
+        sock, interim = self.expect("POST /upload HTTP/1.1\r\n")
+        self.assertEqual(interim, "HTTP/1.1 100 Continue\r\n\r\n")
+        sock.sendall("abcde")
+        response = httplib.HTTPResponse(sock)
+        response.begin()
+        self.assertEqual(response.read(), "False 5 5")
+        sock.close()
+
+    def testExpectationRefused(self):
+        for head, code, max_body_size in [
+          ("POST /missing HTTP/1.1\r\n", 404, None),
+          ("DELETE /upload HTTP/1.1\r\n", 405, None),
+          ("POST /upload HTTP/1.1\r\n", 413, 4)]:
+            self.server.max_body_size = max_body_size
+            sock, final = self.expect(head)
+            self.assert_(final.startswith("HTTP/1.1 %s " % code), final)
+            sock.close()
+
+    def testUnknownExpectation(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall("POST /upload HTTP/1.1\r\nContent-Length: 5\r\n"
+          "Expect: something\r\n\r\n")
+        self.assert_(sock.recv(1024).startswith("HTTP/1.1 417 "))
+        sock.close()
+
+    def testHead(self):
+        conn = httplib.HTTPConnection(self.host, self.port)
+        conn.request("HEAD", "/streamed")
+        response = conn.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), "")
+        conn.request("GET", "/")
+        self.assertEqual(conn.getresponse().read(), "root")
+
+    def testBadRequest(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.sendall("GET / HTTP/1.1\r\nContent-Length: x\r\n\r\n")
+        self.assert_(sock.recv(1024).startswith("HTTP/1.1 400 "))
+        sock.close()
+
+    def testBadRequestLine(self):
+        for line in ["GARBAGE", "GET /", "GET / FTP/1.0", "G(T / HTTP/1.1"]:
+            sock = socket.create_connection((self.host, self.port))
+            sock.sendall(line + "\r\n\r\n")
+            self.assert_(sock.recv(1024).startswith("HTTP/1.1 400 "), line)
+            sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
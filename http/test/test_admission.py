@@ -0,0 +1,101 @@
+#!/usr/bin/env python2.5
+
+import unittest, time
+from . import make_request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server import coroutine
+from ..lib.feature.admission import AdmissionControl
+
+class Root(Resource):
+    futures = []
+    def GET(self, request, response):
+        response.body = "ok"
+    def POST(self, request, response):
+        future = coroutine.Future()
+        Root.futures.append(future)
+        yield future
+        response.body = "done"
+
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        Root.futures = []
+        self.server = ServerAdapter(Root)
+
+    def request(self, **attrs):
+        attrs.setdefault('client', "10.0.0.1")
+        return make_request(**attrs)
+
+    def add(self, **args):
+        self.admission = AdmissionControl(self.server, **args)
+        self.server.pipeline.append(self.admission)
+
+    def testConcurrency(self):
+        self.add(max_concurrent=1)
+        request = self.request(method="POST",
+          headers="Content-Type: text/plain", body="x")
+        first = coroutine.Task(self.server._dispatch(request), lambda f: f())
+        self.assertEqual(self.admission.in_flight, 1)
+        response = self.server.dispatch(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], 1)
+        self.assertEqual(response.headers['Content-Length'], 0)
+        Root.futures[0].set_result(None)
+        self.assertEqual(first.result().body, "done")
+        self.assertEqual(self.admission.in_flight, 0)
+        self.assertEqual(self.server.dispatch(self.request()).status_code, 200)
+        self.assertEqual(self.admission.stats(),
+          {'admitted': 2, 'concurrency': 1, 'rate': 0, 'delay': 0, 'in_flight': 0})
+
+    def testErrorsFinish(self):
+        self.add(max_concurrent=1)
+        request = self.request()
+        request.uri = "/missing"
+        self.assertEqual(self.server.dispatch(request).status_code, 404)
+        self.assertEqual(self.admission.in_flight, 0)
+
+    def testRate(self):
+        self.add(rate=0.5, burst=2)
+        self.assertEqual(self.server.dispatch(self.request()).status_code, 200)
+        self.assertEqual(self.server.dispatch(self.request()).status_code, 200)
+        response = self.server.dispatch(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], 2)
+        self.assertEqual(self.server.dispatch(self.request(client="10.0.0.2")).status_code, 200)
+        self.admission.buckets.get("10.0.0.1")[1] -= 2
+        self.assertEqual(self.server.dispatch(self.request()).status_code, 200)
+        self.assertEqual(self.admission.metrics['rate'], 1)
+
+    def testDelay(self):
+        self.add(target=0.01, interval=0.5)
+        now = time.time()
+        self.assertEqual(self.server.dispatch(self.request(received=now - 0.1)).status_code, 200)
+        self.assertEqual(self.server.dispatch(self.request(received=now - 1)).status_code, 503)
+        self.admission._interval_end = 0
+        response = self.server.dispatch(self.request(received=now - 0.1))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.admission.metrics['delay'], 2)
+        self.assertEqual(self.server.dispatch(self.request(received=time.time())).status_code, 200)
+        self.admission._interval_end = 0
+        self.assertEqual(self.server.dispatch(self.request(received=now - 0.1)).status_code, 200)
+
+    def testDelayFromReady(self):
+        self.add(target=0.01, interval=0.5)
+        now = time.time()
+        request = self.request(received=now - 1, ready=now)    # slow upload
+        self.assertEqual(self.server.dispatch(request).status_code, 200)
+        request = self.request(received=now - 2, ready=now - 1)
+        self.assertEqual(self.server.dispatch(request).status_code, 503)
+
+    def testRefusalShared(self):
+        self.add(max_concurrent=0)
+        first = self.server.dispatch(self.request())
+        second = self.server.dispatch(self.request())
+        self.failIf(first is second)
+        self.assertEqual(len(self.admission._refusals), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
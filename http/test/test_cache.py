@@ -0,0 +1,162 @@
+#!/usr/bin/env python2.5
+
+import unittest, time
+from ..lib.message import Request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.cache import ResponseCache, CachedResponse
+from ..lib import status
+
+class Counted(Resource):
+    calls = 0
+    def GET(self, request, response):
+        Counted.calls += 1
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.body = "call %d" % Counted.calls
+
+class Fresh(Counted):
+    cache_control = {'max-age': '60'}
+    def PUT(self, request, response):
+        response.body = "stored"
+
+class Stale(Counted):
+    cache_control = {'max-age': '0'}
+
+class Private(Counted):
+    cache_control = {'max-age': '60', 'private': None}
+
+class Uncached(Counted):
+    pass
+
+class Expiring(Counted):
+    def GET(self, request, response):
+        Counted.GET(self, request, response)
+        response.headers['Expires'] = time.time() + 60
+
+class Varying(Fresh):
+    def GET(self, request, response):
+        Fresh.GET(self, request, response)
+        response.headers['Vary'] = ['Accept-Language']
+        response.headers['ETag'] = ("v%d" % Counted.calls, False)
+
+class Streamed(Fresh):
+    def GET(self, request, response):
+        Counted.calls += 1
+        response.body_iter = iter(["a", "b"])
+
+class Root(Resource):
+    children = {'fresh': Fresh, 'stale': Stale, 'private': Private,
+      'uncached': Uncached, 'expiring': Expiring, 'varying': Varying,
+      'streamed': Streamed}
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        Counted.calls = 0
+        self.server = ServerAdapter(Root)
+        self.cache = ResponseCache(self.server)
+        self.server.pipeline.append(self.cache)
+
+    def request(self, path, headers="", method="GET"):
+        request = Request()
+        request.method = method
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        if method == "PUT":
+            request.headers['Content-Type'] = ['text/plain', {}]
+            request.body = "x"
+        return self.server.dispatch(request)
+
+    def testHit(self):
+        self.assertEqual(self.request("/fresh").body, "call 1")
+        response = self.request("/fresh")
+        self.assertEqual(response.body, "call 1")
+        self.assertEqual(response.headers['Age'], 0)
+        self.assertEqual(response.headers['Cache-Control'], {'max-age': '60'})
+        self.assertEqual(Counted.calls, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def testHead(self):
+        self.request("/fresh")
+        response = self.request("/fresh", method="HEAD")
+        self.assertEqual(response.headers['Content-Length'], 6)
+        self.assertEqual(response.body, None)
+        self.assertEqual(Counted.calls, 1)
+
+    def testNotStored(self):
+        for path in ["/stale", "/private", "/uncached"]:
+            self.request(path)
+            self.assertEqual(self.request(path).body, "call 2", path)
+            Counted.calls = 0
+
+    def testExpires(self):
+        self.request("/expiring")
+        self.assertEqual(self.request("/expiring").body, "call 1")
+
+    def testRequestDirectives(self):
+        self.request("/fresh")
+        self.assertEqual(self.request("/fresh", "Cache-Control: no-cache").body, "call 2")
+        self.assertEqual(self.request("/fresh").body, "call 2")
+        self.assertEqual(self.request("/fresh", "Pragma: no-cache").body, "call 3")
+        self.assertEqual(self.request("/fresh", "Cache-Control: min-fresh=120").body, "call 4")
+        self.assertEqual(self.request("/fresh", "Cache-Control: max-age=10").body, "call 4")
+        self.assertEqual(self.request("/fresh", "Authorization: Basic eDp5").body, "call 5")
+
+    def testAge(self):
+        self.request("/fresh")
+        cached = self.cache.responses.items()[0][1]
+        cached.stored -= 30
+        self.assertEqual(self.request("/fresh").headers['Age'], 30)
+        self.assertEqual(self.request("/fresh", "Cache-Control: max-age=10").body, "call 2")
+        cached = self.cache.responses.items()[0][1]
+        cached.stored -= 61
+        self.assertEqual(self.request("/fresh").body, "call 3")
+
+    def testVary(self):
+        self.assertEqual(self.request("/varying", "Accept-Language: en").body, "call 1")
+        self.assertEqual(self.request("/varying", "Accept-Language: fr").body, "call 2")
+        response = self.request("/varying", "Accept-Language: en")
+        self.assertEqual(response.body, "call 1")
+        self.assertEqual(response.headers['Vary'], ['Accept-Language'])
+        response = self.request("/varying", 'Accept-Language: fr\r\nIf-None-Match: "v2"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], ("v2", False))
+        self.assertEqual(Counted.calls, 2)
+
+    def testInvalidate(self):
+        self.request("/fresh")
+        self.assertEqual(self.request("/fresh", method="PUT").body, "stored")
+        self.assertEqual(self.request("/fresh").body, "call 2")
+
+    def testStreamed(self):
+        self.assertEqual(self.request("/streamed").body, "ab")
+        response = self.request("/streamed")
+        self.assertEqual(response.body, "ab")
+        self.assertEqual(response.headers['Content-Length'], 2)
+        self.failIf(response.headers.has_key('Transfer-Encoding'))
+        self.assertEqual(Counted.calls, 1)
+
+    def testBeforeDereference(self):
+        self.request("/fresh")
+        self.server.dereference = None
+        self.assertEqual(self.request("/fresh").body, "call 1")
+
+    def testMaxEntrySize(self):
+        self.cache.max_entry_size = 2
+        self.request("/fresh")
+        self.assertEqual(self.request("/fresh").body, "call 2")
+
+
+class TestCachedResponse(unittest.TestCase):
+    def testResponse(self):
+        cached = CachedResponse(status.OK, {'Age': '5'}, "body", {}, 60, 5, 1000.0)
+        self.assertEqual(cached.age(1010.0), 15)
+        response = cached.response(1010.0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Age'], 15)
+        self.assertEqual(response.body, "body")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from ..lib.message import Request
+from ..lib.server import coroutine
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.coalesce import Coalescing
+from ..lib import status
+
+class Expensive(Resource):
+    calls = 0
+    futures = []
+    def GET(self, request, response):
+        Expensive.calls += 1
+        future = coroutine.Future()
+        Expensive.futures.append(future)
+        yield future
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.body = "call %d" % Expensive.calls
+
+class Varying(Expensive):
+    def GET(self, request, response):
+        yield Expensive.GET(self, request, response)
+        response.headers['Vary'] = ['User-Agent']
+
+class Streamed(Expensive):
+    def GET(self, request, response):
+        yield Expensive.GET(self, request, response)
+        response.body_iter = iter(["a", "b"])
+
+class Private(Expensive):
+    def GET(self, request, response):
+        yield Expensive.GET(self, request, response)
+        response.headers['Cache-Control'] = {'private': None}
+
+class Cookie(Expensive):
+    def GET(self, request, response):
+        yield Expensive.GET(self, request, response)
+        response.headers['Set-Cookie'] = ['session=1']
+
+class Failing(Expensive):
+    def GET(self, request, response):
+        yield Expensive.GET(self, request, response)
+        raise status.ServiceUnavailable().exception
+
+class Root(Expensive):
+    children = {'varying': Varying, 'streamed': Streamed, 'failing': Failing,
+      'private': Private, 'cookie': Cookie}
+    def PUT(self, request, response):
+        Expensive.calls += 1
+        yield coroutine.Future()
+
+
+class ImmediateLoop:
+    def call_soon_threadsafe(self, func, *args):
+        func(*args)
+
+
+class TestCoalescing(unittest.TestCase):
+    def setUp(self):
+        Expensive.calls = 0
+        Expensive.futures = []
+        self.server = ServerAdapter(Root)
+        self.server.loop = ImmediateLoop()
+        self.coalescing = Coalescing(self.server)
+        self.server.pipeline.append(self.coalescing)
+
+    def request(self, path, headers="", method="GET"):
+        request = Request()
+        request.method = method
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        if method == "PUT":
+            request.headers['Content-Type'] = ['text/plain', {}]
+            request.body = "x"
+        return self.server.dispatch_async(request)
+
+    def complete(self):
+        for future in Expensive.futures:
+            future.set_result(None)
+
+    def testShared(self):
+        first = self.request("/")
+        second = self.request("/")
+        self.assertEqual(Expensive.calls, 1)
+        self.assertEqual(self.coalescing.stats()['in_flight'], 1)
+        self.complete()
+        first, second = first.result(), second.result()
+        self.assertEqual((first.body, second.body), ("call 1", "call 1"))
+        self.assertEqual(second.headers['Content-Type'], ['text/plain', {}])
+        self.failIf(first.headers.data is second.headers.data)
+        second.headers['X-Mine'] = ['yes']
+        self.failIf(first.headers.has_key('X-Mine'))
+        self.assertEqual(self.coalescing.stats(),
+          {'led': 1, 'shared': 1, 'handled': 0, 'in_flight': 0})
+        self.request("/")
+        self.assertEqual(Expensive.calls, 2)        # no longer in flight
+
+    def testHead(self):
+        first = self.request("/", method="HEAD")
+        second = self.request("/", method="HEAD")
+        other = self.request("/")
+        self.assertEqual(Expensive.calls, 2)
+        self.complete()
+        self.assertEqual(second.result().body, None)
+        self.assertEqual(second.result().headers['Content-Length'], 6)
+
+    def testSelectingHeaders(self):
+        self.request("/")
+        self.request("/", "Accept-Language: fr")
+        self.request("/", 'If-None-Match: "x"')
+        self.request("/", "Authorization: Basic eDp5")
+        self.request("/", "Authorization: Basic eDp5")
+        self.assertEqual(Expensive.calls, 5)
+
+    def testVary(self):
+        first = self.request("/varying", "User-Agent: a")
+        second = self.request("/varying", "User-Agent: b")
+        self.complete()
+        self.assertEqual(second.result().body, "call 2")    # not shared
+        self.assertEqual(self.coalescing.metrics['handled'], 1)
+        self.assertEqual(self.coalescing.varies.get("/varying"), ('User-Agent',))
+        Expensive.futures = []
+        first = self.request("/varying", "User-Agent: a")
+        second = self.request("/varying", "User-Agent: b")
+        third = self.request("/varying", "User-Agent: a")
+        self.assertEqual(Expensive.calls, 4)
+        self.complete()
+        self.assertEqual(third.result().body, first.result().body)
+
+    def testNotShared(self):
+        for path in ["/streamed", "/failing", "/private", "/cookie"]:
+            Expensive.calls = 0
+            Expensive.futures = []
+            self.request(path)
+            second = self.request(path)
+            self.complete()
+            self.assert_(second.done(), path)
+            self.assertEqual(Expensive.calls, 2, path)
+
+    def testUnsafe(self):
+        self.request("/", method="PUT")
+        self.request("/", method="PUT")
+        self.assertEqual(Expensive.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from hashlib import md5
+from ..lib.message import Request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.etag import AutoETag
+from ..lib.server.spool import FileBody
+from ..lib import transfer
+from cStringIO import StringIO
+
+MODIFIED = 784111777   # Sun, 06 Nov 1994 08:49:37 GMT
+
+class Document(Resource):
+    calls = 0
+    tag = ("v2", False)
+    def etag(self):
+        return self.tag
+    def last_modified(self):
+        return MODIFIED
+    def GET(self, request, response):
+        Document.calls += 1
+        response.body = "document"
+    def PUT(self, request, response):
+        Document.calls += 1
+        response.body = "stored"
+
+class Negotiated(Resource):
+    languages = ['en', 'fr']
+    cache_control = {'max-age': '60'}
+    def etag(self):
+        return ("n1", False)
+    def GET(self, request, response):
+        response.body = request.language
+
+class Plain(Resource):
+    def GET(self, request, response):
+        response.body = "plain"
+
+class Generated(Resource):
+    calls = 0
+    def GET(self, request, response):
+        Generated.calls += 1
+        response.headers['Vary'] = ['Accept-Language']
+        response.body_iter = iter(["gen", "erated"])
+    def PUT(self, request, response):
+        response.body = "stored"
+
+class File(Resource):
+    def GET(self, request, response):
+        response.body_file = FileBody(StringIO("hello world"), 0, 11)
+
+class Root(Resource):
+    children = {'document': Document, 'plain': Plain, 'generated': Generated,
+      'file': File, 'negotiated': Negotiated}
+
+
+class TestConditional(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        Document.calls = 0
+
+    def request(self, headers, method="GET", path="/document"):
+        request = Request()
+        request.method = method
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        return self.server.dispatch(request)
+
+    def testValidators(self):
+        response = self.request("")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], ("v2", False))
+        self.assertEqual(response.headers['Last-Modified'], MODIFIED)
+
+    def testIfNoneMatch(self):
+        response = self.request('If-None-Match: "v1", W/"v2"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], ("v2", False))
+        self.assertEqual(Document.calls, 0)
+        self.assertEqual(self.request('If-None-Match: "v1"').status_code, 200)
+        self.assertEqual(self.request('If-None-Match: *', "PUT").status_code, 412)
+
+    def testNotModifiedHeaders(self):
+        response = self.request("Accept-Language: fr", path="/negotiated")
+        self.assertEqual(response.status_code, 200)
+        response = self.request('Accept-Language: fr\nIf-None-Match: "n1"',
+          path="/negotiated")
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['Vary'], ['Accept-Language'])
+        self.assertEqual(response.headers['Cache-Control'], {'max-age': '60'})
+
+    def testLargeList(self):
+        tags = ", ".join(['"t%i"' % i for i in range(5000)] + ['"v2"'])
+        self.assertEqual(self.request('If-None-Match: %s' % tags).status_code, 304)
+
+    def testIfModifiedSince(self):
+        self.assertEqual(self.request(
+          "If-Modified-Since: Sun, 06 Nov 1994 08:49:37 GMT").status_code, 304)
+        self.assertEqual(self.request(
+          "If-Modified-Since: Sun, 06 Nov 1994 08:49:36 GMT").status_code, 200)
+        # If-None-Match takes precedence
+        self.assertEqual(self.request('If-None-Match: "v1"\r\n'
+          "If-Modified-Since: Sun, 06 Nov 1994 08:49:37 GMT").status_code, 200)
+
+    def testIfMatch(self):
+        self.assertEqual(self.request('If-Match: "v2"', "PUT").status_code, 200)
+        self.assertEqual(self.request('If-Match: W/"v2"', "PUT").status_code, 412)
+        self.assertEqual(self.request('If-Match: "v1"', "PUT").status_code, 412)
+        self.assertEqual(Document.calls, 1)
+        # If-Match takes precedence over If-Unmodified-Since
+        self.assertEqual(self.request('If-Match: *\r\n'
+          "If-Unmodified-Since: Sun, 06 Nov 1994 08:49:36 GMT", "PUT").status_code, 200)
+
+    def testIfUnmodifiedSince(self):
+        self.assertEqual(self.request(
+          "If-Unmodified-Since: Sun, 06 Nov 1994 08:49:36 GMT", "PUT").status_code, 412)
+        self.assertEqual(self.request(
+          "If-Unmodified-Since: Sun, 06 Nov 1994 08:49:37 GMT", "PUT").status_code, 200)
+
+    def testNoValidators(self):
+        response = self.request('If-None-Match: *', path="/plain")
+        self.assertEqual(response.status_code, 200)
+        self.failIf(response.headers.has_key('ETag'))
+
+
+class TestAutoETag(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        self.server.pipeline.append(AutoETag(self.server))
+        Generated.calls = 0
+
+    request = TestConditional.request.im_func
+
+    def testString(self):
+        response = self.request("", path="/plain")
+        etag = response.headers['ETag']
+        self.assertEqual(etag, (md5("plain").hexdigest(), False))
+        response = self.request('If-None-Match: "%s"' % etag[0], path="/plain")
+        self.assertEqual(response.status_code, 304)
+
+    def testFile(self):
+        response = self.request("", path="/file")
+        self.assertEqual(response.headers['ETag'], (md5("hello world").hexdigest(), False))
+        self.assertEqual(response.headers['Content-Length'], 11)
+        self.assertEqual("".join(transfer.encode(response)), "hello world")
+
+    def testExisting(self):
+        response = self.request("")
+        self.assertEqual(response.headers['ETag'], ("v2", False))
+
+    def testStreamed(self):
+        response = self.request("Accept-Language: en", path="/generated")
+        self.assertEqual(response.headers['Trailer'], ['ETag'])
+        self.assertEqual(response.headers['Transfer-Encoding'], ['chunked'])
+        self.failIf(response.headers.has_key('ETag'))
+        encoded = "".join(transfer.encode(response))
+        tag = md5("generated").hexdigest()
+        self.assert_(encoded.endswith('ETag: "%s"\r\n\r\n' % tag), encoded)
+        response = self.request('Accept-Language: en\r\nIf-None-Match: "%s"' % tag, 
+          path="/generated")
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['Vary'], ['Accept-Language'])
+        self.assertEqual(Generated.calls, 1)
+        # a different Vary key isn't matched
+        response = self.request('Accept-Language: fr\r\nIf-None-Match: "%s"' % tag, 
+          path="/generated")
+        self.assertEqual(response.status_code, 200)
+
+    def testInvalidate(self):
+        tags = self.server.pipeline.components[-1].tags
+        tags.set("/generated", ((), {(): ("old", False)}))
+        self.assertEqual(self.request('If-None-Match: "old"', path="/generated").status_code, 304)
+        self.assertEqual(self.request("", "PUT", path="/generated").status_code, 200)
+        self.failIf(tags.has_key("/generated"))
+        self.assertEqual(self.request('If-None-Match: "old"', path="/generated").status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
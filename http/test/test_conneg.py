@@ -0,0 +1,107 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from ..lib.message import Request
+from ..lib.server.api.Resource import Resource, media_types, _norm_type
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.conneg import Dimension, languages, charsets, encodings
+
+class Page(Resource):
+    languages = ('en', 'fr', 'de-CH')
+    charsets = ('utf-8', 'iso-8859-1')
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.body = request.language
+
+class Feed(Resource):
+    def GET_TO_application_atom_xml(self, request, response):
+        response.body = "atom"
+    def GET_TO_application_rss_xml(self, request, response):
+        response.body = "rss"
+
+class Root(Resource):
+    children = {'page': Page, 'feed': Feed}
+
+
+class TestDimensions(unittest.TestCase):
+    def testSpecificity(self):
+        self.assertEqual(encodings.choose("*;q=0.5, gzip;q=0.1", ('gzip', 'deflate')),
+          'deflate')
+        self.assertEqual(languages.choose("en;q=0.2, en-gb", ('en-us', 'en-gb')),
+          'en-gb')
+        self.assertEqual(languages.choose("en", ('fr', 'en-gb')), 'en-gb')
+
+    def testServerPreference(self):
+        self.assertEqual(encodings.choose("deflate, gzip", ('gzip', 'deflate')), 'gzip')
+
+    def testNothingAcceptable(self):
+        self.assertEqual(languages.choose("fr, *;q=0", ('en',)), None)
+        self.assertEqual(encodings.choose("gzip;q=0", ('gzip',)), None)
+
+    def testImplicit(self):
+        self.assertEqual(charsets.choose("utf-8;q=0.5", ('utf-8', 'iso-8859-1')),
+          'iso-8859-1')
+        self.assertEqual(encodings.choose("gzip;q=0.5", ('identity', 'gzip')),
+          'identity')
+        self.assertEqual(encodings.choose("*;q=0", ('identity',)), None)
+
+    def testEmpty(self):
+        self.assertEqual(languages.choose(None, ('en', 'fr')), 'en')
+        self.assertEqual(languages.choose("", ()), None)
+
+    def testMediaTypes(self):
+        variants = tuple(map(_norm_type, ['text/html', 'application/json']))
+        self.assertEqual(media_types.choose("text/*;q=0.5, */*;q=0.1", variants),
+          'text_html')
+        self.assertEqual(media_types.choose("application/JSON", variants),
+          'application_json')
+        self.assertEqual(media_types.choose("image/*", variants), None)
+
+    def testMemo(self):
+        dimension = Dimension('Accept-Language')
+        variants = ('en', 'fr')
+        self.assertEqual(dimension.choose("fr", variants), 'fr')
+        self.assertEqual(dimension.choose("de", variants), None)
+        self.assertEqual(len(dimension.decisions), 2)
+        dimension.decide = None
+        self.assertEqual(dimension.choose("de", variants), None)
+        self.assertEqual(dimension.choose("fr", variants), 'fr')
+
+
+class TestContentNegotiation(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+
+    def get(self, headers, path="/page"):
+        request = Request()
+        request.method = "GET"
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        return self.server.dispatch(request)
+
+    def testLanguage(self):
+        response = self.get("Accept-Language: de, fr;q=0.5")
+        self.assertEqual(response.body, "de-ch")
+        self.assertEqual(response.headers['Content-Language'], ['de-ch'])
+        self.assertEqual(response.headers['Vary'], ['Accept-Language', 'Accept-Charset'])
+
+    def testCharset(self):
+        response = self.get("Accept-Charset: iso-8859-1, utf-8;q=0.9")
+        self.assertEqual(response.body, "en")
+        self.assertEqual(response.headers['Content-Type'],
+          ['text/plain', {'charset': 'iso-8859-1'}])
+
+    def testNotAcceptable(self):
+        response = self.get("Accept-Language: ja")
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response.headers['Vary'], ['Accept-Language'])
+
+    def testMediaType(self):
+        self.assertEqual(self.get("Accept: application/rss+xml", "/feed").body, "rss")
+        self.assertEqual(self.get("", "/feed").body, "atom")
+        self.assertEqual(self.get("Accept: text/html", "/feed").status_code, 406)
+
+
+if __name__ == '__main__':
+    unittest.main()
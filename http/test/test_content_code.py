@@ -0,0 +1,149 @@
+#!/usr/bin/env python2.5
+
+import unittest, zlib, gzip
+from cStringIO import StringIO
+from ..lib.message import Request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.content_code import ContentCode, compress
+from ..lib.feature.etag import AutoETag
+
+BODY = "".join(["line %d of some compressible text\n" % i for i in range(200)])
+
+class Text(Resource):
+    calls = 0
+    def GET(self, request, response):
+        Text.calls += 1
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.headers['ETag'] = ("t1", False)
+        response.body = BODY
+
+class Untagged(Resource):
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.body = BODY
+
+class Stream(Resource):
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/html', {}]
+        response.body_iter = iter([BODY[:1000], BODY[1000:]])
+
+class Small(Resource):
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.body = "small"
+
+class Image(Resource):
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['image/png', {}]
+        response.body = BODY
+
+class Localized(Resource):
+    languages = ('en', 'fr')
+    def etag(self):
+        return ("l1", False)
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.body = "%s: %s" % (request.language, BODY)
+
+class Root(Resource):
+    children = {'text': Text, 'stream': Stream, 'small': Small, 'image': Image,
+      'localized': Localized, 'untagged': Untagged}
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO(data)).read()
+
+
+class TestContentCode(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        self.coder = ContentCode(self.server)
+        self.server.pipeline.append(self.coder)
+
+    def get(self, path, headers="Accept-Encoding: gzip, deflate", method="GET"):
+        request = Request()
+        request.method = method
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        return self.server.dispatch(request)
+
+    def testGzip(self):
+        response = self.get("/text")
+        self.assertEqual(response.headers['Content-Encoding'], ['gzip'])
+        self.assertEqual(response.headers['Vary'], ['Accept-Encoding'])
+        self.assertEqual(response.headers['ETag'], ("t1", True))
+        self.assertEqual(response.headers['Content-Length'], len(response.body))
+        self.assertEqual(gunzip(response.body), BODY)
+
+    def testDeflate(self):
+        response = self.get("/text", "Accept-Encoding: gzip;q=0.5, deflate")
+        self.assertEqual(response.headers['Content-Encoding'], ['deflate'])
+        self.assertEqual(zlib.decompress(response.body), BODY)
+
+    def testIdentity(self):
+        for headers in ["", "Accept-Encoding: identity", "Accept-Encoding: *;q=0",
+          "Accept-Encoding: gzip\nRange: bytes=0-10"]:
+            response = self.get("/text", headers)
+            self.failIf(response.headers.has_key('Content-Encoding'), headers)
+            self.assertEqual(response.headers['Vary'], ['Accept-Encoding'])
+            self.assertEqual(response.body, BODY)
+
+    def testStream(self):
+        response = self.get("/stream")
+        self.assertEqual(response.headers['Content-Encoding'], ['gzip'])
+        self.assertEqual(response.body_length, None)
+        self.assertEqual(gunzip(response.body), BODY)
+
+    def testSkipped(self):
+        for path in ["/small", "/image"]:
+            response = self.get(path)
+            self.failIf(response.headers.has_key('Content-Encoding'), path)
+            self.failIf(response.headers.has_key('Vary'), path)
+
+    def testVariantCache(self):
+        first = self.get("/text").body
+        self.assertEqual(len(self.coder.variants), 1)
+        self.assertEqual(self.get("/text").body, first)
+        self.failUnless(self.coder.variants.get(("/text", "t1", "gzip", ())) is first)
+
+    def testVariantVary(self):
+        english = self.get("/localized", "Accept-Encoding: gzip\nAccept-Language: en")
+        french = self.get("/localized", "Accept-Encoding: gzip\nAccept-Language: fr")
+        self.assertEqual(gunzip(english.body)[:4], "en: ")
+        self.assertEqual(gunzip(french.body)[:4], "fr: ")
+        self.assertEqual(len(self.coder.variants), 2)
+
+    def testAutoETag(self):
+        self.server.pipeline.append(AutoETag(self.server))
+        for i in range(3):
+            response = self.get("/untagged")
+            self.assertEqual(response.headers['Content-Length'], len(response.body))
+            self.assertEqual(response.headers['ETag'][1], True)
+        self.assertEqual(len(self.coder.variants), 1)
+
+    def testLargeVariant(self):
+        self.coder.max_variant_size = 100
+        response = self.get("/text")
+        self.assertEqual(response.body_length, None)    # streamed
+        self.assertEqual(gunzip(response.body), BODY)
+        self.assertEqual(len(self.coder.variants), 0)
+
+    def testHead(self):
+        response = self.get("/text", method="HEAD")
+        self.assertEqual(response.headers['Content-Encoding'], ['gzip'])
+        self.assertEqual(response.headers['ETag'], ("t1", True))
+        self.assertEqual(response.body, None)
+        self.assertEqual(len(self.coder.variants), 0)
+        body = self.get("/text").body
+        response = self.get("/text", method="HEAD")
+        self.assertEqual(response.headers['Content-Length'], len(body))
+
+    def testCompress(self):
+        data = "".join(compress(iter(["a" * 1000, "b" * 1000]), 'deflate'))
+        self.assertEqual(zlib.decompress(data), "a" * 1000 + "b" * 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python2.5
+
+import unittest, threading, time
+from . import make_request
+from ..lib.server import coroutine
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server.threadpool import ThreadPool, blocking
+
+class Waiting(Resource):
+    futures = []
+    def GET(self, request, response):
+        future = coroutine.Future()
+        Waiting.futures.append(future)
+        try:
+            yield future
+        except coroutine.Timeout:
+            Waiting.cleaned_up = True
+            raise
+        response.body = "done"
+
+class Quick(Waiting):
+    timeout = 0.01
+
+class Remaining(Resource):
+    def GET(self, request, response):
+        response.body = "%.1f" % request.remaining()
+
+class Blocked(Resource):
+    release = threading.Event()
+    def GET(self, request, response):
+        self.release.wait(5)
+        response.body = "late"
+    GET = blocking(GET)
+
+class Root(Waiting):
+    children = {'quick': Quick, 'remaining': Remaining, 'blocked': Blocked}
+
+
+class ManualLoop:
+    def __init__(self):
+        self.timers = []
+    def call_soon_threadsafe(self, func, *args):
+        func(*args)
+    def call_later(self, delay, func, *args):
+        timer = Timer(delay, func, args)
+        self.timers.append(timer)
+        return timer
+
+class Timer:
+    def __init__(self, delay, func, args):
+        self.delay, self.func, self.args = delay, func, args
+        self.cancelled = False
+    def cancel(self):
+        self.cancelled = True
+
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        Waiting.futures = []
+        Waiting.cleaned_up = False
+        self.server = ServerAdapter(Root)
+
+    def testNone(self):
+        request = make_request("/remaining")
+        self.assertEqual(self.server.deadline(request), None)
+        self.assertEqual(request.remaining(), None)
+
+    def testNotRouted(self):
+        self.failUnless(self.server.router.timeouts)
+        server = ServerAdapter(Remaining)
+        self.failIf(server.router.timeouts)
+        server.router.resolve = None
+        self.assertEqual(server.deadline(make_request("/")), None)
+
+    def testConfigured(self):
+        self.server.timeout = 10
+        request = make_request("/")
+        request.received = 1000.0
+        self.assertEqual(self.server.deadline(request), 1010.0)
+        self.assert_(self.server.deadline(make_request("/quick")) < time.time() + 1)
+        self.assertEqual(self.server.dispatch(make_request("/remaining")).body, "10.0")
+
+    def testHeader(self):
+        self.server.timeout = 10
+        self.server.timeout_header = 'x-request-timeout'
+        request = make_request("/", headers="X-Request-Timeout: 2\r\n")
+        request.received = 1000.0
+        self.assertEqual(self.server.deadline(request), 1002.0)
+        for value in ["20", "-1", "soon"]:
+            request = make_request("/", headers="X-Request-Timeout: %s\r\n" % value)
+            request.received = 1000.0
+            self.assertEqual(self.server.deadline(request), 1010.0, value)
+
+    def testTimedOut(self):
+        response = self.server.dispatch(make_request("/quick"))
+        self.assertEqual(response.status_code, 504)
+        self.assert_(Waiting.cleaned_up)
+        self.assertEqual(self.server.slow, {'Quick': {'expired': 0, 'timed_out': 1}})
+
+    def testExpired(self):
+        self.server.timeout = 1
+        request = make_request("/")
+        request.received = time.time() - 2
+        self.assertEqual(self.server.dispatch(request).status_code, 503)
+        self.assertEqual(Waiting.futures, [])
+        self.assertEqual(self.server.slow, {'Root': {'expired': 1, 'timed_out': 0}})
+
+    def testAbandoned(self):
+        Blocked.release.clear()
+        self.server.pool = ThreadPool(size=1)
+        self.server.timeout = 0.01
+        try:
+            self.assertEqual(self.server.dispatch(make_request("/blocked")).status_code, 504)
+        finally:
+            Blocked.release.set()
+            self.server.pool.close()
+
+    def testCancelled(self):
+        self.server.loop = ManualLoop()
+        self.server.timeout = 5
+        future = self.server.dispatch_async(make_request("/"))
+        timer = self.server.loop.timers[0]
+        self.assert_(4 < timer.delay <= 5)
+        timer.func()
+        self.assertEqual(future.result().status_code, 504)
+        self.assert_(Waiting.cleaned_up)
+        self.assert_(timer.cancelled)
+        Waiting.futures[0].set_result(None)        # abandoned
+        self.assertEqual(future.result().status_code, 504)
+
+    def testFinishedInTime(self):
+        self.server.loop = ManualLoop()
+        self.server.timeout = 5
+        future = self.server.dispatch_async(make_request("/"))
+        Waiting.futures[0].set_result(None)
+        self.assertEqual(future.result().body, "done")
+        self.assert_(self.server.loop.timers[0].cancelled)
+        self.server.loop.timers[0].func()
+        self.assertEqual(future.result().body, "done")
+
+
+if __name__ == '__main__':
+    unittest.main()
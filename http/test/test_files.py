@@ -0,0 +1,115 @@
+#!/usr/bin/env python2.5
+
+import unittest, tempfile, shutil, os
+from ..lib.message import Request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.api.files import Files, FileCache
+from ..lib.server.adapter.base import ServerAdapter
+
+BODY = "".join([chr(ord('a') + i % 26) for i in range(1000)])
+
+class Static(Files):
+    cache = FileCache(max_age=0)
+
+class Root(Resource):
+    children = {'static': Static}
+
+
+class TestFiles(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        Static.root = os.path.join(self.root, "public")
+        os.mkdir(Static.root)
+        os.mkdir(os.path.join(Static.root, "docs"))
+        self.write("public/page.html", BODY)
+        self.write("public/docs/index.html", "index")
+        self.write("public/.hidden", "hidden")
+        self.write("public/empty.txt", "")
+        self.write("secret", "secret")
+        self.server = ServerAdapter(Root)
+
+    def tearDown(self):
+        Static.cache.clear()
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        fp = open(os.path.join(self.root, name), 'wb')
+        fp.write(data)
+        fp.close()
+
+    def get(self, path, headers=""):
+        request = Request()
+        request.method = "GET"
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        return self.server.dispatch(request)
+
+    def testGet(self):
+        response = self.get("/static/page.html")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'][0], 'text/html')
+        self.assertEqual(response.headers['Content-Length'], 1000)
+        self.failUnless(response.headers.has_key('ETag'))
+        self.failUnless(response.headers.has_key('Last-Modified'))
+        self.assertEqual(response.body, BODY)
+
+    def testIndex(self):
+        self.assertEqual(self.get("/static/docs").body, "index")
+        self.assertEqual(self.get("/static").status_code, 404)
+
+    def testEmpty(self):
+        response = self.get("/static/empty.txt")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Length'], 0)
+
+    def testNotFound(self):
+        for path in ["/static/missing", "/static/../secret",
+          "/static/docs/../../secret", "/static/.hidden", "/static/%2e%2e/secret"]:
+            self.assertEqual(self.get(path).status_code, 404, path)
+
+    def testSymlinks(self):
+        os.symlink(os.path.join(self.root, "secret"),
+          os.path.join(Static.root, "outside"))
+        os.symlink(os.path.join(Static.root, "page.html"),
+          os.path.join(Static.root, "docs", "inside"))
+        os.symlink(self.root, os.path.join(Static.root, "up"))
+        self.assertEqual(self.get("/static/outside").status_code, 404)
+        self.assertEqual(self.get("/static/up/secret").status_code, 404)
+        self.assertEqual(self.get("/static/docs/inside").body, BODY)
+
+    def testConditional(self):
+        etag = self.get("/static/page.html").headers.data['ETag']
+        response = self.get("/static/page.html", "If-None-Match: %s" % etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, None)
+
+    def testChanged(self):
+        etag = self.get("/static/page.html").headers.data['ETag']
+        os.rename(os.path.join(self.root, "secret"),
+          os.path.join(Static.root, "page.html"))
+        response = self.get("/static/page.html", "If-None-Match: %s" % etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, "secret")
+
+    def testRange(self):
+        response = self.get("/static/page.html", "Range: bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], (10, 19, 1000))
+        self.assertEqual(response.body, BODY[10:20])
+
+    def testCache(self):
+        cache = FileCache(max_age=60)
+        filename = os.path.join(Static.root, "page.html")
+        entry = cache.get(filename)
+        self.failUnless(cache.get(filename) is entry)
+        self.assertEqual(entry.body().read(), BODY)
+        cache.max_age = 0
+        self.failUnless(cache.get(filename) is entry)
+        os.remove(filename)
+        self.assertRaises(OSError, cache.get, filename)
+        self.failIf(cache.files.has_key(filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
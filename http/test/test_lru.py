@@ -0,0 +1,56 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from ..lib.lru import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.evicted = []
+        self.cache = LRUCache(3, on_evict=lambda k, v: self.evicted.append(k))
+
+    def testGetSet(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('b', 2), 2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def testEvictsLeastRecentlyUsed(self):
+        for key in 'abc':
+            self.cache.set(key, key)
+        self.cache.get('a')
+        self.cache.set('d', 'd')
+        self.assertEqual(self.evicted, ['b'])
+        self.assertEqual([k for k, v in self.cache.items()], ['d', 'a', 'c'])
+
+    def testReplaceAndPop(self):
+        self.cache.set('a', 1)
+        self.cache.set('a', 2)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.pop('a'), 2)
+        self.assertEqual(self.evicted, [])
+        self.assertEqual(len(self.cache), 0)
+
+    def testMaxSize(self):
+        cache = LRUCache(100, max_size=10)
+        cache.set('a', 'a', size=6)
+        cache.set('b', 'b', size=6)
+        self.assertEqual(cache.has_key('a'), False)
+        self.assertEqual(cache.size, 6)
+        cache.set('c', 'c', size=20)    # too big, but the newest entry stays
+        self.assertEqual(cache.items(), [('c', 'c')])
+
+    def testMaxAge(self):
+        self.cache.set('a', 1, max_age=-1)
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.evicted, ['a'])
+
+    def testClear(self):
+        self.cache.set('a', 1)
+        self.cache.clear()
+        self.assertEqual(self.evicted, ['a'])
+        self.assertEqual(self.cache.size, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from . import make_request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server.metrics import Metrics, MetricsResource, Histogram
+from ..lib.feature.base import PipelineComponent
+
+metrics = Metrics()
+
+class Exposed(MetricsResource):
+    metrics = metrics
+
+class Waiting(Resource):
+    def GET(self, request, response):
+        yield None
+        response.body = "waited"
+
+class Root(Resource):
+    children = {'metrics': Exposed, 'waiting': Waiting}
+    def GET(self, request, response):
+        response.body = "root"
+
+class Stage(PipelineComponent):
+    def receive_request(self, request, response):
+        pass
+
+
+
+class TestHistogram(unittest.TestCase):
+    def testBuckets(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual((histogram.count, histogram.sum), (4, 2.65))
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.__init__()
+        self.server = ServerAdapter(Root)
+        self.server.pipeline.append(Stage(self.server))
+
+    def testDisabled(self):
+        self.assertEqual(self.server.dispatch(make_request("/")).body, "root")
+        self.assertEqual(metrics.histograms, {})
+
+    def testStages(self):
+        self.server.metrics = metrics
+        self.assertEqual(self.server.dispatch(make_request("/waiting")).body, "waited")
+        self.assertEqual(self.server.dispatch(make_request("/missing")).status_code, 404)
+        stages = metrics.histograms['stage']
+        self.assertEqual(stages['handler'].count, 1)
+        self.assertEqual(stages['route'].count, 1)
+        self.assertEqual(stages['Stage.receive_request'].count, 2)
+        self.assertEqual(metrics.histograms['resource'].keys(), ['Waiting'])
+        self.assertEqual(metrics.histograms['status']['404'].count, 1)
+
+    def testRender(self):
+        self.server.metrics = metrics
+        metrics.count('connections')
+        metrics.add_source('admission', lambda: {'admitted': 3})
+        metrics.add_source('slow', lambda: self.server.slow)
+        self.server.slow['Root'] = {'expired': 1, 'timed_out': 2}
+        self.server.dispatch(make_request("/"))
+        response = self.server.dispatch(make_request("/metrics"))
+        self.assertEqual(response.headers['Content-Type'][0], 'text/plain')
+        lines = response.body.split("\n")
+        self.assert_('http_status_seconds_bucket{status="200",le="+Inf"} 1' in lines)
+        self.assert_('http_status_seconds_count{status="200"} 1' in lines)
+        self.assert_('http_connections_total 1' in lines)
+        self.assert_('admission_admitted 3' in lines)
+        self.assert_('slow_timed_out{key="Root"} 2' in lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
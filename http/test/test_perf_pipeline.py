@@ -0,0 +1,68 @@
+#!/usr/bin/env python2.5
+
+# Pipeline dispatch overhead by pipeline length; components that don't
+# implement a hook cost nothing once the pipeline is compiled. The
+# "built" columns also build the pipeline for each request, as every
+# Resource instance does.
+
+from ..lib.feature.base import PipelineComponent, Pipeline
+import time
+
+class NoOp(PipelineComponent):
+	pass
+
+class Stage(PipelineComponent):
+	def receive_request(self, request, response):
+		pass
+
+def naive(components, t):
+	n = 0
+	while n < t:
+		for stage in components:
+			stage.receive_request(None, None)
+		for stage in components[::-1]:
+			stage.send_response(None, None)
+		n += 1
+
+def compiled(pipeline, t):
+	n = 0
+	while n < t:
+		for hook in pipeline.receive_request:
+			hook(None, None)
+		for hook in pipeline.send_response:
+			hook(None, None)
+		n += 1
+
+def naive_built(components, t):
+	n = 0
+	while n < t:
+		built = list(components)
+		for stage in built:
+			stage.receive_request(None, None)
+		for stage in built[::-1]:
+			stage.send_response(None, None)
+		n += 1
+
+def compiled_built(components, t):
+	n = 0
+	while n < t:
+		pipeline = Pipeline(components)
+		for hook in pipeline.receive_request:
+			hook(None, None)
+		for hook in pipeline.send_response:
+			hook(None, None)
+		n += 1
+
+def timed(func, arg, t):
+	a = time.time()
+	func(arg, t)
+	b = time.time()
+	return t / (b - a)
+
+t = 20000
+print "length\tnaive ops/sec\tcompiled ops/sec\tnaive built\tcompiled built"
+for length in [1, 2, 4, 8, 16]:
+	components = [Stage(None)] + [NoOp(None) for i in range(length - 1)]
+	print "%i\t%i\t%i\t%i\t%i" % (length, 
+	  timed(naive, components, t), timed(compiled, Pipeline(components), t),
+	  timed(naive_built, components, t), timed(compiled_built, components, t))
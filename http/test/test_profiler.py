@@ -0,0 +1,85 @@
+#!/usr/bin/env python2.5
+
+import unittest, time
+from . import make_request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server.metrics import Metrics
+from ..lib.server.profiler import Profiler, ProfileResource
+
+class Sleepy(Resource):
+    def GET(self, request, response):
+        time.sleep(0.05)
+        response.body = "slept"
+
+class Debug(ProfileResource):
+    pass
+
+class Root(Resource):
+    children = {'sleepy': Sleepy, 'debug': Debug}
+    def GET(self, request, response):
+        request.headers.get('Accept')
+        response.body = "root"
+
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+
+    def tearDown(self):
+        if self.server.profiler is not None:
+            self.server.profiler.close()
+
+    def testSampled(self):
+        self.server.metrics = Metrics()
+        self.server.profiler = Profiler(threshold=None, every=2)
+        for i in range(4):
+            self.server.dispatch(make_request("/", headers="Accept: text/plain"))
+        profiles = self.server.profiler.profiles
+        self.assertEqual(len(profiles), 2)
+        profile = profiles[0]
+        self.assertEqual((profile.uri, profile.status_code, profile.reason), ("/", 200, 'sampled'))
+        self.assertEqual(profile.header_parses, 1)
+        self.assert_('handler' in [name for name, seconds in profile.timings])
+
+    def testSlow(self):
+        self.server.profiler = Profiler(threshold=0.01, interval=0.002)
+        self.server.dispatch(make_request("/"))
+        self.server.dispatch(make_request("/sleepy"))
+        profiles = self.server.profiler.profiles
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual((profiles[0].uri, profiles[0].reason), ("/sleepy", 'slow'))
+        stacks = profiles[0].stacks.keys()
+        self.assert_(stacks)
+        self.assert_([stack for stack in stacks if stack.endswith("test_profiler.py:GET")])
+
+    def testRing(self):
+        self.server.profiler = Profiler(threshold=None, every=1, size=2)
+        for uri in ["/", "/debug", "/"]:
+            self.server.dispatch(make_request(uri))
+        self.assertEqual([p.uri for p in self.server.profiler.profiles], ["/debug", "/"])
+
+    def testOneSampler(self):
+        profiler = self.server.profiler = Profiler()
+        self.server.dispatch(make_request("/"))
+        sampler = profiler._thread
+        self.server.dispatch(make_request("/"))
+        self.assert_(profiler._thread is sampler)
+        self.assert_(sampler.isAlive())
+        profiler.close()
+        self.failIf(sampler.isAlive())
+
+    def testResource(self):
+        self.server.profiler = Debug.profiler = Profiler(threshold=None, every=1)
+        try:
+            self.server.dispatch(make_request("/"))
+            response = self.server.dispatch(make_request("/debug"))
+        finally:
+            Debug.profiler = None
+        self.assertEqual(response.headers['Content-Type'][0], 'text/plain')
+        self.assert_(response.body.startswith("GET / 200 "))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python2.5
+
+import unittest, tempfile, mmap
+from ..lib.message import Request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server.spool import FileBody
+from ..lib.feature.ranges import RangeRequests, coalesce
+
+BODY = "".join([chr(ord('a') + i % 26) for i in range(1000)])
+
+class Text(Resource):
+    def GET(self, request, response):
+        response.headers['Content-Type'] = ['text/plain', {}]
+        response.headers['ETag'] = ("t1", False)
+        response.body = BODY
+
+class File(Resource):
+    fp = None
+    def GET(self, request, response):
+        response.body_file = FileBody(self.fp)
+
+class Generated(Resource):
+    def GET(self, request, response):
+        response.body_iter = iter([BODY])
+
+class Root(Resource):
+    children = {'text': Text, 'file': File, 'generated': Generated}
+
+
+class TestCoalesce(unittest.TestCase):
+    def testCoalesce(self):
+        self.assertEqual(coalesce([['500', '599'], ['0', '99'], ['50', '150'], 
+          ['151', '200'], [None, '100'], ['950', None]], 1000), 
+          [(0, 200), (500, 599), (900, 999)])
+
+    def testClamp(self):
+        self.assertEqual(coalesce([['900', '2000'], [None, '5000']], 1000), [(0, 999)])
+
+    def testUnsatisfiable(self):
+        self.assertEqual(coalesce([['1000', None], [None, '0']], 1000), [])
+
+    def testInvalid(self):
+        self.assertEqual(coalesce([['10', '5']], 1000), None)
+        self.assertEqual(coalesce([], 1000), None)
+
+
+class TestRangeRequests(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        self.server.pipeline.append(RangeRequests(self.server))
+        File.fp = tempfile.TemporaryFile()
+        File.fp.write(BODY)
+        File.fp.flush()
+
+    def tearDown(self):
+        File.fp.close()
+
+    def get(self, headers, path="/text"):
+        request = Request()
+        request.method = "GET"
+        request.uri = path
+        request.proto_version = "HTTP/1.1"
+        request.headers.parseString(headers)
+        return self.server.dispatch(request)
+
+    def testSingle(self):
+        response = self.get("Range: bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], (10, 19, 1000))
+        self.assertEqual(response.headers['Content-Length'], 10)
+        self.assertEqual(response.body, BODY[10:20])
+
+    def testFile(self):
+        response = self.get("Range: bytes=-5", "/file")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body_file.length, 5)
+        self.assertEqual(response.body, BODY[-5:])
+
+    def testMmap(self):
+        File.fp = mmap.mmap(File.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        response = self.get("Range: bytes=100-", "/file")
+        self.assertEqual(response.headers['Content-Length'], 900)
+        self.assertEqual(response.body, BODY[100:])
+
+    def testMultipart(self):
+        response = self.get("Range: bytes=0-1, 1-3, 998-", "/file")
+        self.assertEqual(response.status_code, 206)
+        content_type, params = response.headers['Content-Type']
+        self.assertEqual(content_type, 'multipart/byteranges')
+        body = response.body
+        self.assertEqual(response.headers['Content-Length'], len(body))
+        parts = body.split("--" + params['boundary'])
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(parts[1], "\r\nContent-Range: bytes 0-3/1000\r\n\r\nabcd\r\n")
+        self.assertEqual(parts[2], "\r\nContent-Range: bytes 998-999/1000\r\n\r\nkl\r\n")
+        self.assertEqual(parts[3], "--\r\n")
+
+    def testMultipartType(self):
+        body = self.get("Range: bytes=0-0, 2-2").body
+        self.assert_("Content-Type: text/plain\r\n" in body)
+
+    def testUnsatisfiable(self):
+        response = self.get("Range: bytes=1000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], (None, None, 1000))
+
+    def testIfRange(self):
+        self.assertEqual(self.get('Range: bytes=0-0\r\nIf-Range: "t1"').status_code, 206)
+        self.assertEqual(self.get('Range: bytes=0-0\r\nIf-Range: "t0"').status_code, 200)
+        self.assertEqual(self.get('Range: bytes=0-0\r\nIf-Range: W/"t1"').status_code, 200)
+
+    def testIgnored(self):
+        response = self.get("Range: bytes=0-0", "/generated")
+        self.assertEqual(response.status_code, 200)
+        self.failIf(response.headers.has_key('Accept-Ranges'))
+        response = self.get("Range: items=0-0")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Accept-Ranges'], ['bytes'])
+
+    def testMalformed(self):
+        for value in ["bytes=abc", "bytes=0-1,x", "bytes=-", "bytes= , "]:
+            response = self.get("Range: %s" % value)
+            self.assertEqual(response.status_code, 200, value)
+            self.assertEqual(response.body, BODY, value)
+
+
+if __name__ == '__main__':
+    unittest.main()
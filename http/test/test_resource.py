@@ -0,0 +1,289 @@
+#!/usr/bin/env python2.5
+
+import unittest, sys
+from StringIO import StringIO
+from ..lib import status
+from . import make_request
+from ..lib.server.api.Resource import Resource, dispatch_table
+from ..lib.server.api.routing import Router
+from ..lib.server.api.instances import InstanceCache, WriteBehindScheduler
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.base import _layout_cache
+
+
+class Leaf(Resource):
+    def GET(self, request, response):
+        response.body = "leaf %s" % self.reference()
+
+class Item(Resource):
+    children = {'detail': Leaf}
+    def GET(self, request, response):
+        response.body = "item %s" % self.path_args['item_id']
+
+class Items(Resource):
+    children = {':item_id': Item, 'all': Leaf}
+Items.children['self'] = Items    # recursive maps compile once per class
+
+class Dynamic(Resource):
+    def getChild(self, name):
+        if name == 'nope':
+            raise status.NotFound().exception
+        return Leaf(name, self)
+
+class Typed(Resource):
+    def GET(self, request, response):
+        response.body = "default"
+    def GET_TO_application_json(self, request, response):
+        response.body = "{}"
+    GET_TO_application_json.content_type = "application/json"
+    def GET_TO_text_html(self, request, response):
+        response.body = "<p/>"
+    def PUT_application_xml(self, request, response):
+        response.body = "xml"
+
+class Featured(Resource):
+    cache_control = {'max-age': '60'}
+    languages = ['en']
+    def etag(self):
+        return ("f", False)
+
+class Counter(Resource):
+    restored = stored = 0
+    batches = []
+    def storeState(self):
+        Counter.stored += 1
+    def restoreState(self):
+        Counter.restored += 1
+        self.count = 0
+    def POST(self, request, response):
+        self.count += 1
+        self.dirty = True
+        response.body = str(self.count)
+    def storeBatch(cls, resources):
+        cls.batches.append(len(resources))
+    storeBatch = classmethod(storeBatch)
+
+class StoredCounter(Counter):
+    store = {}
+    fail = False
+    def storeState(self):
+        if StoredCounter.fail:
+            raise IOError("store unavailable")
+        StoredCounter.store[self.name] = self.count
+    def restoreState(self):
+        self.count = StoredCounter.store.get(self.name, 0)
+    storeBatch = Resource.storeBatch
+
+class Counters(Resource):
+    children = {':name': Counter}
+
+class Stored(Resource):
+    children = {':name': StoredCounter}
+
+class Root(Resource):
+    children = {
+        'counters': Counters,
+        'stored': Stored,
+        'leaf': Leaf,
+        'items': Items,
+        'dynamic': Dynamic,
+        'typed': Typed,
+    }
+    def GET(self, request, response):
+        response.body = "root"
+
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = Router(Root)
+
+    def testRoot(self):
+        route = self.router.resolve([])
+        self.assertEqual(route.cls, Root)
+        self.assertEqual(route.remaining, [])
+
+    def testStatic(self):
+        route = self.router.resolve(['items', 'all'])
+        self.assertEqual(route.cls, Leaf)
+        self.assertEqual(route.args, {})
+
+    def testParameterised(self):
+        route = self.router.resolve(['items', '42', 'detail'])
+        self.assertEqual(route.cls, Leaf)
+        self.assertEqual(route.args, {'item_id': '42'})
+        self.assertEqual(route.segments, ['items', '42', 'detail'])
+
+    def testRecursive(self):
+        route = self.router.resolve(['items', 'self', 'self', 'all'])
+        self.assertEqual(route.cls, Leaf)
+
+    def testDynamic(self):
+        route = self.router.resolve(['dynamic', 'x'])
+        self.assertEqual(route.cls, Dynamic)
+        self.assertEqual(route.remaining, ['x'])
+        resource = route.instantiate()
+        self.assert_(isinstance(resource, Leaf))
+        self.assertEqual(resource.reference(), "/dynamic/x")
+
+    def testNotFound(self):
+        self.assertRaises(status.StatusException, self.router.resolve, ['missing'])
+        self.assertRaises(status.StatusException, self.router.dereference, ['dynamic', 'nope'])
+
+
+class TestServerAdapterRouting(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root, '/base/')
+
+    def testDispatch(self):
+        response = self.server.dispatch(make_request("/base/items/7?q=1"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, "item 7")
+
+    def testReference(self):
+        response = self.server.dispatch(make_request("/base/items/7/detail"))
+        self.assertEqual(response.body, "leaf /items/7/detail")
+
+    def testUnquote(self):
+        response = self.server.dispatch(make_request("/base/items/a%20b"))
+        self.assertEqual(response.body, "item a b")
+
+    def testNotFound(self):
+        response = self.server.dispatch(make_request("/base/missing"))
+        self.assertEqual(response.status_code, 404)
+        response = self.server.dispatch(make_request("/elsewhere/leaf"))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestDispatchTable(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+
+    def testPerClass(self):
+        self.assert_(dispatch_table(Typed) is dispatch_table(Typed))
+        self.assertEqual(dispatch_table(Typed).allow, ['GET', 'HEAD', 'PUT'])
+        self.assertEqual([e[0] for e in dispatch_table(Typed).entries[('GET', None)]],
+          [None, 'application_json', 'text_html'])
+
+    def testMethodNotAllowed(self):
+        response = self.server.dispatch(make_request("/typed", "DELETE"))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.headers['Allow'], ['GET', 'HEAD', 'PUT'])
+
+    def testRequestType(self):
+        request = make_request("/typed", "PUT")
+        request.headers['Content-Type'] = ["application/xml", {}]
+        request.body = "<a/>"
+        self.assertEqual(self.server.dispatch(request).body, "xml")
+        request.headers['Content-Type'] = ["text/plain", {}]
+        self.assertEqual(self.server.dispatch(request).status_code, 415)
+        del request.headers['Content-Type']
+        self.assertEqual(self.server.dispatch(request).status_code, 400)
+
+    def testNegotiation(self):
+        request = make_request("/typed")
+        response = self.server.dispatch(request)
+        self.assertEqual(response.body, "default")
+        self.assertEqual(response.headers['Vary'], ['Accept'])
+        request.headers['Accept'] = {"text/html": {"q": "0.5"}, "application/json": {}}
+        response = self.server.dispatch(request)
+        self.assertEqual(response.body, "{}")
+        self.assertEqual(response.headers['Content-Type'], ["application/json", {}])
+        request.headers['Accept'] = {"text/*": {}}
+        self.assertEqual(self.server.dispatch(request).body, "<p/>")
+        request.headers['Accept'] = {"image/png": {}}
+        self.assertEqual(self.server.dispatch(request).body, "default")
+
+
+class TestPipeline(unittest.TestCase):
+    def testComponents(self):
+        resource = Featured()
+        self.assertEqual([c.__class__.__name__ for c in resource.pipeline],
+          ['CachePolicy', 'ContentNegotiation', 'ConditionalRequests', 'MethodDispatcher'])
+        classes = tuple([c.__class__ for c in resource.pipeline])
+        self.assert_(_layout_cache.has_key(classes))
+        other = Featured().pipeline
+        self.assertEqual([hook.im_self.context for hook in other.send_response],
+          [other.components[0].context] * len(other.send_response))
+        self.assert_(other.receive_request is not resource.pipeline.receive_request)
+
+
+class TestInstanceCache(unittest.TestCase):
+    def setUp(self):
+        Counter.restored = Counter.stored = 0
+        Counter.batches = []
+        StoredCounter.store = {}
+        StoredCounter.fail = False
+        self.server = ServerAdapter(Root)
+        self.scheduler = WriteBehindScheduler(interval=3600, max_batch=3)
+        self.server.instance_cache = InstanceCache(2, scheduler=self.scheduler)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def post(self, uri):
+        request = make_request(uri, "POST")
+        request.headers['Content-Type'] = ["text/plain", {}]
+        request.body = ""
+        return self.server.dispatch(request).body
+
+    def testReuse(self):
+        self.assertEqual(self.post("/counters/a"), "1")
+        self.assertEqual(self.post("/counters/a"), "2")
+        self.assertEqual(Counter.restored, 1)
+
+    def testEviction(self):
+        self.post("/counters/a")
+        self.post("/counters/b")
+        self.post("/counters/c")     # evicts /a
+        self.assertEqual(self.post("/counters/a"), "1")
+        self.assertEqual(Counter.restored, 4)
+
+    def testBatchedWrites(self):
+        self.scheduler.max_batch = 2
+        self.post("/counters/a")
+        self.post("/counters/a")
+        self.assertEqual(Counter.batches, [])
+        self.post("/counters/b")
+        self.assertEqual(Counter.batches, [2])
+        self.post("/counters/a")
+        self.post("/counters/b")
+        self.server.instance_cache.clear()
+        self.assertEqual(Counter.batches, [2, 2])
+
+    def testEvictedState(self):
+        self.server.instance_cache = InstanceCache(1, scheduler=self.scheduler)
+        self.assertEqual([self.post("/stored/%s" % name) for name in "aaba"],
+          ["1", "2", "1", "3"])
+        self.assertEqual(StoredCounter.store, {'a': 2, 'b': 1})
+
+    def testStoreFailure(self):
+        StoredCounter.fail = True
+        self.post("/stored/a")
+        self.post("/stored/b")
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            self.assertEqual(self.post("/stored/c"), "1")   # flushes
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(StoredCounter.store, {})
+        StoredCounter.fail = False
+        self.scheduler.flush()
+        self.assertEqual(StoredCounter.store, {'a': 1, 'b': 1, 'c': 1})
+
+    def testUncached(self):
+        self.server.instance_cache = None
+        self.post("/counters/a")
+        self.assertEqual(self.post("/counters/a"), "1")
+        self.assertEqual(Counter.stored, 2)
+        self.assertEqual(Counter.batches, [])
+
+    def testUncachedClean(self):
+        # state is stored even if the handler didn't set dirty
+        self.server.instance_cache = None
+        self.server.dispatch(make_request("/counters/a"))
+        self.assertEqual(Counter.stored, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from . import make_request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.server.scheduler import Scheduler, Classifier
+
+class Background(Resource):
+    priority = 'bulk'
+
+class Root(Resource):
+    children = {'background': Background}
+
+
+
+class TestClassifier(unittest.TestCase):
+    def setUp(self):
+        self.server = ServerAdapter(Root)
+        self.classifier = Classifier()
+
+    def testPriority(self):
+        classify = self.classifier.classify
+        self.assertEqual(classify(self.server, make_request("/")), 'default')
+        self.assertEqual(classify(self.server, make_request("/background")), 'bulk')
+        self.assertEqual(classify(self.server, make_request("/missing")), 'default')
+
+    def testNotRouted(self):
+        server = ServerAdapter(Resource)
+        server.router.resolve = None
+        self.assertEqual(self.classifier.classify(server, make_request("/")), 'default')
+
+    def testRules(self):
+        self.classifier.add('writes', method="POST")
+        self.classifier.add('health', prefix="/background/health")
+        classify = self.classifier.classify
+        self.assertEqual(classify(self.server, make_request("/", "POST")), 'writes')
+        self.assertEqual(classify(self.server, make_request("/background/health?x")), 'health')
+        self.assertEqual(classify(self.server, make_request("/background?x")), 'bulk')
+
+
+class TestScheduler(unittest.TestCase):
+    def testWeighted(self):
+        scheduler = Scheduler(weights={'interactive': 3})
+        for i in range(6):
+            scheduler.put('interactive', i)
+            scheduler.put('bulk', i)
+        self.assertEqual(len(scheduler), 12)
+        order = [scheduler.get()[0] for i in range(8)]
+        self.assertEqual(order.count('interactive'), 6)
+        self.assertEqual(order.count('bulk'), 2)
+        self.assert_('bulk' in order[:4])         # not starved
+        self.assertEqual([scheduler.get() for i in range(4)],
+          [('bulk', 2), ('bulk', 3), ('bulk', 4), ('bulk', 5)])
+        self.assertEqual(scheduler.get(), None)
+
+    def testStats(self):
+        scheduler = Scheduler()
+        scheduler.put('default', 'a')
+        scheduler.put('default', 'b')
+        name, item = scheduler.get()
+        self.assertEqual((name, item), ('default', 'a'))
+        scheduler.drop(name)
+        stats = scheduler.stats()['default']
+        self.assertEqual((stats['dispatched'], stats['dropped'], stats['depth']), (0, 1, 1))
+        self.assert_(stats['wait_max'] >= 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python2.5
+
+import unittest, mmap, tempfile
+from StringIO import StringIO
+from ..lib import status
+from ..lib.server.spool import Spool, BodyReader, FileBody, MemoryBudget
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.budget = MemoryBudget(100)
+
+    def testMemory(self):
+        spool = Spool(10, budget=self.budget)
+        spool.write("abc\n")
+        spool.write("def")
+        spool.seal()
+        self.failIf(spool.spooled)
+        self.assertEqual(self.budget.used, 7)
+        self.assertEqual(spool.readline(), "abc\n")
+        self.assertEqual(spool.read(), "def")
+        spool.close()
+        self.assertEqual(self.budget.used, 0)
+
+    def testThreshold(self):
+        spool = Spool(10, budget=self.budget)
+        spool.write("abcdef")
+        spool.write("ghijkl")
+        self.assert_(spool.spooled)
+        self.assertEqual(self.budget.used, 0)
+        spool.seal()
+        self.assertEqual("".join(spool), "abcdefghijkl")
+        spool.close()
+
+    def testBudget(self):
+        held = Spool(100, budget=self.budget)
+        held.write("x" * 95)
+        spool = Spool(100, budget=self.budget)
+        spool.write("y" * 10)
+        self.assert_(spool.spooled)
+        held.close()
+        spool.close()
+        self.assertEqual(self.budget.used, 0)
+
+    def testMaxSize(self):
+        spool = Spool(10, max_size=5, budget=self.budget)
+        spool.write("abcde")
+        try:
+            spool.write("f")
+        except status.StatusException, why:
+            self.assertEqual(why.message.status_code, 413)
+        else:
+            self.fail("no RequestEntityTooLarge")
+        spool.close()
+
+
+class TestBodyReader(unittest.TestCase):
+    def testRead(self):
+        reader = BodyReader(StringIO("abc\ndefgh"), 7)
+        self.assertEqual(reader.readline(), "abc\n")
+        self.assertEqual(reader.read(2), "de")
+        self.assertEqual(reader.read(), "f")
+        self.assertEqual(reader.read(), "")
+
+    def testShort(self):
+        reader = BodyReader(StringIO("abc"), 7)
+        self.assertRaises(status.StatusException, reader.read)
+
+
+class TestFileBody(unittest.TestCase):
+    def testReadline(self):
+        fp = tempfile.TemporaryFile()
+        fp.write("xxabc\ndefgh\nij")
+        fp.flush()
+        for source in [fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)]:
+            body = FileBody(source, 2, 11)
+            self.assertEqual(body.readline(), "abc\n")
+            self.assertEqual(body.readline(2), "de")
+            self.assertEqual(body.readline(), "fgh\n")
+            self.assertEqual(body.readline(), "i")
+            self.assertEqual(body.readline(), "")
+        fp.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
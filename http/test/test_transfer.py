@@ -0,0 +1,70 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from StringIO import StringIO
+from ..lib import transfer
+from ..lib.message import Response
+
+
+class TestChunked(unittest.TestCase):
+    def testEncode(self):
+        self.assertEqual("".join(transfer.chunked(["abc", "", "0123456789abcdef"])),
+          "3\r\nabc\r\n10\r\n0123456789abcdef\r\n0\r\n\r\n")
+
+    def testLazy(self):
+        pulled = []
+        def body():
+            for i in range(3):
+                pulled.append(i)
+                yield "x"
+        chunks = transfer.chunked(body())
+        self.assertEqual(chunks.next(), "1\r\nx\r\n")
+        self.assertEqual(pulled, [0])
+
+    def testMessage(self):
+        response = Response()
+        response.body_iter = iter(["a", "b"])
+        self.assertEqual(list(transfer.encode(response)), ["a", "b"])
+        response.body_iter = iter(["a", "b"])
+        response.headers['Transfer-Encoding'] = ['chunked']
+        self.assertEqual("".join(transfer.encode(response)), 
+          "1\r\na\r\n1\r\nb\r\n0\r\n\r\n")
+
+    def testTrailers(self):
+        response = Response()
+        response.headers['Transfer-Encoding'] = ['chunked']
+        def body():
+            yield "abc"
+            response.trailers['Content-MD5'] = "kAFQmDzST7DWlj99KOF/cg=="
+        response.body_iter = body()
+        self.assertEqual("".join(transfer.encode(response)), 
+          "3\r\nabc\r\n0\r\nContent-MD5: kAFQmDzST7DWlj99KOF/cg==\r\n\r\n")
+
+
+class TestDechunk(unittest.TestCase):
+    def testDecode(self):
+        fp = StringIO("3;ext=1\r\nabc\r\na\r\n0123456789\r\n0\r\n"
+          "ETag: \"x\"\r\nX-Timing: 12\r\n\r\nnext")
+        trailers = Response().trailers
+        self.assertEqual(list(transfer.dechunk(fp, trailers)), ["abc", "0123456789"])
+        self.assertEqual(trailers['X-Timing'], ["12"])
+        self.assertEqual(trailers['ETag'], ("x", False))
+        self.assertEqual(fp.read(), "next")
+
+    def testRoundTrip(self):
+        message = Response()
+        message.trailers['X-Count'] = ["2"]
+        encoded = "".join(transfer.chunked(["hello", " world"], message.trailers))
+        trailers = Response().trailers
+        self.assertEqual("".join(transfer.dechunk(StringIO(encoded), trailers)), 
+          "hello world")
+        self.assertEqual(trailers['X-Count'], ["2"])
+
+    def testErrors(self):
+        for encoded in ["x\r\n", "5\r\nabc", "3\r\nabcd\r\n0\r\n\r\n", "3\r\nabc\r\n"]:
+            self.assertRaises(transfer.ChunkError, 
+              list, transfer.dechunk(StringIO(encoded)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python2.5
+
+import unittest
+from . import make_request
+from ..lib.server.api.Resource import Resource
+from ..lib.server.adapter.base import ServerAdapter
+from ..lib.feature.vary import VaryKeys, canonical, negotiated
+from ..lib.feature.conneg import languages
+from ..lib.feature.cache import ResponseCache
+
+
+class Page(Resource):
+    calls = 0
+    def GET(self, request, response):
+        Page.calls += 1
+        response.headers['Cache-Control'] = {'max-age': '60'}
+        response.headers['Vary'] = ['Accept-Encoding', 'Accept-Language']
+        response.body = "page"
+
+
+class TestVaryKeys(unittest.TestCase):
+    def setUp(self):
+        self.keys = VaryKeys()
+
+    def key(self, headers, fields=('Accept-Encoding',)):
+        return self.keys.key(make_request(headers=headers), fields)
+
+    def testEncoding(self):
+        gzip = self.key("Accept-Encoding: gzip, deflate")
+        self.assertEqual(gzip, ('gzip',))
+        self.assertEqual(self.key("Accept-Encoding: deflate,gzip"), gzip)
+        self.assertEqual(self.key("Accept-Encoding: GZIP , br"), gzip)
+        self.assertEqual(self.key("Accept-Encoding: identity"), ('identity',))
+        self.assertEqual(self.key(""), (None,))
+        self.assertEqual(self.keys.stats()['Accept-Encoding'],
+          {'gzip': 3, 'identity': 1, None: 1})
+
+    def testCanonical(self):
+        fields = ('Accept-Language',)
+        self.assertEqual(self.key("Accept-Language: en-GB, fr;q=0.5", fields),
+          self.key("Accept-Language: fr; q=0.5,en-gb;q=1", fields))
+        self.assertNotEqual(self.key("Accept-Language: en", fields),
+          self.key("Accept-Language: en;q=0.5", fields))
+
+    def testRaw(self):
+        fields = ('User-Agent',)
+        self.assertEqual(self.key("User-Agent: a/1", fields), ('a/1',))
+        self.failIf(self.keys.stats().has_key('User-Agent'))
+
+    def testRegister(self):
+        self.keys.register('accept-language',
+          negotiated(languages, ('en', 'de')))
+        fields = ('Accept-Language',)
+        self.assertEqual(self.key("Accept-Language: en-gb, en", fields), ('en',))
+        self.assertEqual(self.key("Accept-Language: ja, de;q=0.1", fields), ('de',))
+        self.keys.register('Accept-Language', None)
+        self.assertEqual(self.key("Accept-Language: en-gb", fields), ('en-gb',))
+
+    def testMemo(self):
+        self.key("Accept-Encoding: gzip")
+        self.keys.buckets['Accept-Encoding'] = None
+        self.assertEqual(self.key("Accept-Encoding: gzip"), ('gzip',))
+
+    def testCanonicalFunction(self):
+        bucket = canonical('Accept')
+        self.assertEqual(bucket("text/html;level=1, */*;q=0.1"),
+          bucket("*/*; q=0.1, TEXT/HTML; level=1"))
+
+
+class TestCacheBuckets(unittest.TestCase):
+    def testCollapse(self):
+        Page.calls = 0
+        server = ServerAdapter(Page)
+        cache = ResponseCache(server, vary_keys=VaryKeys())
+        server.pipeline.append(cache)
+        for headers in ["Accept-Encoding: gzip, deflate\nAccept-Language: en",
+          "Accept-Encoding: deflate, gzip\nAccept-Language: EN",
+          "Accept-Encoding: gzip\nAccept-Language: en;q=1"]:
+            self.assertEqual(server.dispatch(make_request(headers=headers)).body, "page")
+        self.assertEqual(Page.calls, 1)
+        self.assertEqual(cache.hits, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()